@@ -58,6 +58,7 @@ INSTALLED_APPS = [
     "core",
     "contacts",
     "instances",
+    "jobs",
     "two_factor",
 ]
 
@@ -68,6 +69,7 @@ if not TESTING and DEBUG and "localhost" in HOST_URL:
     ]
 
 MIDDLEWARE = [
+    "core.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -123,6 +125,19 @@ if DATABASE_URL:
 else:
     raise ValueError("Please set the DATABASE_URL environment variable")
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# The database cache is shared by all the gunicorn workers
+# (the table is created by `python manage.py createcachetable`)
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "django_cache",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -194,6 +209,8 @@ ALWAYSDATA_ACCOUNT = os.getenv("ALWAYSDATA_ACCOUNT", "")
 ALWAYSDATA_API_KEY = os.getenv("ALWAYSDATA_API_KEY", "")
 ALWAYSDATA_DOMAIN_ID = os.getenv("ALWAYSDATA_DOMAIN_ID", "")
 ALWAYSDATA_ROOT_DOMAIN = os.getenv("ALWAYSDATA_ROOT_DOMAIN", "")
+# Seconds during which the DNS records listed from Alwaysdata are reused
+ALWAYSDATA_RECORDS_TTL = int(os.getenv("ALWAYSDATA_RECORDS_TTL", "300"))
 
 SCALINGO_API_TOKEN = os.getenv("SCALINGO_API_TOKEN", "")
 EMAIL_SECRETS = os.getenv("EMAIL_SECRETS", "")
@@ -205,6 +222,81 @@ SF_ADMIN_EMAILS = os.getenv("SF_ADMIN_EMAILS", "")
 SF_INFRA_EMAIL = os.getenv("SF_INFRA_EMAIL", "")
 DEFAULT_POSTGRESQL_PLAN = os.getenv("DEFAULT_POSTGRESQL_PLAN", "starter_plan")
 
+# Pooled connections kept open to each PaaS API host (Scalingo, Alwaysdata)
+OUTBOUND_HTTP_POOL_SIZE = int(os.getenv("OUTBOUND_HTTP_POOL_SIZE", "20"))
+OUTBOUND_HTTP_CONNECT_RETRIES = int(os.getenv("OUTBOUND_HTTP_CONNECT_RETRIES", "2"))
+
+# Maximum number of concurrent calls made by the asynchronous Scalingo client
+SCALINGO_CONCURRENCY = int(os.getenv("SCALINGO_CONCURRENCY", "10"))
+
+# Maximum number of deployments triggered at the same time in each region by
+# the mass deploy
+MASS_DEPLOY_CONCURRENCY = int(os.getenv("MASS_DEPLOY_CONCURRENCY", "10"))
+
+# Delay (in seconds) between two checks of the deployments of a mass deploy, and
+# time after its trigger after which a deployment that is still in progress (or
+# whose site does not answer) is reported as failed
+DEPLOY_BATCH_POLL_INTERVAL = int(os.getenv("DEPLOY_BATCH_POLL_INTERVAL", "15"))
+DEPLOY_BATCH_TIMEOUT = int(os.getenv("DEPLOY_BATCH_TIMEOUT", "900"))
+
+# Rolling mass deployments: number of instances deployed first, maximum size of
+# the following waves, and share of failed deployments that halts the rollout
+DEPLOY_CANARY_SIZE = int(os.getenv("DEPLOY_CANARY_SIZE", "2"))
+DEPLOY_MAX_WAVE_SIZE = int(os.getenv("DEPLOY_MAX_WAVE_SIZE", "50"))
+DEPLOY_MAX_FAILURE_RATE = float(os.getenv("DEPLOY_MAX_FAILURE_RATE", "0.1"))
+
+# Time to live (in seconds) of the cached Scalingo GET responses, by resource.
+# Writes made through the client on an app invalidate the entries of that app.
+# The env variables are never cached: they hold secrets, and the env syncs
+# compare them with the desired ones.
+SCALINGO_CACHE_TTL = {
+    "apps": 60,
+    "app": 30,
+    "addons": 60,
+    "addon": 30,
+    "collaborators": 300,
+    "deployments": 15,
+    "projects": 3600,
+}
+
+# Pacing of the calls made with the Scalingo API token, per region (calls per second).
+# The rate adapts to the throttling and rate-limit headers returned by the API, and
+# only goes above SCALINGO_RATE_LIMIT when those headers allow it.
+SCALINGO_RATE_LIMIT = float(os.getenv("SCALINGO_RATE_LIMIT", "10"))
+SCALINGO_RATE_BURST = int(os.getenv("SCALINGO_RATE_BURST", "20"))
+SCALINGO_RATE_LIMIT_RETRIES = int(os.getenv("SCALINGO_RATE_LIMIT_RETRIES", "3"))
+
+# Retries of the idempotent PaaS API calls, with an exponential and jittered backoff
+OUTBOUND_RETRIES = int(os.getenv("OUTBOUND_RETRIES", "2"))
+OUTBOUND_RETRY_BASE_DELAY = float(os.getenv("OUTBOUND_RETRY_BASE_DELAY", "0.2"))
+OUTBOUND_RETRY_MAX_DELAY = float(os.getenv("OUTBOUND_RETRY_MAX_DELAY", "2"))
+
+# Calls to an endpoint (Scalingo region, Alwaysdata) fail fast for RESET_TIMEOUT
+# seconds after FAILURE_THRESHOLD consecutive failures
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(
+    os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5")
+)
+CIRCUIT_BREAKER_RESET_TIMEOUT = float(os.getenv("CIRCUIT_BREAKER_RESET_TIMEOUT", "30"))
+
+# Replaces the Scalingo and Alwaysdata APIs by an in-process emulator (dev and benchmarks)
+PAAS_EMULATOR = os.getenv("PAAS_EMULATOR", "False") == "True"
+PAAS_EMULATOR_FLEET_SIZE = int(os.getenv("PAAS_EMULATOR_FLEET_SIZE", "0"))
+PAAS_EMULATOR_LATENCY = float(os.getenv("PAAS_EMULATOR_LATENCY", "0"))
+PAAS_EMULATOR_ERROR_RATE = float(os.getenv("PAAS_EMULATOR_ERROR_RATE", "0"))
+
+# Background jobs, run by `python manage.py run_worker`
+JOBS_WORKER_CONCURRENCY = int(os.getenv("JOBS_WORKER_CONCURRENCY", "4"))
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "1"))
+# Failed jobs are retried with an exponential and jittered backoff (in seconds)
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "5"))
+JOBS_RETRY_BASE_DELAY = float(os.getenv("JOBS_RETRY_BASE_DELAY", "10"))
+JOBS_RETRY_MAX_DELAY = float(os.getenv("JOBS_RETRY_MAX_DELAY", "600"))
+# Jobs running for longer (in seconds) are considered abandoned by a stopped worker
+JOBS_TIMEOUT = int(os.getenv("JOBS_TIMEOUT", "900"))
+
+# Bearer token allowing a scraper to read /metrics (staff users can always read it)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 INSTANCES_ALLOW_CREATE = os.getenv("INSTANCES_ALLOW_CREATE", False)
 INSTANCES_ALLOW_DELETE = os.getenv("IINSTANCES_ALLOW_DELETE", False)
 
@@ -0,0 +1,158 @@
+"""
+Minimal metrics registry, exposed in the Prometheus text format on /metrics.
+
+Metrics are kept in the memory of each process, so each gunicorn worker reports
+its own values: they should be aggregated with sum() in the queries.
+"""
+
+import bisect
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REGISTRY = []
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    content = ",".join(f'{k}="{escape(v)}"' for k, v in labels.items())
+    return "{" + content + "}"
+
+
+class Metric:
+    """
+    Base of the metrics kept in memory by each process, and exposed in the
+    Prometheus text format by the /metrics view
+    """
+
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self):
+        raise NotImplementedError
+
+    def render(self) -> list:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        with self.lock:
+            for suffix, labels, value in self.samples():
+                lines.append(f"{self.name}{suffix}{format_labels(labels)} {value}")
+        return lines
+
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def __init__(self, name: str, *args, **kwargs):
+        super().__init__(f"{name}_total", *args, **kwargs)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self.values.get(self.key(labels), 0)
+
+    def total(self, **labels) -> float:
+        """
+        Sum of the series matching the given labels, e.g. total(service="scalingo")
+        """
+        indexes = {self.labelnames.index(name): str(v) for name, v in labels.items()}
+        with self.lock:
+            return sum(
+                value
+                for key, value in self.values.items()
+                if all(key[i] == v for i, v in indexes.items())
+            )
+
+    def samples(self):
+        for key, value in sorted(self.values.items()):
+            yield "", dict(zip(self.labelnames, key)), value
+
+
+class Histogram(Metric):
+    metric_type = "histogram"
+
+    def __init__(self, *args, buckets: tuple = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels) -> None:
+        key = self.key(labels)
+        with self.lock:
+            # The last slot counts the observations above the highest bucket
+            counts, total = self.values.get(key, ([0] * (len(self.buckets) + 1), 0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.values[key] = (counts, total + value)
+
+    def count(self, **labels) -> int:
+        counts, _ = self.values.get(self.key(labels), ([], 0))
+        return sum(counts)
+
+    def samples(self):
+        for key, (counts, total) in sorted(self.values.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield "_bucket", {**labels, "le": bound}, cumulative
+            yield "_bucket", {**labels, "le": "+Inf"}, sum(counts)
+            yield "_sum", labels, total
+            yield "_count", labels, sum(counts)
+
+
+def render_all() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+## Metrics of the application
+HTTP_REQUESTS = Counter(
+    "django_http_requests",
+    "Requests handled, by view, method and status code",
+    ("view", "method", "status"),
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "django_http_request_duration_seconds",
+    "Time spent handling requests, by view and method",
+    ("view", "method"),
+)
+OUTBOUND_REQUESTS = Counter(
+    "outbound_requests",
+    "Calls made to the external APIs, by endpoint and status code",
+    ("service", "region", "method", "endpoint", "status"),
+)
+OUTBOUND_REQUEST_DURATION = Histogram(
+    "outbound_request_duration_seconds",
+    "Duration of the calls made to the external APIs, by endpoint and status code",
+    ("service", "region", "method", "endpoint", "status"),
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests",
+    "Lookups in the application caches, by cache and result (hit or miss)",
+    ("cache", "result"),
+)
@@ -0,0 +1,26 @@
+import time
+
+from core.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS
+
+
+class MetricsMiddleware:
+    """
+    Records the number and duration of the requests handled by each view
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, "resolver_match", None)
+        # Unresolved paths are grouped to keep the number of series bounded
+        view = match.view_name if match else "<unresolved>"
+
+        HTTP_REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        HTTP_REQUEST_DURATION.observe(duration, view=view, method=request.method)
+
+        return response
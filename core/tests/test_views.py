@@ -1,6 +1,9 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
+from instances.services.http import timed_send
+from instances.tests.test_scalingo import FakeResponse
+
 # Create your tests here.
 
 
@@ -10,3 +13,32 @@ class IndexTestCase(TestCase):
         self.assertEqual(response.status_code, 200)  # type: ignore
 
         self.assertInHTML("<h1>Accueil</h1>", response.content.decode())  # type: ignore
+
+
+@override_settings(METRICS_TOKEN="scraper-token")
+class MetricsTestCase(TestCase):
+    def test_metrics_require_staff_or_token(self):
+        response = self.client.get(reverse("core:metrics"))
+        self.assertEqual(response.status_code, 403)
+
+        response = self.client.get(
+            reverse("core:metrics"), headers={"Authorization": "Bearer wrong"}
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_metrics_are_exposed_with_token(self):
+        timed_send(lambda: FakeResponse({}), "scalingo", "GET", "apps/sf-a/deployments")
+        self.client.get(reverse("core:index"))
+
+        response = self.client.get(
+            reverse("core:metrics"), headers={"Authorization": "Bearer scraper-token"}
+        )
+        content = response.content.decode()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('django_http_requests_total{view="core:index"', content)
+        self.assertIn(
+            'outbound_request_duration_seconds_count{service="scalingo",region="",'
+            'method="GET",endpoint="apps/{app}/deployments",status="200"}',
+            content,
+        )
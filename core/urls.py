@@ -6,4 +6,5 @@ app_name = "core"
 
 urlpatterns = [
     path("", views.index_view, name="index"),
+    path("metrics", views.metrics_view, name="metrics"),
 ]
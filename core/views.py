@@ -1,7 +1,12 @@
+import secrets
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_not_required
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
 
-from core.utils import init_context
+from core.metrics import render_all
+from core.utils import check_staff_or_admin, init_context
 
 
 @login_not_required
@@ -9,3 +14,27 @@ def index_view(request):
     payload = init_context(title="Accueil")
 
     return render(request, "core/index.html", payload)
+
+
+@login_not_required
+def metrics_view(request):
+    """
+    Metrics in the Prometheus text format, for staff users or for a scraper
+    sending the METRICS_TOKEN as a bearer token
+    """
+    user = request.user
+    authorization = request.headers.get("Authorization", "")
+    token = authorization.removeprefix("Bearer ")
+
+    # Same requirements as the staff pages: staff user with a verified OTP device
+    is_staff = user.is_verified() and check_staff_or_admin(user)
+    has_token = bool(settings.METRICS_TOKEN) and secrets.compare_digest(
+        token.encode(), settings.METRICS_TOKEN.encode()
+    )
+
+    if not (is_staff or has_token):
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        render_all(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
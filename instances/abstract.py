@@ -8,3 +8,29 @@ class BaseModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class EnvFieldsMixin:
+    """
+    Remembers the values of the fields that the env variables of the instances
+    depend on (ENV_FIELDS, by attname), to only update the env variables when
+    one of them changed
+    """
+
+    ENV_FIELDS = []
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        obj = super().from_db(db, field_names, values)
+        obj.mark_env_saved()
+        return obj
+
+    def env_values(self) -> dict:
+        # Read from __dict__ so that deferred fields are not loaded
+        return {field: self.__dict__.get(field) for field in self.ENV_FIELDS}
+
+    def env_may_have_changed(self) -> bool:
+        return getattr(self, "_saved_env_values", None) != self.env_values()
+
+    def mark_env_saved(self) -> None:
+        self._saved_env_values = self.env_values()
@@ -1,4 +1,74 @@
 from django.contrib import admin
-from instances.models import Instance
+from django.utils.translation import gettext
+from instances.models import (
+    DeployBatch,
+    DeployBatchItem,
+    EnvRollout,
+    EnvRolloutItem,
+    GlobalVariable,
+    Instance,
+)
 
 admin.site.register(Instance)
+
+
+@admin.register(GlobalVariable)
+class GlobalVariableAdmin(admin.ModelAdmin):
+    list_display = ["name", "updated_at"]
+    search_fields = ["name"]
+
+    def delete_queryset(self, request, queryset):
+        # The bulk deletion skips GlobalVariable.delete(): one rollout removes
+        # all the deleted variables from the apps
+        names = ", ".join(str(variable) for variable in queryset)
+        super().delete_queryset(request, queryset)
+        EnvRollout.start(
+            Instance.objects.all(), reason=gettext("Global variable %s deleted") % names
+        )
+
+
+class EnvRolloutItemInline(admin.TabularInline):
+    model = EnvRolloutItem
+    fields = ["instance", "status", "message", "updated_at"]
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+@admin.register(EnvRollout)
+class EnvRolloutAdmin(admin.ModelAdmin):
+    list_display = ["reason", "created_at"]
+    readonly_fields = ["reason", "email_config", "created_at"]
+    inlines = [EnvRolloutItemInline]
+
+
+class DeployBatchItemInline(admin.TabularInline):
+    model = DeployBatchItem
+    fields = [
+        "wave",
+        "instance",
+        "status",
+        "deployment_status",
+        "message",
+        "updated_at",
+    ]
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+@admin.register(DeployBatch)
+class DeployBatchAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "strategy", "created_by", "created_at", "finished_at"]
+    readonly_fields = [
+        "created_by",
+        "strategy",
+        "canary_size",
+        "max_wave_size",
+        "max_failure_rate",
+        "created_at",
+        "finished_at",
+        "halted_at",
+        "halt_reason",
+    ]
+    inlines = [DeployBatchItemInline]
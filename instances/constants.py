@@ -1,8 +1,82 @@
+from datetime import timedelta
+
 from django.utils.translation import gettext_lazy as _
 
 USER_AGENT = "Sites faciles SAAS"
 REQUEST_TIMEOUT = (3.05, 27)
 
+# Scalingo bearer tokens last one hour, renew them a bit before
+BEARER_TOKEN_LIFETIME = timedelta(hours=1)
+BEARER_TOKEN_RENEWAL_MARGIN = timedelta(minutes=5)
+
+# Number of items requested per page when iterating over Scalingo collections
+SCALINGO_PAGE_SIZE = 50
+
+# Statuses of the instances whose env variables are kept in sync with Scalingo
+ENV_SYNC_STATUSES = ["SCALINGO_DB_PROVISIONED", "FINISHED"]
+
+# Env variables set from the instances and their email config, which cannot be
+# defined as global variables
+RESERVED_ENV_NAMES = [
+    "ALLOWED_HOSTS",
+    "DEFAULT_FROM_EMAIL",
+    "EMAIL_HOST",
+    "EMAIL_HOST_PASSWORD",
+    "EMAIL_HOST_USER",
+    "EMAIL_PORT",
+    "EMAIL_SSL_CERTFILE",
+    "EMAIL_SSL_KEYFILE",
+    "EMAIL_TIMEOUT",
+    "EMAIL_USE_SSL",
+    "EMAIL_USE_TLS",
+    "HOST_URL",
+    "SECRET_KEY",
+    "WAGTAIL_PASSWORD_RESET_ENABLED",
+]
+
+# Statuses of the instance updates made by a rollout
+ROLLOUT_STATUSES = [
+    ("PENDING", _("Pending")),
+    ("SUCCESS", _("Success")),
+    ("ERROR", _("Error")),
+]
+
+# Statuses of the instances of a mass deployment
+DEPLOY_BATCH_ITEM_STATUSES = [
+    ("PENDING", _("Pending")),
+    ("DEPLOYING", _("Deploying")),
+    ("SUCCESS", _("Success")),
+    ("ERROR", _("Error")),
+    ("CANCELLED", _("Cancelled")),
+]
+
+# How the instances of a mass deployment are deployed
+DEPLOY_BATCH_STRATEGIES = [
+    ("WAVES", _("Canary, then waves")),
+    ("ALL", _("All at once")),
+]
+
+# Statuses of the Scalingo deployments that failed
+DEPLOYMENT_ERROR_STATUSES = [
+    "build-error",
+    "timeout-error",
+    "crashed-error",
+    "hook-error",
+    "aborted",
+]
+FINISHED_DEPLOYMENT_STATUSES = ["success", *DEPLOYMENT_ERROR_STATUSES]
+
+# Delays between two checks of the remote state of an instance, depending on it
+REMOTE_STATE_CHECK_INTERVALS = {
+    # A deployment or a database provisioning is in progress
+    "in_progress": timedelta(seconds=15),
+    # The instance is being set up, or the last check returned an error
+    "pending": timedelta(minutes=5),
+    "stable": timedelta(hours=6),
+}
+# Checks are spread by up to this share of their interval, before or after
+REMOTE_STATE_CHECK_JITTER = 0.2
+
 STATUS_DETAILED = {
     "REQUEST": {
         "label": _("Instance creation requested"),
@@ -1,10 +1,13 @@
 from django import forms
-from django.core.exceptions import ValidationError
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, ValidationError
 from django.forms import ModelForm
 from django.utils.translation import gettext_lazy as _
 from dsfr.forms import DsfrBaseForm
 
+from instances.constants import DEPLOY_BATCH_STRATEGIES
 from instances.models import EmailConfig, Instance
+from instances.utils import parse_email_secrets
 
 
 class EmailConfigForm(ModelForm, DsfrBaseForm):
@@ -12,6 +15,19 @@ class EmailConfigForm(ModelForm, DsfrBaseForm):
         model = EmailConfig
         fields = "__all__"  # NOSONAR
 
+    def clean_email_secrets_id(self):
+        email_secrets_id = self.cleaned_data["email_secrets_id"]
+
+        try:
+            secrets = parse_email_secrets(settings.EMAIL_SECRETS)
+        except ImproperlyConfigured as e:
+            raise ValidationError(str(e)) from e
+
+        if str(email_secrets_id) not in secrets:
+            raise ValidationError(_("This ID is not defined in EMAIL_SECRETS."))
+
+        return email_secrets_id
+
 
 class InstanceForm(ModelForm, DsfrBaseForm):
     class Meta:
@@ -68,6 +84,9 @@ class InstanceActionForm(ModelForm, DsfrBaseForm):
             return self.instance.scalingo_create_superusers()
         elif action == "scalingo_app_restart":
             return self.instance.scalingo_app_restart()
+        elif action == "refresh_remote_state":
+            # The view requests a check of the remote state after every action
+            return {"status": "success", "message": _("Remote state check requested")}
 
 
 class InstanceMassDeployForm(DsfrBaseForm):
@@ -78,3 +97,14 @@ class InstanceMassDeployForm(DsfrBaseForm):
             Instance.get_auto_deployable_instances().values_list("id", flat=True)
         ),
     )
+    strategy = forms.ChoiceField(
+        label=_("Strategy"),
+        choices=DEPLOY_BATCH_STRATEGIES,
+        initial="WAVES",
+        widget=forms.RadioSelect,
+        help_text=_(
+            "Canary, then waves: a few instances are deployed first, then growing "
+            "waves, each one once the previous one is deployed and answers. The "
+            "deployment stops if too many of them fail."
+        ),
+    )
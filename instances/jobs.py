@@ -0,0 +1,67 @@
+from instances.constants import ENV_SYNC_STATUSES
+from instances.models import DeployBatch, EnvRolloutItem, Instance
+from jobs.registry import JobError, register
+
+
+@register("instances.sync_env")
+def sync_env(instance_id: int) -> dict | None:
+    """
+    Pushes the env variables of an instance to Scalingo (see request_env_sync),
+    and records the result on the rollouts that include it
+    """
+    instance = Instance.objects.filter(pk=instance_id).first()
+    if instance is None or instance.status not in ENV_SYNC_STATUSES:
+        return None
+
+    result = instance.scalingo_set_env()
+    EnvRolloutItem.set_result(instance_id, result)
+    if result["status"] != "success":
+        raise JobError(result["message"])
+
+    return result
+
+
+@register("instances.refresh_remote_state")
+def refresh_remote_state(instance_id: int) -> dict | None:
+    """
+    Checks the app and DNS record of an instance (see request_remote_state_check)
+    """
+    instance = Instance.objects.filter(pk=instance_id).first()
+    if instance is None:
+        return None
+
+    state = instance.refresh_remote_state()
+
+    return {"errors": state.errors}
+
+
+@register("instances.deploy_batch")
+def deploy_batch(batch_id: int) -> dict | None:
+    """
+    Triggers the deployments of a mass deployment, then follows them
+    """
+    batch = DeployBatch.objects.filter(pk=batch_id).first()
+    if batch is None:
+        return None
+
+    batch.trigger()
+    batch.schedule_tracking()
+
+    return batch.count_by_status()
+
+
+@register("instances.track_deploy_batch")
+def track_deploy_batch(batch_id: int) -> dict | None:
+    """
+    Updates the status of the deployments of a mass deployment, and checks
+    them again later until they are all over
+    """
+    batch = DeployBatch.objects.filter(pk=batch_id, finished_at__isnull=True).first()
+    if batch is None:
+        return None
+
+    batch.track()
+    if not batch.is_finished:
+        batch.schedule_tracking()
+
+    return batch.count_by_status()
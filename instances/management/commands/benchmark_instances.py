@@ -0,0 +1,175 @@
+from io import StringIO
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django_otp import DEVICE_ID_SESSION_KEY
+from django_otp.plugins.otp_static.models import StaticDevice
+
+from contacts.models import Contact
+from instances.models import Instance
+from instances.services.emulator import emulated_paas, fake_app_name
+
+
+class Command(BaseCommand):
+    help = """Measure the instance pages and mass operations against the PaaS emulator.
+
+    A fleet of fake instances is created in a test database, like the one of the
+    tests, which is destroyed at the end: the configured database and its cache are
+    left untouched. No call is made to the real Scalingo and Alwaysdata APIs.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fleet-size",
+            type=int,
+            default=300,
+            help="Number of fake instances and apps. Default: 300.",
+        )
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.05,
+            help="Latency of each emulated API call, in seconds. Default: 0.05.",
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0.0,
+            help="Share of the emulated API calls answered with a 503. Default: 0.",
+        )
+        parser.add_argument(
+            "--rate-limit",
+            type=int,
+            default=0,
+            help="Scalingo calls allowed per minute and per region, announced in "
+            "rate-limit headers. Default: 0 (no limit and no headers).",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Number of times each measure is repeated (the first one has a cold cache). Default: 3.",
+        )
+
+    def handle(self, *args, **kwargs):
+        fleet_size = kwargs["fleet_size"]
+        repeat = kwargs["repeat"]
+
+        setup_test_environment()
+        # The fleet is committed there, so that the calls made from other
+        # threads can read it
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with emulated_paas(
+                fleet_size=fleet_size,
+                latency=kwargs["latency"],
+                error_rate=kwargs["error_rate"],
+                rate_limit=kwargs["rate_limit"],
+            ) as paas:
+                self.run_measures(paas, fleet_size, repeat)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run_measures(self, paas, fleet_size: int, repeat: int) -> None:
+        instances = self.create_fleet(paas, fleet_size)
+        client = self.get_client()
+
+        self.measure(
+            "Remote state refresh",
+            paas,
+            repeat,
+            lambda: call_command("refresh_instances", stdout=StringIO()),
+        )
+        self.measure(
+            "Full remote state refresh",
+            paas,
+            repeat,
+            lambda: call_command(
+                "refresh_instances", all=True, full=True, stdout=StringIO()
+            ),
+        )
+        self.measure(
+            "List page",
+            paas,
+            repeat,
+            lambda: client.get(reverse("instances:list")),
+        )
+        self.measure(
+            "Detail page",
+            paas,
+            repeat,
+            lambda: client.get(reverse("instances:detail", args=[instances[0].slug])),
+        )
+        self.measure(
+            f"Mass deploy of {fleet_size} instances",
+            paas,
+            1,
+            lambda: client.post(
+                reverse("instances:mass_deploy_list"),
+                {"instances": [i.pk for i in instances], "strategy": "ALL"},
+            ),
+        )
+
+    def create_fleet(self, paas, fleet_size: int) -> list:
+        contact = Contact.objects.create(
+            first_name="Benchmark", last_name="Benchmark", email="benchmark@example.com"
+        )
+        apps = paas.apps["osc-fr1"]
+
+        return Instance.objects.bulk_create(
+            Instance(
+                name=f"Fake {i}",
+                slug=f"fake-{i}",
+                scalingo_application_name=fake_app_name(i),
+                scalingo_db_id=next(iter(apps[fake_app_name(i)]["addons"])),
+                main_contact=contact,
+                status="FINISHED",
+                host_url=f"{fake_app_name(i)}.osc-fr1.scalingo.io",
+                allowed_hosts=f"{fake_app_name(i)}.osc-fr1.scalingo.io",
+            )
+            for i in range(fleet_size)
+        )
+
+    def get_client(self) -> Client:
+        """
+        Returns a client logged in as a staff user with a verified OTP device
+        """
+        user = get_user_model().objects.create_user(
+            username="benchmark", email="benchmark@example.com", is_staff=True
+        )
+        device = StaticDevice.objects.create(user=user, name="benchmark")
+
+        client = Client()
+        client.force_login(user)
+        session = client.session
+        session[DEVICE_ID_SESSION_KEY] = device.persistent_id
+        session.save()
+
+        return client
+
+    def measure(self, label: str, paas, repeat: int, func) -> None:
+        cache.clear()
+
+        for i in range(repeat):
+            calls_before = sum(paas.calls.values())
+            start = time.perf_counter()
+
+            response = func()
+
+            duration = time.perf_counter() - start
+            calls = sum(paas.calls.values()) - calls_before
+            run = "cold" if i == 0 else "warm"
+
+            http = f", HTTP {response.status_code}" if response else ""
+
+            self.stdout.write(
+                f"{label} ({run}): {duration:.2f}s, {calls} API calls{http}"
+            )
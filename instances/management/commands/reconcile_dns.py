@@ -0,0 +1,129 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+import requests
+
+from instances.models import Instance
+from instances.services.alwaysdata import (
+    domain_record_create,
+    domain_record_query,
+    domain_record_remove,
+    records_diff,
+)
+
+
+class Command(BaseCommand):
+    help = """Creates the sites-beta CNAME record of every instance in Alwaysdata.
+
+    The zone is listed once, compared with the records expected for the instances
+    (slug -> Scalingo host), and only the missing, wrong or duplicate records are
+    created or deleted. Records of names that are not instance slugs are left as is.
+
+    With --attach, the instances without an Alwaysdata subdomain whose record was
+    just created then use it as their host, which changes their host_url and env.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only show the changes that would be made.",
+        )
+
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=5,
+            help="Number of records changed at the same time. Default: 5.",
+        )
+
+        parser.add_argument(
+            "--attach",
+            action="store_true",
+            help="Use the created records as the host of their instances.",
+        )
+
+    def handle(self, *args, **kwargs):
+        dry_run = kwargs.get("dry_run", False)
+        concurrency = kwargs.get("concurrency", 5)
+        attach = kwargs.get("attach", False)
+
+        instances = {
+            str(instance.slug): instance
+            for instance in Instance.objects.exclude(status="REQUEST")
+        }
+        desired = {
+            slug: instance.scalingo_instance_host
+            for slug, instance in instances.items()
+        }
+
+        records = domain_record_query(settings.ALWAYSDATA_DOMAIN_ID)
+        if records is None:
+            raise CommandError("The records could not be listed from Alwaysdata.")
+
+        changes = records_diff(desired, records)
+
+        self.stdout.write(
+            f"{len(desired)} instances, {len(records)} records in the zone, "
+            f"{len(changes)} to update."
+        )
+
+        for name, change in sorted(changes.items()):
+            for record in change["delete"]:
+                self.stdout.write(f"- {name} CNAME {record['value']}")
+            if change["add"]:
+                self.stdout.write(f"+ {name} CNAME {change['add']}")
+
+        if dry_run or not changes:
+            return
+
+        with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+            results = dict(
+                zip(changes, executor.map(self.apply_change, changes.items()))
+            )
+
+        failures = {name: error for name, error in results.items() if error}
+        for name, error in sorted(failures.items()):
+            self.stderr.write(f"{name}: {error}")
+
+        # The instances whose record was just created now use it as their host
+        for name, change in changes.items():
+            instance = instances[name]
+            if (
+                attach
+                and name not in failures
+                and change["add"]
+                and not instance.alwaysdata_subdomain
+            ):
+                instance.alwaysdata_subdomain_attach()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{len(changes) - len(failures)} names updated.")
+        )
+        if failures:
+            raise CommandError(f"{len(failures)} names could not be updated.")
+
+    def apply_change(self, item) -> str:
+        """
+        Applies the changes of a name, and returns an error message if one failed
+        """
+        name, change = item
+
+        try:
+            # A name can only have one CNAME: the wrong ones are deleted first
+            for record in change["delete"]:
+                domain_record_remove(record)
+
+            if change["add"]:
+                result = domain_record_create("CNAME", name, change["add"])
+                if "errors" in result:
+                    return str(result["errors"])
+        except (requests.RequestException, ValueError) as e:
+            return str(e)
+        finally:
+            # The record store uses the database cache from this worker thread
+            connections.close_all()
+
+        return ""
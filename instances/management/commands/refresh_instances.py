@@ -0,0 +1,285 @@
+import time
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db.models import Min, Q
+from django.utils import timezone
+from django.utils.translation import gettext
+
+from core.metrics import OUTBOUND_REQUESTS
+from instances.constants import FINISHED_DEPLOYMENT_STATUSES
+from instances.models import Instance, InstanceRemoteState
+from instances.services.alwaysdata import records_store
+from instances.services.scalingo import AsyncScalingo
+
+REMOTE_STATE_FIELDS = [
+    "app_status",
+    "db_status",
+    "deployment_id",
+    "deployment_status",
+    "deployment_created_at",
+    "env_present",
+    "dns_present",
+    "errors",
+    "last_checked_at",
+    "next_check_at",
+    "updated_at",
+]
+
+# Minimum pause between two passes, in seconds
+MIN_WAIT = 1
+
+# Only one run refreshes the states at a time. The run holding the lock renews
+# it after each pass: a lock left by a stopped run expires after LOCK_TIMEOUT.
+LOCK_KEY = "refresh_instances:lock"
+LOCK_TIMEOUT = 3600
+LOCK_POLL_INTERVAL = 5
+
+
+class Command(BaseCommand):
+    help = """Refreshes the remote state of the instances (except requests).
+
+    Only the instances whose next check is due are refreshed, unless --all is
+    given: every few seconds while a deployment or a database provisioning is in
+    progress, every few hours for stable apps (see REMOTE_STATE_CHECK_INTERVALS).
+
+    The apps are listed once per region, then the latest deployment and the
+    database of each app are fetched concurrently. The DNS records are read from
+    a single snapshot of the Alwaysdata zone. The states are saved in bulk.
+
+    Unless --full is given, the parts that are not expected to change are not
+    checked again: a finished deployment that is still the latest one of its app,
+    a running database, and env variables that are already set.
+
+    Runs do not overlap: a run started while another one is in progress waits
+    for it up to --wait seconds, then gives up.
+    """
+
+    # Below this number of instances, fetching them one by one is cheaper than
+    # listing the whole region or DNS zone
+    MIN_INSTANCES_FOR_LISTING = 10
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Refresh all the instances, even if their next check is not due.",
+        )
+
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Also check the parts that are not expected to change.",
+        )
+
+        parser.add_argument(
+            "--duration",
+            type=int,
+            default=0,
+            help="Keep refreshing the instances as their checks become due for this "
+            "number of seconds. Default: 0 (a single pass).",
+        )
+
+        parser.add_argument(
+            "--wait",
+            type=int,
+            default=0,
+            help="Seconds to wait for a refresh already in progress to finish. "
+            "Default: 0 (give up at once).",
+        )
+
+    def handle(self, *args, **kwargs):
+        refresh_all = kwargs.get("all", False)
+        full = kwargs.get("full", False)
+
+        if not self.acquire_lock(kwargs.get("wait", 0)):
+            self.stderr.write("Another refresh is in progress, nothing was done.")
+            return
+
+        deadline = time.monotonic() + kwargs.get("duration", 0)
+        try:
+            while True:
+                self.refresh(refresh_all=refresh_all, full=full)
+                cache.touch(LOCK_KEY, LOCK_TIMEOUT)
+
+                wait = self.seconds_until_next_check()
+                if time.monotonic() + wait >= deadline:
+                    break
+
+                time.sleep(wait)
+        finally:
+            cache.delete(LOCK_KEY)
+
+    @staticmethod
+    def acquire_lock(wait: int) -> bool:
+        deadline = time.monotonic() + wait
+
+        while not cache.add(LOCK_KEY, 1, timeout=LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(min(LOCK_POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+
+        return True
+
+    def refresh(self, refresh_all: bool = False, full: bool = False) -> None:
+        start = time.monotonic()
+        calls_before = self.count_calls()
+
+        instances = Instance.objects.exclude(status="REQUEST")
+        if not refresh_all:
+            instances = instances.filter(
+                Q(remote_state__isnull=True)
+                | Q(remote_state__next_check_at__isnull=True)
+                | Q(remote_state__next_check_at__lte=timezone.now())
+            )
+        instances = list(instances.select_related("remote_state"))
+        states = {instance.pk: instance.get_remote_state() for instance in instances}
+
+        if not instances:
+            return
+
+        self.refresh_dns(instances, states)
+
+        for use_secnumcloud in {bool(i.use_secnumcloud) for i in instances}:
+            region_instances = [
+                i for i in instances if bool(i.use_secnumcloud) == use_secnumcloud
+            ]
+            async_to_sync(self.refresh_region)(
+                use_secnumcloud, region_instances, states, full=full
+            )
+
+        self.save_states(list(states.values()))
+
+        calls = {
+            service: self.count_calls()[service] - calls_before[service]
+            for service in calls_before
+        }
+        self.stdout.write(
+            f"{len(instances)} instances refreshed in {time.monotonic() - start:.1f}s "
+            f"({calls['scalingo']:.0f} Scalingo calls, "
+            f"{calls['alwaysdata']:.0f} Alwaysdata calls)."
+        )
+
+    def seconds_until_next_check(self) -> float:
+        next_check_at = InstanceRemoteState.objects.exclude(
+            instance__status="REQUEST"
+        ).aggregate(Min("next_check_at"))["next_check_at__min"]
+
+        if next_check_at is None:
+            return MIN_WAIT
+
+        return max((next_check_at - timezone.now()).total_seconds(), MIN_WAIT)
+
+    def count_calls(self) -> dict:
+        return {
+            service: OUTBOUND_REQUESTS.total(service=service)
+            for service in ["scalingo", "alwaysdata"]
+        }
+
+    def refresh_dns(self, instances: list, states: dict) -> None:
+        domain_id = settings.ALWAYSDATA_DOMAIN_ID
+
+        if len(instances) >= self.MIN_INSTANCES_FOR_LISTING:
+            if not records_store.load(domain_id):
+                self.stderr.write("The DNS records could not be listed, they are kept.")
+                return
+
+        for instance in instances:
+            records = records_store.lookup(domain_id, str(instance.slug))
+            states[instance.pk].set_dns_records(records)
+
+    @staticmethod
+    def deployment_may_have_changed(state, app: dict) -> bool:
+        """
+        The apps listing gives the id of the latest deployment of each app: a
+        finished deployment that is still the latest one does not need a check
+        """
+        is_finished = state.deployment_status in FINISHED_DEPLOYMENT_STATUSES
+        return not (
+            is_finished
+            and state.deployment_id
+            and app.get("last_deployment_id") == state.deployment_id
+        )
+
+    @staticmethod
+    def app_result(apps: dict, instance) -> dict:
+        """
+        Returns the app of an instance from the apps listing of its region,
+        in the same format as the app detail
+        """
+        app_name = str(instance.scalingo_application_name)
+
+        if "error" in apps:
+            return {"error": apps["error"]}
+        elif app_name not in apps["apps"]:
+            return {"error": gettext("App not found")}
+        return {"app": apps["apps"][app_name]}
+
+    async def refresh_region(
+        self, use_secnumcloud, instances, states, full: bool = False
+    ) -> None:
+        async with AsyncScalingo(use_secnumcloud=use_secnumcloud) as sc:
+            if len(instances) >= self.MIN_INSTANCES_FOR_LISTING:
+                apps = await sc.apps_index()
+                app_results = [self.app_result(apps, i) for i in instances]
+            else:
+                app_results = await sc.gather(
+                    sc.app_detail(app_name=str(i.scalingo_application_name))
+                    for i in instances
+                )
+
+            calls = []
+            for instance, result in zip(instances, app_results):
+                state = states[instance.pk]
+                app_name = str(instance.scalingo_application_name)
+
+                state.set_app(result)
+                if "error" in result:
+                    state.set_deployment(result)
+                    continue
+
+                if full or self.deployment_may_have_changed(state, result["app"]):
+                    calls.append(
+                        (
+                            state.set_deployment,
+                            sc.app_deployment_latest(app_name=app_name),
+                        )
+                    )
+                if instance.scalingo_db_id and (full or state.db_status != "running"):
+                    addon_id = str(instance.scalingo_db_id)
+                    calls.append(
+                        (
+                            state.set_db,
+                            sc.app_addon_detail(app_name=app_name, addon_id=addon_id),
+                        )
+                    )
+                if full or not state.env_present:
+                    calls.append(
+                        (state.set_variables, sc.app_variables(app_name=app_name))
+                    )
+
+            results = await sc.gather(aw for _setter, aw in calls)
+
+            for (setter, _aw), result in zip(calls, results):
+                setter(result)
+
+    def save_states(self, states: list) -> None:
+        now = timezone.now()
+        for state in states:
+            state.last_checked_at = now
+            state.updated_at = now
+            state.schedule_next_check()
+
+        InstanceRemoteState.objects.bulk_update(
+            [state for state in states if state.pk], REMOTE_STATE_FIELDS
+        )
+        # A state may have been created meanwhile by the refresh job of its
+        # instance (see request_remote_state_check): it is then updated
+        InstanceRemoteState.objects.bulk_create(
+            [state for state in states if not state.pk],
+            update_conflicts=True,
+            unique_fields=["instance"],
+            update_fields=REMOTE_STATE_FIELDS,
+        )
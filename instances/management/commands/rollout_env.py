@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.translation import gettext
+
+from instances.models import EmailConfig, EnvRollout, Instance
+
+
+class Command(BaseCommand):
+    help = """Updates the env variables of all the instances in Scalingo.
+
+    The updates are made by the worker (see run_worker), e.g. after the
+    EMAIL_SECRETS setting changed. Only the changed variables are sent.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--email-config",
+            type=int,
+            help="Only update the instances using this email config (by ID).",
+        )
+
+    def handle(self, *args, **kwargs):
+        email_config_id = kwargs.get("email_config")
+
+        instances = Instance.objects.all()
+        email_config = None
+        if email_config_id:
+            email_config = EmailConfig.objects.filter(pk=email_config_id).first()
+            if email_config is None:
+                raise CommandError(f"No email config with the ID {email_config_id}.")
+            instances = instances.filter(email_config=email_config)
+
+        rollout = EnvRollout.start(
+            instances, reason=gettext("rollout_env command"), email_config=email_config
+        )
+        if rollout is None:
+            self.stdout.write("No instance to update.")
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Update of {rollout.items.count()} instances queued (rollout #{rollout.pk})."
+            )
+        )
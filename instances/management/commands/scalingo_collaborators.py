@@ -1,8 +1,9 @@
+from asgiref.sync import async_to_sync
 from django.conf import settings
 from django.core.management.base import BaseCommand
 
 from instances.models import Instance
-from instances.services.scalingo import Scalingo
+from instances.services.scalingo import AsyncScalingo
 
 ALLOWED_ACTIONS = ["add", "list"]
 
@@ -45,26 +46,38 @@ class Command(BaseCommand):
         snc_options = self.get_snc_options(instances)
 
         for snc in snc_options:
-            sc = Scalingo(use_secnumcloud=snc)
+            apps = list(
+                instances.filter(use_secnumcloud=snc).values_list(
+                    "scalingo_application_name", flat=True
+                )
+            )
+
+            async_to_sync(self.handle_region)(snc, apps, action, email_list)
 
-            apps = instances.filter(use_secnumcloud=snc).values_list(
-                "scalingo_application_name", flat=True
+    async def handle_region(self, snc, apps, action, email_list):
+        async with AsyncScalingo(use_secnumcloud=snc) as sc:
+            all_collaborators = await sc.gather(
+                sc.app_collaborators_list(app) for app in apps
             )
 
             if action == "list":
-                for app in apps:
-                    collaborators = sc.app_collaborators_list(app)
+                for app, collaborators in zip(apps, all_collaborators):
                     collabs = [x["email"] for x in collaborators["collaborators"]]
 
                     self.stdout.write(f"Collaborators for {app}: {collabs}")
             else:
-                for app in apps:
-                    collaborators = sc.app_collaborators_list(app)
+                invitations = [
+                    (app, email)
+                    for app, collaborators in zip(apps, all_collaborators)
+                    for email in self.filter_email_list(email_list, collaborators)
+                ]
 
-                    new_collabs = self.filter_email_list(email_list, collaborators)
+                await sc.gather(
+                    sc.app_collaborators_invite(app, email=email)
+                    for app, email in invitations
+                )
 
-                    for email in new_collabs:
-                        _invite = sc.app_collaborators_invite(app, email=email)
+                for app in apps:
                     self.stdout.write(f"Collaborators invited for {app}.")
 
     def get_email_list(self, emails) -> list:
@@ -0,0 +1,98 @@
+# Generated by Django 6.1.2 on 2026-10-18 11:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("instances", "0014_remove_instance_storage_config_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InstanceRemoteState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="created at"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="updated at"),
+                ),
+                (
+                    "app_status",
+                    models.CharField(
+                        blank=True, max_length=50, verbose_name="app status"
+                    ),
+                ),
+                (
+                    "db_status",
+                    models.CharField(
+                        blank=True, max_length=50, verbose_name="database status"
+                    ),
+                ),
+                (
+                    "deployment_id",
+                    models.CharField(
+                        blank=True, max_length=100, verbose_name="last deployment ID"
+                    ),
+                ),
+                (
+                    "deployment_status",
+                    models.CharField(
+                        blank=True, max_length=50, verbose_name="last deployment status"
+                    ),
+                ),
+                (
+                    "deployment_created_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="last deployment date"
+                    ),
+                ),
+                (
+                    "env_present",
+                    models.BooleanField(
+                        null=True, verbose_name="env variables present"
+                    ),
+                ),
+                (
+                    "dns_present",
+                    models.BooleanField(null=True, verbose_name="DNS record present"),
+                ),
+                (
+                    "errors",
+                    models.JSONField(blank=True, default=dict, verbose_name="errors"),
+                ),
+                (
+                    "last_checked_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="last checked at"
+                    ),
+                ),
+                (
+                    "instance",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="remote_state",
+                        to="instances.instance",
+                        verbose_name="instance",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "instance remote state",
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.1.2 on 2026-10-18 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("instances", "0015_instanceremotestate"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="instanceremotestate",
+            name="next_check_at",
+            field=models.DateTimeField(
+                blank=True, db_index=True, null=True, verbose_name="next check at"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.1.2 on 2026-10-18 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("instances", "0016_instanceremotestate_next_check_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="instance",
+            name="env_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=64,
+                verbose_name="env variables hash",
+            ),
+        ),
+    ]
@@ -0,0 +1,151 @@
+# Generated by Django 6.1.2 on 2026-10-18 11:48
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("instances", "0019_instance_env_hash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GlobalVariable",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="created at"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="updated at"),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        max_length=100,
+                        unique=True,
+                        validators=[
+                            django.core.validators.RegexValidator(
+                                "^[A-Za-z_][A-Za-z0-9_]*$",
+                                "Only letters, digits and underscores are allowed.",
+                            )
+                        ],
+                        verbose_name="name",
+                    ),
+                ),
+                ("value", models.TextField(verbose_name="value")),
+            ],
+            options={
+                "verbose_name": "global variable",
+                "ordering": ["name"],
+            },
+        ),
+        migrations.CreateModel(
+            name="EnvRollout",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="created at"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="updated at"),
+                ),
+                ("reason", models.CharField(max_length=255, verbose_name="reason")),
+                (
+                    "email_config",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="env_rollouts",
+                        to="instances.emailconfig",
+                        verbose_name="Email configuration",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "env variables rollout",
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.CreateModel(
+            name="EnvRolloutItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="created at"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="updated at"),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "Pending"),
+                            ("SUCCESS", "Success"),
+                            ("ERROR", "Error"),
+                        ],
+                        default="PENDING",
+                        max_length=20,
+                        verbose_name="status",
+                    ),
+                ),
+                ("message", models.TextField(blank=True, verbose_name="message")),
+                (
+                    "instance",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="instances.instance",
+                        verbose_name="instance",
+                    ),
+                ),
+                (
+                    "rollout",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="items",
+                        to="instances.envrollout",
+                        verbose_name="rollout",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "env variables rollout item",
+                "ordering": ["instance__name"],
+            },
+        ),
+    ]
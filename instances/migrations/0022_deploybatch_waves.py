@@ -0,0 +1,97 @@
+# Generated by Django 6.1.2 on 2026-10-18 11:57
+
+import django.core.validators
+import instances.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("instances", "0021_deploybatch"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="deploybatchitem",
+            options={
+                "ordering": ["wave", "instance__name"],
+                "verbose_name": "mass deployment item",
+            },
+        ),
+        migrations.AddField(
+            model_name="deploybatch",
+            name="canary_size",
+            field=models.PositiveSmallIntegerField(
+                default=instances.models.default_canary_size, verbose_name="canary size"
+            ),
+        ),
+        migrations.AddField(
+            model_name="deploybatch",
+            name="halt_reason",
+            field=models.TextField(blank=True, verbose_name="halt reason"),
+        ),
+        migrations.AddField(
+            model_name="deploybatch",
+            name="halted_at",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="halted at"),
+        ),
+        migrations.AddField(
+            model_name="deploybatch",
+            name="max_failure_rate",
+            field=models.FloatField(
+                default=instances.models.default_max_failure_rate,
+                validators=[
+                    django.core.validators.MinValueValidator(0),
+                    django.core.validators.MaxValueValidator(1),
+                ],
+                verbose_name="maximum failure rate",
+            ),
+        ),
+        migrations.AddField(
+            model_name="deploybatch",
+            name="max_wave_size",
+            field=models.PositiveSmallIntegerField(
+                default=instances.models.default_max_wave_size,
+                verbose_name="maximum wave size",
+            ),
+        ),
+        migrations.AddField(
+            model_name="deploybatch",
+            name="strategy",
+            field=models.CharField(
+                choices=[("WAVES", "Canary, then waves"), ("ALL", "All at once")],
+                default="ALL",
+                max_length=20,
+                verbose_name="strategy",
+            ),
+        ),
+        migrations.AddField(
+            model_name="deploybatchitem",
+            name="triggered_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="triggered at"
+            ),
+        ),
+        migrations.AddField(
+            model_name="deploybatchitem",
+            name="wave",
+            field=models.PositiveSmallIntegerField(default=0, verbose_name="wave"),
+        ),
+        migrations.AlterField(
+            model_name="deploybatchitem",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("PENDING", "Pending"),
+                    ("DEPLOYING", "Deploying"),
+                    ("SUCCESS", "Success"),
+                    ("ERROR", "Error"),
+                    ("CANCELLED", "Cancelled"),
+                ],
+                default="PENDING",
+                max_length=20,
+                verbose_name="status",
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.1.2 on 2026-10-18 12:20
+
+from django.db import migrations, models
+
+
+def set_global_env_names(apps, schema_editor):
+    # The existing global variables were set on the apps, or are being set
+    GlobalVariable = apps.get_model("instances", "GlobalVariable")
+    Instance = apps.get_model("instances", "Instance")
+    names = sorted(GlobalVariable.objects.values_list("name", flat=True))
+    Instance.objects.update(global_env_names=names)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("instances", "0022_deploybatch_waves"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="instance",
+            name="global_env_names",
+            field=models.JSONField(
+                blank=True,
+                default=list,
+                editable=False,
+                verbose_name="global variables applied",
+            ),
+        ),
+        migrations.RunPython(set_global_env_names, migrations.RunPython.noop),
+    ]
@@ -1,29 +1,53 @@
-import csv
-from datetime import datetime
+import asyncio
+from datetime import timedelta
+import hashlib
+import json
 import secrets
 
+from asgiref.sync import async_to_sync
 from django.conf import settings
-from django.core.validators import MaxValueValidator, MinValueValidator
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.validators import (
+    MaxValueValidator,
+    MinValueValidator,
+    RegexValidator,
+)
 from django.db import models
 from django.template.defaultfilters import slugify
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.translation import gettext, gettext_lazy as _
 
 from contacts.models import Contact
-from instances.abstract import BaseModel
-from instances.constants import STATUS_CHOICES, STATUS_DETAILED
+from instances.abstract import BaseModel, EnvFieldsMixin
+from instances.constants import (
+    DEPLOY_BATCH_ITEM_STATUSES,
+    DEPLOY_BATCH_STRATEGIES,
+    DEPLOYMENT_ERROR_STATUSES,
+    ENV_SYNC_STATUSES,
+    FINISHED_DEPLOYMENT_STATUSES,
+    REMOTE_STATE_CHECK_INTERVALS,
+    REMOTE_STATE_CHECK_JITTER,
+    RESERVED_ENV_NAMES,
+    ROLLOUT_STATUSES,
+    STATUS_CHOICES,
+    STATUS_DETAILED,
+)
 from instances.services.alwaysdata import (
     domain_record_add,
     domain_record_check,
     domain_record_delete,
 )
-from instances.services.scalingo import Scalingo
-from instances.utils import decode_secrets
+from instances.services.http import check_health
+from instances.services.scalingo import AsyncScalingo, Scalingo
+from instances.utils import parse_email_secrets
+from jobs.models import Job
 
 from core.utils import migrations_applied
 
 
-class EmailConfig(BaseModel):
+class EmailConfig(EnvFieldsMixin, BaseModel):
     """
     Secrets are stored in an environment variable
     """
@@ -61,6 +85,19 @@ class EmailConfig(BaseModel):
         blank=True,
     )
 
+    # Fields that the env variables of the instances depend on
+    ENV_FIELDS = [
+        "default_from_email",
+        "email_host",
+        "email_port",
+        "email_secrets_id",
+        "email_use_tls",
+        "email_use_ssl",
+        "email_timeout",
+        "email_ssl_keyfile",
+        "email_ssl_certfile",
+    ]
+
     class Meta:
         verbose_name = _("email config")
         ordering = ["default_from_email"]
@@ -68,6 +105,23 @@ class EmailConfig(BaseModel):
     def __str__(self):
         return str(self.default_from_email)
 
+    def save(self, *args, **kwargs):
+        is_update = not self._state.adding
+        super().save(*args, **kwargs)
+
+        # The instances using this configuration get the new values
+        self.env_rollout = None
+        if is_update and self.env_may_have_changed():
+            self.env_rollout = EnvRollout.start(
+                self.instance_set.all(),
+                reason=gettext("Email config %s updated") % self,
+                email_config=self,
+            )
+        self.mark_env_saved()
+
+    def get_last_env_rollout(self) -> "EnvRollout | None":
+        return self.env_rollouts.order_by("-created_at").first()
+
     def get_absolute_url(self):
         return reverse("instances:emailconfig_detail", kwargs={"pk": self.pk})
 
@@ -75,20 +129,26 @@ class EmailConfig(BaseModel):
         # Secrets are base64 encoded to fit several configs in a single env variable
         # due to a limit in Scalingo https://doc.scalingo.com/platform/app/environment
         # See utils.py/encode_secrets() for encoding function
-        # Format: """1;email;password\n2;email;password"""
-
-        secrets = {}
-        secrets_raw = decode_secrets(settings.EMAIL_SECRETS)
-        secrets_csv = csv.reader(secrets_raw.splitlines(), delimiter=";")
+        secrets = parse_email_secrets(settings.EMAIL_SECRETS)
 
-        for row in secrets_csv:
-            row_id = row[0]
-            secrets[row_id] = {"email": row[1], "password": row[2]}
+        if str(self.email_secrets_id) not in secrets:
+            raise ImproperlyConfigured(
+                f"No email secrets with the ID {self.email_secrets_id} in EMAIL_SECRETS."
+            )
 
         return secrets[str(self.email_secrets_id)]
 
+    def get_secrets_email(self) -> str:
+        """
+        Returns the email of the secrets, or an empty string if they are missing
+        """
+        try:
+            return self.get_secrets()["email"]
+        except ImproperlyConfigured:
+            return ""
+
 
-class Instance(BaseModel):
+class Instance(EnvFieldsMixin, BaseModel):
     name = models.CharField(_("name"), max_length=100, null=False, unique=True)
     slug = models.SlugField(
         _("identifiant"),
@@ -164,6 +224,24 @@ class Instance(BaseModel):
     )
     wagtail_password_reset_enabled = models.BooleanField(_("Allow users to reset their password"), default=True)  # type: ignore
 
+    # Hash of the env variables last applied in Scalingo (see scalingo_set_env)
+    env_hash = models.CharField(
+        _("env variables hash"), max_length=64, blank=True, editable=False
+    )
+    # Names of the global variables last applied, removed from the app once deleted
+    global_env_names = models.JSONField(
+        _("global variables applied"), default=list, blank=True, editable=False
+    )
+
+    # Fields that the env variables depend on (see get_env_variables)
+    ENV_FIELDS = [
+        "status",
+        "host_url",
+        "allowed_hosts",
+        "email_config_id",
+        "wagtail_password_reset_enabled",
+    ]
+
     class Meta:
         verbose_name = _("instance")
         ordering = ["name"]
@@ -225,6 +303,69 @@ class Instance(BaseModel):
     def scalingo_instance_url(self) -> str:
         return f"https://{self.scalingo_instance_host}/"
 
+    def get_remote_state(self) -> "InstanceRemoteState":
+        """
+        Returns the last known remote state, or an empty one if it was never checked
+        """
+        try:
+            return self.remote_state
+        except InstanceRemoteState.DoesNotExist:
+            return InstanceRemoteState(instance=self)
+
+    def refresh_remote_state(self) -> "InstanceRemoteState":
+        """
+        Checks the state of the app and DNS record of the instance, and stores it.
+
+        The calls are all made at the same time, so a refresh takes about as long
+        as the slowest of them.
+        """
+        state = self.get_remote_state()
+        async_to_sync(self.fetch_remote_state)(state)
+
+        state.last_checked_at = timezone.now()
+        state.schedule_next_check()
+        state.save()
+
+        return state
+
+    async def fetch_remote_state(self, state: "InstanceRemoteState") -> None:
+        async with AsyncScalingo(use_secnumcloud=bool(self.use_secnumcloud)) as sc:
+            app_name = str(self.scalingo_application_name)
+
+            calls = [
+                (state.set_dns_records, sc.run(domain_record_check, str(self.slug)))
+            ]
+            if self.status != "REQUEST":
+                calls += [
+                    (state.set_app, sc.app_detail(app_name=app_name)),
+                    (state.set_deployment, sc.app_deployment_latest(app_name=app_name)),
+                    (state.set_variables, sc.app_variables(app_name=app_name)),
+                ]
+            if self.status != "REQUEST" and self.scalingo_db_id:
+                addon_id = str(self.scalingo_db_id)
+                calls.append(
+                    (
+                        state.set_db,
+                        sc.app_addon_detail(app_name=app_name, addon_id=addon_id),
+                    )
+                )
+
+            results = await sc.gather(aw for _setter, aw in calls)
+
+        for (setter, _aw), result in zip(calls, results):
+            setter(result)
+
+    def request_remote_state_check(self) -> Job:
+        """
+        Queues a refresh of the remote state of this instance, e.g. to show the
+        effects of an action. Requests made before the job runs are merged into it.
+        """
+        return Job.enqueue(
+            "instances.refresh_remote_state",
+            {"instance_id": self.pk},
+            dedupe_key=f"instances.refresh_remote_state:{self.pk}",
+        )
+
     def save(self, *args, **kwargs):
         shortened_name = str(self.name)[:42]
         if not self.slug:
@@ -241,14 +382,41 @@ class Instance(BaseModel):
 
         super().save(*args, **kwargs)
 
-        if self.status in ["SCALINGO_DB_PROVISIONED", "FINISHED"]:
-            self.scalingo_set_env()
+        # The env variables are pushed by a background job, so that saving does
+        # not wait for Scalingo
+        if self.status in ENV_SYNC_STATUSES and self.env_may_have_changed():
+            self.request_env_sync()
+        self.mark_env_saved()
+
+    def request_env_sync(self) -> Job:
+        """
+        Queues the update of the env variables in Scalingo. Requests made before
+        the job runs are merged into it, and the worker never runs two updates
+        of the same instance at once (they share the dedupe key).
+        """
+        return Job.enqueue(
+            "instances.sync_env",
+            {"instance_id": self.pk},
+            dedupe_key=f"instances.sync_env:{self.pk}",
+        )
+
+    def get_pending_env_sync(self) -> Job | None:
+        return Job.objects.filter(
+            dedupe_key=f"instances.sync_env:{self.pk}",
+            status__in=["PENDING", "RUNNING"],
+        ).first()
 
     def generate_secret_key(self):
         return secrets.token_hex(50)
 
     def get_env_variables(self):
+        # Variables shared by the whole fleet (reserved names are rejected)
         env_variables = [
+            {"name": variable.name, "value": variable.value}
+            for variable in GlobalVariable.objects.all()
+        ]
+
+        env_variables += [
             {"name": "HOST_URL", "value": self.host_url},
             {"name": "ALLOWED_HOSTS", "value": self.allowed_hosts},
         ]
@@ -302,6 +470,27 @@ class Instance(BaseModel):
 
         return env_variables
 
+    def get_desired_env(self) -> dict:
+        """
+        Returns the non-empty env variables to set in Scalingo as strings, by name,
+        including the email secrets (SECRET_KEY is only generated once)
+        """
+        env_variables = self.get_env_variables()
+
+        if self.email_config:
+            email_secrets = self.email_config.get_secrets()
+            env_variables += [
+                {"name": "EMAIL_HOST_USER", "value": email_secrets["email"]},
+                {"name": "EMAIL_HOST_PASSWORD", "value": email_secrets["password"]},
+            ]
+
+        # Remove empty variables
+        return {row["name"]: str(row["value"]) for row in env_variables if row["value"]}
+
+    @staticmethod
+    def hash_env(env: dict) -> str:
+        return hashlib.sha256(json.dumps(env, sort_keys=True).encode()).hexdigest()
+
     def list_env_variables(self):
         env_variables = self.get_env_variables()
 
@@ -341,27 +530,34 @@ class Instance(BaseModel):
         if self.alwaysdata_subdomain:
             return domain_record_delete(str(self.slug))
 
+    def alwaysdata_subdomain_attach(self):
+        """
+        Uses the sites-beta subdomain as the host of the instance, once its DNS
+        record exists
+        """
+        self.alwaysdata_subdomain = self.alwaysdata_sites_beta_host
+        self.host_url = self.alwaysdata_subdomain
+
+        if str(self.alwaysdata_subdomain) not in str(self.allowed_hosts):
+            self.allowed_hosts = f"{self.allowed_hosts},{self.alwaysdata_subdomain}"
+
+        self.save()
+
+        sc = Scalingo(use_secnumcloud=bool(self.use_secnumcloud))
+
+        sc.app_domain_add(
+            app_name=str(self.scalingo_application_name),
+            domain_name=self.alwaysdata_subdomain,
+            is_canonical=True,
+        )
+
     def alwaysdata_scalingo_set_subdomain(self):
         result = domain_record_add(
             record_type="CNAME", name=str(self.slug), value=self.scalingo_instance_host
         )
 
         if "success" in result:
-            self.alwaysdata_subdomain = self.alwaysdata_sites_beta_host
-            self.host_url = self.alwaysdata_subdomain
-
-            if str(self.alwaysdata_subdomain) not in str(self.allowed_hosts):
-                self.allowed_hosts = f"{self.allowed_hosts},{self.alwaysdata_subdomain}"
-
-            self.save()
-
-            sc = Scalingo(use_secnumcloud=bool(self.use_secnumcloud))
-
-            sc.app_domain_add(
-                app_name=str(self.scalingo_application_name),
-                domain_name=self.alwaysdata_subdomain,
-                is_canonical=True,
-            )
+            self.alwaysdata_subdomain_attach()
 
             return {
                 "status": "success",
@@ -380,34 +576,17 @@ class Instance(BaseModel):
                 + f"<code>{result['errors']}</code>",
             }
 
-    def alwaysdata_subdomain_status(self):
-        """
-        Returns a Boolean as well as a badge showing if the subdomain exists in Alwaysdata
-        """
-
-        domain_exists = len(domain_record_check(str(self.slug)))
-        if domain_exists:
-            return {
-                "status": True,
-                "badge": '<p class="fr-badge fr-badge--success">Entrée présente dans Alwaysdata</p>',
-            }
-        else:
-            return {
-                "status": False,
-                "badge": '<p class="fr-badge fr-badge--warning">Entrée absente dans Alwaysdata</p>',
-            }
-
     def scalingo_create_app(self):
         sc = Scalingo(use_secnumcloud=bool(self.use_secnumcloud))
         app_name = str(self.scalingo_application_name)
 
         result = sc.app_create(app_name=app_name)
 
-        if "errors" in result.keys():
+        if "errors" in result.keys() or "error" in result.keys():
             return {
                 "status": "error",
                 "message": _("Scalingo returned the following error: ")
-                + f"<code>{result['errors']}</code>",
+                + f"<code>{result.get('errors', result.get('error'))}</code>",
             }
         else:
             self.status = "SCALINGO_APP_CREATED"
@@ -434,25 +613,6 @@ class Instance(BaseModel):
         sc = Scalingo(use_secnumcloud=bool(self.use_secnumcloud))
         sc.app_delete(app_name=str(self.scalingo_application_name))
 
-    def scalingo_app_status(self):
-        """
-        Returns the status of the app in Scalingo
-        """
-
-        if self.status == "REQUEST":
-            return ""
-
-        sc = Scalingo(use_secnumcloud=bool(self.use_secnumcloud))
-        result = sc.app_detail(app_name=str(self.scalingo_application_name))
-
-        if "error" in result.keys():
-            return f'<p class="fr-badge fr-badge--error">{result["error"]}</p>'
-        else:
-            status = result["app"]["status"]
-            if status == "new":
-                return '<p class="fr-badge">Nouvelle application</p>'
-            return f'<p class="fr-badge fr-badge--info">{result["app"]["status"]}</p>'
-
     def scalingo_provision_db(self):
         sc = Scalingo(use_secnumcloud=bool(self.use_secnumcloud))
         result = sc.app_addon_provision(
@@ -460,11 +620,11 @@ class Instance(BaseModel):
             plan=settings.DEFAULT_POSTGRESQL_PLAN,
         )
 
-        if "errors" in result.keys():
+        if "errors" in result.keys() or "error" in result.keys():
             return {
                 "status": "error",
                 "message": _("Scalingo returned the following error: ")
-                + f"<code>{result['errors']}</code>",
+                + f"<code>{result.get('errors', result.get('error'))}</code>",
             }
         else:
             self.status = "SCALINGO_DB_PROVISIONED"
@@ -476,64 +636,13 @@ class Instance(BaseModel):
                 "message": "Base de donnée ajouée avec succès à l’instance Scalingo.",
             }
 
-    def scalingo_db_status(self):
-        """
-        Returns the status of the database in Scalingo
-        """
-
-        if self.status in ["REQUEST", "SCALINGO_APP_CREATED"]:
-            return ""
-
-        sc = Scalingo(use_secnumcloud=bool(self.use_secnumcloud))
-        result = sc.app_addon_detail(
-            app_name=str(self.scalingo_application_name),
-            addon_id=str(self.scalingo_db_id),
-        )
-
-        if "error" in result.keys():
-            return f'<p class="fr-badge fr-badge--error">{result["error"]}</p>'
-        else:
-            status = result["addon"]["status"]
-            if status == "provisioning":
-                badge = '<p class="fr-badge">En cours de provisionnement</p>'
-            elif status == "running":
-                badge = '<p class="fr-badge fr-badge--success">En cours d’exécution</p>'
-            else:
-                badge = f'<p class="fr-badge fr-badge--info">{result["addon"]["status"]}</p>'
-
-            return {
-                "status": status,
-                "badge": badge,
-            }
-
-    def scalingo_env_status(self) -> dict:
-        """
-        Checks the presence of the SECRET_KEY variable as a way to verify if env variables have been set
-        """
-        sc = Scalingo(use_secnumcloud=bool(self.use_secnumcloud))
-
-        current_vars = sc.app_variables_dict(
-            app_name=str(self.scalingo_application_name)
-        )
-
-        if "SECRET_KEY" in current_vars:
-            return {
-                "status": True,
-                "badge": '<p class="fr-badge fr-badge--success">Variables d’environnement présentes dans Scalingo</p>',
-            }
-        else:
-            return {
-                "status": False,
-                "badge": '<p class="fr-badge fr-badge--warning">Variables d’environnement absentes dans Scalingo</p>',
-            }
-
     def scalingo_set_env(self) -> dict:
         """
         Set the env variables in Scalingo.
 
         This command can be repeated
         """
-        if self.status not in ["SCALINGO_DB_PROVISIONED", "FINISHED"]:
+        if self.status not in ENV_SYNC_STATUSES:
             return {
                 "status": "error",
                 "message": _(
@@ -541,62 +650,105 @@ class Instance(BaseModel):
                 ),
             }
 
-        env_variables = self.get_env_variables()
-        local_host_url = [
-            d["value"] for d in env_variables if d["name"] == "HOST_URL"
-        ].pop()
+        try:
+            desired_env = self.get_desired_env()
+        except ImproperlyConfigured as e:
+            return {"status": "error", "message": str(e)}
+        env_hash = self.hash_env(desired_env)
+        global_env_names = sorted(GlobalVariable.objects.values_list("name", flat=True))
+
+        # Nothing changed since the last update made from here
+        if self.status == "FINISHED" and env_hash == self.env_hash:
+            return {
+                "status": "success",
+                "message": "Les variables d’environnement sont déjà à jour dans Scalingo.",
+            }
 
         sc = Scalingo(use_secnumcloud=bool(self.use_secnumcloud))
 
-        current_vars = sc.app_variables_dict(
-            app_name=str(self.scalingo_application_name)
-        )
-        scalingo_host_url = current_vars.get("HOST_URL", "")
+        result = sc.app_variables(app_name=str(self.scalingo_application_name))
 
+        if "variables" not in result:
+            return {
+                "status": "error",
+                "message": _("Scalingo returned the following error: ")
+                + f"<code>{result.get('errors', result.get('error'))}</code>",
+            }
+
+        current_vars = {ev["name"]: str(ev["value"]) for ev in result["variables"]}
+
+        # Only the changed variables are sent, as each update restarts the app
+        env_variables = [
+            {"name": name, "value": value}
+            for name, value in desired_env.items()
+            if current_vars.get(name) != value
+        ]
         if "SECRET_KEY" not in current_vars:
             env_variables += [
                 {"name": "SECRET_KEY", "value": self.generate_secret_key()},
             ]
 
-        if self.email_config:
-            env_variables += [
-                {
-                    "name": "EMAIL_HOST_USER",
-                    "value": self.email_config.get_secrets()["email"],
-                },
-                {
-                    "name": "EMAIL_HOST_PASSWORD",
-                    "value": self.email_config.get_secrets()["password"],
-                },
-            ]
+        # The global variables deleted since the last update are removed
+        removed_variables = [
+            ev
+            for ev in result["variables"]
+            if ev["name"] in self.global_env_names and ev["name"] not in desired_env
+        ]
 
-        # Remove empty variables
-        env_variables = [{**row} for row in env_variables if row["value"]]
+        if env_variables:
+            result = sc.app_variables_bulk_update(
+                app_name=str(self.scalingo_application_name), variables=env_variables
+            )
 
-        result = sc.app_variables_bulk_update(
-            app_name=str(self.scalingo_application_name), variables=env_variables
-        )
+            if "variables" not in result:
+                # e.g. {"error": ...}, or {"errors": ...} for a validation error
+                return {
+                    "status": "error",
+                    "message": _("Scalingo returned the following error: ")
+                    + f"<code>{result.get('errors', result.get('error'))}</code>",
+                }
 
-        if "error" in result.keys():
-            return {
-                "status": "error",
-                "message": _("Scalingo returned the following error: ")
-                + f"<code>{result['error']}</code>",
-            }
-        else:
-            # Only do it the first time
-            if self.status == "SCALINGO_DB_PROVISIONED":
-                self.status = "SCALINGO_ENV_VARS_SET"
-                self.save()
-            elif self.status == "FINISHED" and local_host_url != scalingo_host_url:
-                # Only do this on redeploys
-                self.scalingo_set_config()
+        for ev in removed_variables:
+            result = sc.app_variable_delete(
+                app_name=str(self.scalingo_application_name), variable_id=ev["id"]
+            )
+            if "error" in result:
+                return {
+                    "status": "error",
+                    "message": _("Scalingo returned the following error: ")
+                    + f"<code>{result['error']}</code>",
+                }
 
+        # The variables are applied: later syncs can be skipped until they change
+        self.env_hash = env_hash
+        self.global_env_names = global_env_names
+        Instance.objects.filter(pk=self.pk).update(
+            env_hash=env_hash, global_env_names=global_env_names
+        )
+
+        # Only do it the first time
+        if self.status == "SCALINGO_DB_PROVISIONED":
+            # Only the status is saved: this runs in the worker, and the other
+            # fields may have been edited since the instance was loaded
+            self.status = "SCALINGO_ENV_VARS_SET"
+            self.save(update_fields=["status", "updated_at"])
+        elif self.status == "FINISHED" and desired_env.get(
+            "HOST_URL", ""
+        ) != current_vars.get("HOST_URL", ""):
+            # Only do this on redeploys
+            self.scalingo_set_config()
+
+        if not env_variables and not removed_variables:
             return {
                 "status": "success",
-                "message": "Variables d’environnements mises à jour avec succès dans Scalingo.",
+                "message": "Les variables d’environnement sont déjà à jour dans Scalingo.",
             }
 
+        return {
+            "status": "success",
+            "message": "Variables d’environnements mises à jour avec succès dans Scalingo.",
+        }
+
     def scalingo_set_config(self):
         sc = Scalingo(use_secnumcloud=bool(self.use_secnumcloud))
         result = sc.app_run(
@@ -624,63 +776,94 @@ class Instance(BaseModel):
         """
         # This command can be repeated
         sc = Scalingo(use_secnumcloud=bool(self.use_secnumcloud))
-        result = sc.app_deployment_trigger(
-            app_name=str(self.scalingo_application_name),
-            git_ref=str(self.git_branch),
-            source_url=f"https://github.com/numerique-gouv/sites-faciles/archive/{self.git_branch}.tar.gz",
-        )
+        result = sc.app_deployment_trigger(**self.get_deployment_params())
 
-        if "error" in result.keys():
+        return self.deployment_triggered(result)
+
+    def get_deployment_params(self) -> dict:
+        return {
+            "app_name": str(self.scalingo_application_name),
+            "git_ref": str(self.git_branch),
+            "source_url": f"https://github.com/numerique-gouv/sites-faciles/archive/{self.git_branch}.tar.gz",
+        }
+
+    def deployment_triggered(self, result: dict) -> dict:
+        """
+        Updates the instance after a deployment was triggered on Scalingo,
+        and returns the result to display
+        """
+        if "deployment" not in result:
+            # e.g. {"error": ...}, or {"errors": ...} for a validation error
+            error = result.get("error") or result.get("errors") or result
             return {
                 "status": "error",
                 "message": _("Scalingo returned the following error: ")
-                + f"<code>{result['error']}</code>",
+                + f"<code>{error}</code>",
             }
         else:
             # Only update status the first time
             if self.status == "SCALINGO_ENV_VARS_SET":
                 self.status = "SF_CODE_DEPLOYED"
-                self.save()
+                self.save(update_fields=["status", "updated_at"])
+
+            # Follow the new deployment
+            self.request_remote_state_check()
 
             return {
                 "status": "success",
                 "message": "Déploiement lancé avec succès sur l’instance Scalingo.",
             }
 
-    def scalingo_deployment_status(self):
+    @staticmethod
+    async def trigger_deployments(instances: list) -> list:
         """
-        Returns the status of the app in Scalingo
+        Returns the responses of Scalingo to the deployment of the instances,
+        triggered from one client per region (see gather_by_region)
         """
+        return await Instance.gather_by_region(
+            instances,
+            lambda sc, instance: sc.app_deployment_trigger(
+                **instance.get_deployment_params()
+            ),
+        )
 
-        if self.status == "REQUEST":
-            return ""
+    @staticmethod
+    async def gather_by_region(instances: list, call) -> list:
+        """
+        Makes a call for each instance, from one AsyncScalingo client per region
+        with at most MASS_DEPLOY_CONCURRENCY calls at once in each region, and
+        returns the responses in the same order. `call(sc, instance)` returns
+        the awaitable of the call, which is answered by an error if it raises.
+        """
 
-        sc = Scalingo(use_secnumcloud=bool(self.use_secnumcloud))
-        result = sc.app_deployment_list(app_name=str(self.scalingo_application_name))
+        async def gather_region(use_secnumcloud: bool, region_instances: list):
+            async with AsyncScalingo(
+                use_secnumcloud=use_secnumcloud,
+                concurrency=settings.MASS_DEPLOY_CONCURRENCY,
+            ) as sc:
+                results = await sc.gather(
+                    (call(sc, instance) for instance in region_instances),
+                    return_exceptions=True,
+                )
+            return {
+                i.pk: {"error": str(r)} if isinstance(r, Exception) else r
+                for i, r in zip(region_instances, results)
+            }
 
-        if "error" in result.keys():
-            badge = f'<p class="fr-badge fr-badge--error">{result["error"]}</p>'
-            date = _("Unknown")
-            status = "error"
-            log_url = None
-        else:
-            status = result["deployments"][0]["status"]
-            deployment_id = result["deployments"][0]["id"]
-            date = datetime.strptime(
-                result["deployments"][0]["created_at"], "%Y-%m-%dT%H:%M:%S.%f%z"
+        regions = {bool(i.use_secnumcloud) for i in instances}
+        region_results = await asyncio.gather(
+            *(
+                gather_region(
+                    snc, [i for i in instances if bool(i.use_secnumcloud) == snc]
+                )
+                for snc in regions
             )
-            if status == "pushing":
-                badge = '<span class="fr-badge">En cours</span>'
-            elif status == "success":
-                badge = '<span class="fr-badge fr-badge--success">Réussi</span>'
-            elif status in ["build-error", "timeout-error", "crashed-error", "aborted"]:
-                badge = f'<span class="fr-badge fr-badge--error">{status}</span>'
-            else:
-                badge = f'<span>{date}</span> <span class="fr-badge fr-badge--info">{status}</span>'
-
-            log_url = f"{self.scalingo_app_url}/deploy/{deployment_id}"
+        )
 
-        return {"date": date, "status": status, "badge": badge, "log_url": log_url}
+        results = {}
+        for region_result in region_results:
+            results.update(region_result)
+        return [results[i.pk] for i in instances]
 
     def scalingo_create_superusers(self):
         # Not using env var as they do not seem to be read
@@ -735,3 +918,648 @@ class Instance(BaseModel):
                 "status": "success",
                 "message": f"{gettext('Account creation requested for users:')} {self.main_contact.email}, {sf_infra_email}.",
             }
+
+
+class InstanceRemoteState(BaseModel):
+    """
+    Last known state of the Scalingo app and the Alwaysdata record of an instance.
+
+    It is refreshed outside of the page views, so that the pages only read it
+    from the database. Errors returned by the APIs are kept in `errors`, keyed
+    by the part that could not be checked.
+    """
+
+    instance = models.OneToOneField(
+        Instance,
+        on_delete=models.CASCADE,
+        related_name="remote_state",
+        verbose_name=_("instance"),
+    )
+    app_status = models.CharField(_("app status"), max_length=50, blank=True)
+    db_status = models.CharField(_("database status"), max_length=50, blank=True)
+    deployment_id = models.CharField(
+        _("last deployment ID"), max_length=100, blank=True
+    )
+    deployment_status = models.CharField(
+        _("last deployment status"), max_length=50, blank=True
+    )
+    deployment_created_at = models.DateTimeField(
+        _("last deployment date"), null=True, blank=True
+    )
+    env_present = models.BooleanField(_("env variables present"), null=True)  # type: ignore
+    dns_present = models.BooleanField(_("DNS record present"), null=True)  # type: ignore
+    errors = models.JSONField(_("errors"), default=dict, blank=True)
+    last_checked_at = models.DateTimeField(_("last checked at"), null=True, blank=True)
+    next_check_at = models.DateTimeField(
+        _("next check at"), null=True, blank=True, db_index=True
+    )
+
+    class Meta:
+        verbose_name = _("instance remote state")
+
+    def __str__(self):
+        return str(self.instance)
+
+    ## Scheduling of the checks
+    @property
+    def is_check_due(self) -> bool:
+        return self.next_check_at is None or self.next_check_at <= timezone.now()
+
+    @property
+    def is_in_progress(self) -> bool:
+        deployment_in_progress = self.deployment_status not in [
+            "",
+            "error",
+            *FINISHED_DEPLOYMENT_STATUSES,
+        ]
+        return deployment_in_progress or self.db_status == "provisioning"
+
+    @property
+    def check_interval(self) -> timedelta:
+        if self.is_in_progress:
+            return REMOTE_STATE_CHECK_INTERVALS["in_progress"]
+        elif self.errors or self.instance.status != "FINISHED":
+            return REMOTE_STATE_CHECK_INTERVALS["pending"]
+        return REMOTE_STATE_CHECK_INTERVALS["stable"]
+
+    def schedule_next_check(self) -> None:
+        """
+        Sets the next check after the interval matching the current state, with
+        some jitter so that the checks of the fleet do not happen all at once
+        """
+        jitter = secrets.SystemRandom().uniform(
+            1 - REMOTE_STATE_CHECK_JITTER, 1 + REMOTE_STATE_CHECK_JITTER
+        )
+        checked_at = self.last_checked_at or timezone.now()
+        self.next_check_at = checked_at + self.check_interval * jitter
+
+    ## Updates from the API results
+    def set_error(self, part: str, result: dict) -> str:
+        self.errors[part] = str(result.get("errors", result.get("error", result)))
+        return "error"
+
+    def set_app(self, result: dict) -> None:
+        self.errors.pop("app", None)
+        if "app" in result:
+            self.app_status = result["app"]["status"]
+        else:
+            self.app_status = self.set_error("app", result)
+
+    def set_db(self, result: dict) -> None:
+        self.errors.pop("db", None)
+        if "addon" in result:
+            self.db_status = result["addon"]["status"]
+        else:
+            self.db_status = self.set_error("db", result)
+
+    def set_deployment(self, result: dict) -> None:
+        self.errors.pop("deployment", None)
+        if "deployment" in result:
+            deployment = result["deployment"]
+            self.deployment_id = deployment["id"]
+            self.deployment_status = deployment["status"]
+            self.deployment_created_at = parse_datetime(deployment["created_at"])
+        else:
+            self.deployment_id = ""
+            self.deployment_status = self.set_error("deployment", result)
+            self.deployment_created_at = None
+
+    def set_variables(self, result: dict) -> None:
+        """
+        The presence of the SECRET_KEY variable shows that the env variables are set
+        """
+        self.errors.pop("env", None)
+        if "variables" in result:
+            self.env_present = any(
+                v["name"] == "SECRET_KEY" for v in result["variables"]
+            )
+        else:
+            self.set_error("env", result)
+            self.env_present = None
+
+    def set_dns_records(self, records: list | None) -> None:
+        """
+        Records that can't be listed leave the presence of the record unknown
+        """
+        self.errors.pop("dns", None)
+        if records is None:
+            self.set_error("dns", {"error": gettext("The records could not be listed")})
+            self.dns_present = None
+        else:
+            self.dns_present = bool(records)
+
+    ## Badges
+    @property
+    def is_unknown(self) -> bool:
+        return self.last_checked_at is None
+
+    def unknown_badge(self) -> str:
+        return '<p class="fr-badge">État inconnu</p>'
+
+    def error_badge(self, part: str) -> str:
+        return f'<p class="fr-badge fr-badge--error">{self.errors.get(part, "")}</p>'
+
+    @property
+    def app_status_badge(self) -> str:
+        if self.instance.status == "REQUEST":
+            return ""
+        elif self.is_unknown:
+            return self.unknown_badge()
+        elif self.app_status == "error":
+            return self.error_badge("app")
+        elif self.app_status == "new":
+            return '<p class="fr-badge">Nouvelle application</p>'
+        return f'<p class="fr-badge fr-badge--info">{self.app_status}</p>'
+
+    @property
+    def db_status_badge(self) -> str:
+        if self.instance.status in ["REQUEST", "SCALINGO_APP_CREATED"]:
+            return ""
+        elif self.is_unknown or not self.db_status:
+            return self.unknown_badge()
+        elif self.db_status == "error":
+            return self.error_badge("db")
+        elif self.db_status == "provisioning":
+            return '<p class="fr-badge">En cours de provisionnement</p>'
+        elif self.db_status == "running":
+            return '<p class="fr-badge fr-badge--success">En cours d’exécution</p>'
+        return f'<p class="fr-badge fr-badge--info">{self.db_status}</p>'
+
+    @property
+    def deployment_badge(self) -> str:
+        status = self.deployment_status
+
+        if self.is_unknown:
+            return self.unknown_badge()
+        elif status == "error":
+            return self.error_badge("deployment")
+        elif status == "pushing":
+            return '<span class="fr-badge">En cours</span>'
+        elif status == "success":
+            return '<span class="fr-badge fr-badge--success">Réussi</span>'
+        elif status in DEPLOYMENT_ERROR_STATUSES:
+            return f'<span class="fr-badge fr-badge--error">{status}</span>'
+        return f'<span>{self.deployment_created_at}</span> <span class="fr-badge fr-badge--info">{status}</span>'
+
+    @property
+    def deployment_log_url(self) -> str | None:
+        if not self.deployment_id:
+            return None
+        return f"{self.instance.scalingo_app_url}/deploy/{self.deployment_id}"
+
+    @property
+    def env_badge(self) -> str:
+        if self.env_present is None:
+            return self.unknown_badge()
+        elif self.env_present:
+            return '<p class="fr-badge fr-badge--success">Variables d’environnement présentes dans Scalingo</p>'
+        return '<p class="fr-badge fr-badge--warning">Variables d’environnement absentes dans Scalingo</p>'
+
+    @property
+    def dns_badge(self) -> str:
+        if "dns" in self.errors:
+            return self.error_badge("dns")
+        elif self.dns_present is None:
+            return self.unknown_badge()
+        elif self.dns_present:
+            return '<p class="fr-badge fr-badge--success">Entrée présente dans Alwaysdata</p>'
+        return (
+            '<p class="fr-badge fr-badge--warning">Entrée absente dans Alwaysdata</p>'
+        )
+
+
+class GlobalVariable(BaseModel):
+    """
+    Env variable set on all the instances
+    """
+
+    name = models.CharField(
+        _("name"),
+        max_length=100,
+        unique=True,
+        validators=[
+            RegexValidator(
+                r"^[A-Za-z_][A-Za-z0-9_]*$",
+                _("Only letters, digits and underscores are allowed."),
+            )
+        ],
+    )
+    value = models.TextField(_("value"))
+
+    class Meta:
+        verbose_name = _("global variable")
+        ordering = ["name"]
+
+    def __str__(self):
+        return str(self.name)
+
+    def clean(self):
+        if str(self.name).upper() in RESERVED_ENV_NAMES:
+            raise ValidationError(
+                {"name": _("This variable is set from the instance settings.")}
+            )
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.env_rollout = EnvRollout.start(
+            Instance.objects.all(), reason=gettext("Global variable %s updated") % self
+        )
+
+    def delete(self, *args, **kwargs):
+        # The sync removes the variable from the apps it was applied to
+        result = super().delete(*args, **kwargs)
+        self.env_rollout = EnvRollout.start(
+            Instance.objects.all(), reason=gettext("Global variable %s deleted") % self
+        )
+        return result
+
+
+class EnvRollout(BaseModel):
+    """
+    Update of the env variables of several instances, each one made by the
+    sync job of the instance (see instances/jobs.py) so that the worker bounds
+    how many run at once
+    """
+
+    reason = models.CharField(_("reason"), max_length=255)
+    email_config = models.ForeignKey(
+        EmailConfig,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="env_rollouts",
+        verbose_name=_("Email configuration"),
+    )
+
+    class Meta:
+        verbose_name = _("env variables rollout")
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return str(self.reason)
+
+    @classmethod
+    def start(cls, instances, reason: str, email_config=None) -> "EnvRollout | None":
+        """
+        Queues the update of the env variables of the instances that keep them
+        in sync, and returns the rollout (None if no instance is concerned)
+        """
+        instances = list(instances.filter(status__in=ENV_SYNC_STATUSES))
+        if not instances:
+            return None
+
+        rollout = cls.objects.create(reason=reason, email_config=email_config)
+        EnvRolloutItem.objects.bulk_create(
+            EnvRolloutItem(rollout=rollout, instance=instance) for instance in instances
+        )
+        # The items are updated by the sync job of each instance, which is
+        # shared with the other updates requested in the meantime
+        for instance in instances:
+            instance.request_env_sync()
+
+        return rollout
+
+    def count_by_status(self) -> dict:
+        counts = dict(
+            self.items.values_list("status").annotate(models.Count("pk")).order_by()
+        )
+        return {status: counts.get(status, 0) for status, _label in ROLLOUT_STATUSES}
+
+
+class EnvRolloutItem(BaseModel):
+    rollout = models.ForeignKey(
+        EnvRollout,
+        on_delete=models.CASCADE,
+        related_name="items",
+        verbose_name=_("rollout"),
+    )
+    instance = models.ForeignKey(
+        Instance, on_delete=models.CASCADE, verbose_name=_("instance")
+    )
+    status = models.CharField(
+        _("status"), max_length=20, choices=ROLLOUT_STATUSES, default="PENDING"
+    )
+    message = models.TextField(_("message"), blank=True)
+
+    class Meta:
+        verbose_name = _("env variables rollout item")
+        ordering = ["instance__name"]
+
+    def __str__(self):
+        return f"{self.rollout} – {self.instance}"
+
+    @classmethod
+    def set_result(cls, instance_id: int, result: dict) -> None:
+        """
+        Records the result of an update of the env variables of an instance on
+        its rollout items that did not succeed yet
+        """
+        cls.objects.filter(instance_id=instance_id).exclude(status="SUCCESS").update(
+            status="SUCCESS" if result["status"] == "success" else "ERROR",
+            message=result["message"],
+            updated_at=timezone.now(),
+        )
+
+
+def default_canary_size() -> int:
+    return settings.DEPLOY_CANARY_SIZE
+
+
+def default_max_wave_size() -> int:
+    return settings.DEPLOY_MAX_WAVE_SIZE
+
+
+def default_max_failure_rate() -> float:
+    return settings.DEPLOY_MAX_FAILURE_RATE
+
+
+class DeployBatch(BaseModel):
+    """
+    Deployment of the latest version of Sites Faciles on several instances,
+    triggered and followed in the background by the worker (see instances/jobs.py)
+
+    With the WAVES strategy, a canary set of canary_size instances is deployed
+    first, then waves twice as large as the previous one (at most max_wave_size
+    instances), each one once the previous one is deployed and healthy. The batch
+    halts when the share of failed deployments exceeds max_failure_rate.
+    """
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name=_("created by"),
+    )
+    strategy = models.CharField(
+        _("strategy"),
+        max_length=20,
+        choices=DEPLOY_BATCH_STRATEGIES,
+        default="ALL",
+    )
+    canary_size = models.PositiveSmallIntegerField(
+        _("canary size"), default=default_canary_size
+    )
+    max_wave_size = models.PositiveSmallIntegerField(
+        _("maximum wave size"), default=default_max_wave_size
+    )
+    max_failure_rate = models.FloatField(
+        _("maximum failure rate"),
+        default=default_max_failure_rate,
+        validators=[MinValueValidator(0), MaxValueValidator(1)],
+    )
+    finished_at = models.DateTimeField(_("finished at"), null=True, blank=True)
+    halted_at = models.DateTimeField(_("halted at"), null=True, blank=True)
+    halt_reason = models.TextField(_("halt reason"), blank=True)
+
+    class Meta:
+        verbose_name = _("mass deployment")
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return gettext("Mass deployment #%s") % self.pk
+
+    def get_absolute_url(self):
+        return reverse("instances:deploy_batch_detail", kwargs={"pk": self.pk})
+
+    @classmethod
+    def start(cls, instances, created_by=None, strategy: str = "ALL") -> "DeployBatch":
+        """
+        Queues the deployment of the instances, and returns the batch to follow it
+        """
+        batch = cls.objects.create(created_by=created_by, strategy=strategy)
+        instances = list(instances)
+        waves = batch.wave_numbers(len(instances))
+        DeployBatchItem.objects.bulk_create(
+            DeployBatchItem(batch=batch, instance=instance, wave=wave)
+            for instance, wave in zip(instances, waves)
+        )
+        Job.enqueue("instances.deploy_batch", {"batch_id": batch.pk})
+
+        return batch
+
+    def wave_numbers(self, count: int) -> list:
+        """
+        Returns the wave of each of the `count` instances, in order
+        """
+        if self.strategy != "WAVES":
+            return [0] * count
+
+        waves = []
+        size = max(self.canary_size, 1)
+        while len(waves) < count:
+            waves += [len(set(waves))] * size
+            size = min(size * 2, max(self.max_wave_size, 1))
+        return waves[:count]
+
+    @property
+    def is_finished(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def is_halted(self) -> bool:
+        return self.halted_at is not None
+
+    @property
+    def current_wave(self) -> int | None:
+        return (
+            self.items.filter(status="DEPLOYING")
+            .aggregate(models.Min("wave"))
+            .get("wave__min")
+        )
+
+    @property
+    def wave_count(self) -> int:
+        return len(set(self.items.values_list("wave", flat=True)))
+
+    def count_by_status(self) -> dict:
+        counts = dict(
+            self.items.values_list("status").annotate(models.Count("pk")).order_by()
+        )
+        return {
+            status: counts.get(status, 0)
+            for status, _label in DEPLOY_BATCH_ITEM_STATUSES
+        }
+
+    def failure_rate(self) -> float:
+        counts = self.count_by_status()
+        done = counts["SUCCESS"] + counts["ERROR"]
+        return counts["ERROR"] / done if done else 0.0
+
+    def trigger(self) -> None:
+        """
+        Triggers the deployments of the next wave (all the pending ones with
+        the ALL strategy)
+        """
+        pending = self.items.filter(status="PENDING")
+        next_wave = pending.aggregate(models.Min("wave"))["wave__min"]
+        if next_wave is None:
+            return
+
+        items = list(pending.filter(wave=next_wave).select_related("instance"))
+        responses = async_to_sync(Instance.trigger_deployments)(
+            [item.instance for item in items]
+        )
+
+        for item, response in zip(items, responses):
+            item.set_triggered(response)
+
+    def track(self) -> None:
+        """
+        Updates the deployments in progress, and checks that the sites answer
+        once deployed. The ones still running DEPLOY_BATCH_TIMEOUT after their
+        trigger are reported as failed.
+
+        Then halts the batch if too many deployments failed, or triggers the
+        next wave once the current one is over, or marks the batch as finished.
+        """
+        items = list(self.items.filter(status="DEPLOYING").select_related("instance"))
+
+        # The deployments recorded at the trigger are followed, not the latest
+        # ones of the apps, which may have been started by someone else
+        to_fetch = [item for item in items if item.deployment_status != "success"]
+        deployment_ids = {item.instance.pk: item.deployment_id for item in to_fetch}
+        responses = async_to_sync(Instance.gather_by_region)(
+            [item.instance for item in to_fetch],
+            lambda sc, instance: sc.app_deployment_detail(
+                app_name=str(instance.scalingo_application_name),
+                deployment_id=deployment_ids[instance.pk],
+            ),
+        )
+        for item, response in zip(to_fetch, responses):
+            item.set_deployment(response)
+
+        deployed = [item for item in items if item.deployment_status == "success"]
+        health_checks = async_to_sync(Instance.gather_by_region)(
+            [item.instance for item in deployed],
+            lambda sc, instance: sc.run(check_health, instance.scalingo_instance_url),
+        )
+        for item, result in zip(deployed, health_checks):
+            item.set_health(result)
+
+        timeout = timedelta(seconds=settings.DEPLOY_BATCH_TIMEOUT)
+        self.items.filter(
+            status="DEPLOYING", triggered_at__lt=timezone.now() - timeout
+        ).update(
+            status="ERROR",
+            message=gettext("The deployment did not finish in time."),
+            updated_at=timezone.now(),
+        )
+
+        if self.strategy == "WAVES" and self.failure_rate() > self.max_failure_rate:
+            self.halt(
+                gettext("%(rate)d%% of the deployments failed (maximum: %(max)d%%).")
+                % {
+                    "rate": round(self.failure_rate() * 100),
+                    "max": round(self.max_failure_rate * 100),
+                }
+            )
+        elif not self.items.filter(status="DEPLOYING").exists():
+            self.trigger()
+
+        if not self.items.filter(status__in=["PENDING", "DEPLOYING"]).exists():
+            self.finished_at = timezone.now()
+            self.save(update_fields=["finished_at", "updated_at"])
+
+    def halt(self, reason: str) -> None:
+        """
+        Cancels the deployments that are not triggered yet. The ones in
+        progress are still followed.
+        """
+        self.items.filter(status="PENDING").update(
+            status="CANCELLED", updated_at=timezone.now()
+        )
+        if not self.is_halted:
+            self.halted_at = timezone.now()
+            self.halt_reason = reason
+            self.save(update_fields=["halted_at", "halt_reason", "updated_at"])
+
+    def schedule_tracking(self) -> Job:
+        return Job.enqueue(
+            "instances.track_deploy_batch",
+            {"batch_id": self.pk},
+            dedupe_key=f"instances.track_deploy_batch:{self.pk}",
+            run_at=timezone.now()
+            + timedelta(seconds=settings.DEPLOY_BATCH_POLL_INTERVAL),
+        )
+
+
+class DeployBatchItem(BaseModel):
+    batch = models.ForeignKey(
+        DeployBatch,
+        on_delete=models.CASCADE,
+        related_name="items",
+        verbose_name=_("mass deployment"),
+    )
+    instance = models.ForeignKey(
+        Instance, on_delete=models.CASCADE, verbose_name=_("instance")
+    )
+    wave = models.PositiveSmallIntegerField(_("wave"), default=0)
+    status = models.CharField(
+        _("status"),
+        max_length=20,
+        choices=DEPLOY_BATCH_ITEM_STATUSES,
+        default="PENDING",
+    )
+    triggered_at = models.DateTimeField(_("triggered at"), null=True, blank=True)
+    deployment_id = models.CharField(_("deployment ID"), max_length=64, blank=True)
+    deployment_status = models.CharField(
+        _("deployment status"), max_length=50, blank=True
+    )
+    message = models.TextField(_("message"), blank=True)
+
+    class Meta:
+        verbose_name = _("mass deployment item")
+        ordering = ["wave", "instance__name"]
+
+    def __str__(self):
+        return f"{self.batch} – {self.instance}"
+
+    @property
+    def status_color_class(self) -> str:
+        return {
+            "PENDING": "new",
+            "DEPLOYING": "info",
+            "SUCCESS": "success",
+            "ERROR": "error",
+            "CANCELLED": "warning",
+        }[str(self.status)]
+
+    def set_triggered(self, response: dict) -> None:
+        result = self.instance.deployment_triggered(response)
+
+        self.triggered_at = timezone.now()
+        if result["status"] == "success" and "deployment" in response:
+            self.status = "DEPLOYING"
+            self.deployment_id = response["deployment"]["id"]
+            self.deployment_status = response["deployment"]["status"]
+        else:
+            self.status = "ERROR"
+        self.message = result["message"]
+        self.save()
+
+    def set_deployment(self, response: dict) -> None:
+        if "deployment" not in response:
+            # Transient error: the deployment is checked again later
+            self.message = str(response.get("error", ""))
+            self.save()
+            return
+
+        deployment = response["deployment"]
+        self.deployment_status = deployment["status"]
+        if deployment["status"] in DEPLOYMENT_ERROR_STATUSES:
+            self.status = "ERROR"
+            self.message = gettext("The deployment failed.")
+        self.save()
+
+    def set_health(self, result: dict) -> None:
+        """
+        A deployed site that does not answer yet is checked again later, until
+        the timeout of the deployment
+        """
+        if result["status"] == "success":
+            self.status = "SUCCESS"
+            self.message = ""
+        else:
+            self.message = gettext("The site does not answer: %s") % result["message"]
+        self.save()
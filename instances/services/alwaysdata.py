@@ -1,50 +1,302 @@
 #!/usr/bin/python
 
 from django.conf import settings
+from django.core.cache import cache
 
+import codecs
 import json
 import requests
+import threading
+import time
+from urllib.parse import urlsplit
 
-from instances.constants import REQUEST_TIMEOUT
+from core.metrics import record_cache_lookup
+from instances.constants import REQUEST_TIMEOUT, USER_AGENT
+from instances.services.http import get_session, timed_send
+from instances.services.resilience import get_breaker, send_with_resilience
 
-
-ENDPOINT = "https://api.alwaysdata.com/v1/"
+ENDPOINT_HOST = "api.alwaysdata.com"
+ENDPOINT = f"https://{ENDPOINT_HOST}/v1/"
 credentials = (
     f"{settings.ALWAYSDATA_API_KEY} account={settings.ALWAYSDATA_ACCOUNT}",
     "",
 )
 
 
-def domain_record_list() -> dict | list:
-    response = requests.get(
-        f"{ENDPOINT}record/", auth=credentials, timeout=REQUEST_TIMEOUT
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """
+    Makes a query to the API through the pooled, authenticated session
+
+    GET queries are retried on transient errors. Raises requests.RequestException
+    if the API can't be reached, immediately if its circuit breaker is open.
+    """
+    session = get_session(
+        ENDPOINT_HOST, headers={"user-agent": USER_AGENT}, auth=credentials
     )
 
-    if response.status_code == 401:
-        # Happens if the IP is not allowed for the API token
-        return [{"name": "", "domain": ""}]
+    def send():
+        return timed_send(
+            lambda: session.request(method, url, timeout=REQUEST_TIMEOUT, **kwargs),
+            "alwaysdata",
+            method,
+            url.removeprefix(ENDPOINT),
+        )
+
+    return send_with_resilience(send, get_breaker("alwaysdata"), retry=method == "GET")
+
+
+def record_domain_id(record: dict) -> str:
+    """
+    The records refer to their domain by href, e.g. {"href": "/v1/domain/1234/"}
+    """
+    domain = record.get("domain")
+    if not isinstance(domain, dict):
+        return ""
+    return domain.get("href", "").rstrip("/").rsplit("/", 1)[-1]
 
-    return response.json()
 
+def iter_json_array(response: requests.Response, chunk_size: int = 16384):
+    """
+    Yields the items of a JSON array as the response body is downloaded,
+    so that the caller can filter them without holding the whole array
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder(response.encoding or "utf-8")()
+    buffer = ""
+    started = False
 
-def domain_record_check(name: str) -> list:
-    records = domain_record_list()
-    domain = {"href": f"/v1/domain/{settings.ALWAYSDATA_DOMAIN_ID}/"}
+    for chunk in response.iter_content(chunk_size):
+        buffer += text.decode(chunk)
 
-    return [r for r in records if r["name"] == name and r["domain"] == domain]
+        while True:
+            buffer = buffer.lstrip()
+            if not started:
+                if not buffer:
+                    break
+                if buffer[0] != "[":
+                    raise ValueError(f"Expected a JSON array, got: {buffer[:200]}")
+                buffer = buffer[1:]
+                started = True
+                continue
 
+            buffer = buffer.lstrip(", \t\r\n")
+            if buffer.startswith("]"):
+                return
 
-def domain_record_add(record_type: str, name: str, value: str) -> dict:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except ValueError:
+                # The item is not complete yet
+                break
+
+            yield item
+            buffer = buffer[end:]
+
+
+def domain_record_query(
+    domain_id=None,
+    name: str | None = None,
+    record_type: str | None = None,
+) -> list | None:
     """
-    Returns code 201 if successful.
+    Returns the records matching the filters, or None if they can't be listed.
 
+    The filters are sent to the API so that it only returns the matching records.
+    The response is still read as a stream and filtered here as well, so that if
+    the filters are not applied server-side, only the matching records are kept.
     """
+    filters = {"domain": domain_id, "name": name, "type": record_type}
+    params = {k: v for k, v in filters.items() if v is not None}
 
-    # Checking if it already exists to avoid creating duplicates if called several times
-    already_exists = domain_record_check(name)
-    if len(already_exists):
-        return {"warning": f"Record already found for subdomain {name}"}
+    try:
+        response = request("GET", f"{ENDPOINT}record/", params=params, stream=True)
+    except requests.RequestException:
+        return None
+
+    records = []
+    try:
+        if response.status_code != 200:
+            return None
+
+        for record in iter_json_array(response):
+            if domain_id is not None and record_domain_id(record) != str(domain_id):
+                continue
+            if name is not None and record["name"] != name:
+                continue
+            if record_type is not None and record["type"] != record_type:
+                continue
+
+            records.append(record)
+    except (requests.RequestException, ValueError):
+        return None
+    finally:
+        response.close()
+
+    return records
+
+
+class RecordStore:
+    """
+    Cache of the DNS records of the account, indexed by (domain id, name) then type.
+
+    The records of a name are fetched with a filtered query on its first lookup,
+    or for a whole domain at once with load(), and reused for
+    settings.ALWAYSDATA_RECORDS_TTL seconds. The records added or deleted through
+    this module update the store in place, and bump a generation number in the
+    Django cache so that the other workers drop their own copy.
+    """
+
+    GENERATION_KEY = "alwaysdata:records:generation"
+
+    def __init__(self):
+        self.entries = {}
+        self.domains = {}
+        self.generation = None
+        self.lock = threading.RLock()
+
+    def is_fresh(self, fetched_at: float | None) -> bool:
+        if fetched_at is None:
+            return False
+        return time.monotonic() - fetched_at <= settings.ALWAYSDATA_RECORDS_TTL
+
+    def sync_generation(self) -> None:
+        generation = cache.get(self.GENERATION_KEY)
+        if generation != self.generation:
+            self.invalidate()
+            self.generation = generation
+
+    @staticmethod
+    def group(records: list) -> dict:
+        index = {}
+        for record in records:
+            key = (record_domain_id(record), record["name"])
+            index.setdefault(key, {}).setdefault(record["type"], []).append(record)
+        return index
+
+    def cached(self, key: tuple) -> dict | None:
+        """
+        Returns the records of a (domain id, name) by type, or None if unknown
+        """
+        fetched_at, types = self.entries.get(key, (None, None))
+        if self.is_fresh(fetched_at):
+            return types
+
+        if self.is_fresh(self.domains.get(key[0])):
+            # The whole domain was loaded and the name was not in it
+            return {}
+
+        return None
+
+    def load(self, domain_id) -> bool:
+        """
+        Fetches all the records of a domain at once.
+        Returns False, and keeps the store as it was, if they can't be listed.
+        """
+        records = domain_record_query(domain_id)
+        if records is None:
+            return False
+
+        with self.lock:
+            self.sync_generation()
+            now = time.monotonic()
+            domain_id = str(domain_id)
+
+            self.entries = {
+                key: entry for key, entry in self.entries.items() if key[0] != domain_id
+            }
+            for key, types in self.group(records).items():
+                self.entries[key] = (now, types)
+            self.domains[domain_id] = now
+
+        return True
+
+    def lookup(
+        self, domain_id, name: str, record_type: str | None = None
+    ) -> list | None:
+        """
+        Returns the records of a name, of any type unless record_type is given.
+        Returns None if they can't be listed, which is not the same as no record.
+        """
+        key = (str(domain_id), name)
+
+        with self.lock:
+            self.sync_generation()
+            types = self.cached(key)
+
+        record_cache_lookup("alwaysdata_records", types is not None)
+
+        if types is None:
+            records = domain_record_query(domain_id, name=name)
+            if records is None:
+                return None
+
+            types = self.group(records).get(key, {})
+            with self.lock:
+                self.entries[key] = (time.monotonic(), types)
+
+        if record_type:
+            return list(types.get(record_type, []))
+        return [record for records in types.values() for record in records]
+
+    def add(self, record: dict) -> None:
+        key = (record_domain_id(record), record["name"])
 
+        with self.lock:
+            types = self.cached(key)
+            if types is not None:
+                types = {k: list(v) for k, v in types.items()}
+                types.setdefault(record["type"], []).append(record)
+                self.entries[key] = (time.monotonic(), types)
+            self.bump_generation()
+
+    def remove(self, record: dict) -> None:
+        key = (record_domain_id(record), record["name"])
+
+        with self.lock:
+            types = self.cached(key)
+            if types is not None:
+                types = {
+                    k: [r for r in v if r.get("href") != record.get("href")]
+                    for k, v in types.items()
+                }
+                self.entries[key] = (time.monotonic(), types)
+            self.bump_generation()
+
+    def bump_generation(self) -> None:
+        # add() then incr() so that concurrent writers get distinct generations
+        cache.add(self.GENERATION_KEY, 0, timeout=None)
+        try:
+            generation = cache.incr(self.GENERATION_KEY)
+        except ValueError:
+            # The key was evicted in between
+            generation = None
+
+        if generation is not None and generation == (self.generation or 0) + 1:
+            # Nobody else wrote since our last sync: our copy is up to date
+            self.generation = generation
+        else:
+            self.invalidate()
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.entries = {}
+            self.domains = {}
+
+
+records_store = RecordStore()
+
+
+def domain_record_check(name: str, record_type: str | None = None) -> list | None:
+    """
+    Returns the records of a name, or None if they can't be listed
+    """
+    return records_store.lookup(settings.ALWAYSDATA_DOMAIN_ID, name, record_type)
+
+
+def domain_record_create(record_type: str, name: str, value: str) -> dict:
+    """
+    Creates a record, without checking if it already exists
+    """
     data = {
         "domain": int(settings.ALWAYSDATA_DOMAIN_ID),
         "type": record_type,
@@ -52,29 +304,100 @@ def domain_record_add(record_type: str, name: str, value: str) -> dict:
         "value": value,
     }
 
-    response = requests.post(
-        f"{ENDPOINT}record/",
-        auth=credentials,
-        data=json.dumps(data),
-        timeout=REQUEST_TIMEOUT,
-    )
+    try:
+        response = request("POST", f"{ENDPOINT}record/", data=json.dumps(data))
+    except requests.RequestException as e:
+        return {"errors": str(e)}
+
     if response.status_code == 201:
+        records_store.add(
+            {
+                # The API gives the address of the new record in the Location header
+                "href": urlsplit(response.headers.get("Location", "")).path,
+                "domain": {"href": f"/v1/domain/{settings.ALWAYSDATA_DOMAIN_ID}/"},
+                **{k: v for k, v in data.items() if k != "domain"},
+            }
+        )
         return {"success": "subdomain successfully created"}
     else:
         return {"errors": response}
 
 
+def domain_record_add(record_type: str, name: str, value: str) -> dict:
+    """
+    Returns code 201 if successful.
+
+    """
+
+    # Checking if it already exists to avoid creating duplicates if called several times
+    already_exists = domain_record_check(name)
+    if already_exists is None:
+        return {"errors": "The records could not be listed from Alwaysdata."}
+    if len(already_exists):
+        return {"warning": f"Record already found for subdomain {name}"}
+
+    return domain_record_create(record_type, name, value)
+
+
+def domain_record_remove(record: dict) -> None:
+    """
+    Deletes a record, as listed by the API
+    """
+    address = f"{ENDPOINT}{record['href'][4:]}"
+    response = request("DELETE", address)
+
+    if response.status_code != 204:
+        raise ValueError(f"Invalid response: {response.content.decode()}")
+
+    records_store.remove(record)
+
+
 def domain_record_delete(name: str) -> dict:
     """
     Delete the record for name (and any duplicates)
     """
     records = domain_record_check(name)
 
-    for record in records:
-        address = f"{ENDPOINT}{record['href'][4:]}"
-        response = requests.delete(address, auth=credentials, timeout=REQUEST_TIMEOUT)
+    if records is not None and any(not record.get("href") for record in records):
+        # Records added without a known address: get them from the API
+        records_store.invalidate()
+        records = domain_record_check(name)
+
+    if records is None:
+        return {"errors": "The records could not be listed from Alwaysdata."}
 
-        if response.status_code != 204:
-            raise ValueError(f"Invalid response: {response.content.decode()}")
+    for record in records:
+        domain_record_remove(record)
 
     return {"success": "subdomains deleted"}
+
+
+def records_diff(desired: dict, records: list, record_type: str = "CNAME") -> dict:
+    """
+    Compares the desired {name: value} records with the existing ones, and
+    returns the changes needed for each name as {name: {"add": value or None,
+    "delete": [records]}}. The records to delete are the duplicates and those
+    with another value. The names that are not desired are left untouched.
+    """
+    existing = {}
+    for record in records:
+        if record["type"] == record_type and record["name"] in desired:
+            existing.setdefault(record["name"], []).append(record)
+
+    changes = {}
+    for name, value in desired.items():
+        current = existing.get(name, [])
+        matching = [r for r in current if r["value"].rstrip(".") == value.rstrip(".")]
+
+        if matching:
+            # Keep the first correct record, delete the duplicates
+            to_add = None
+            to_delete = [r for r in current if r is not matching[0]]
+        else:
+            to_add = value
+            to_delete = current
+
+        if to_add or to_delete:
+            changes[name] = {"add": to_add, "delete": to_delete}
+
+    return changes
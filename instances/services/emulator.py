@@ -0,0 +1,471 @@
+"""
+In-process emulator of the Scalingo and Alwaysdata APIs.
+
+It is mounted as a requests transport on the pooled sessions (see http.py), so
+the real clients run unchanged against a fleet of fake apps, with a configurable
+latency and error rate. It is used by the tests and the benchmark_instances
+command, and can replace the real APIs on a dev box with PAAS_EMULATOR=True.
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+import json
+import re
+import secrets
+import threading
+import time
+import uuid
+from urllib.parse import parse_qs, urlsplit
+
+from django.conf import settings
+from django.utils import timezone
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+SCALINGO_HOST_PATTERN = re.compile(r"^api\.(?P<region>[a-z0-9-]+)\.scalingo\.com$")
+APP_HOST_PATTERN = re.compile(
+    r"^(?P<app>[a-z0-9-]+)\.(?P<region>[a-z0-9-]+)\.scalingo\.io$"
+)
+ALWAYSDATA_HOST = "api.alwaysdata.com"
+AUTH_HOST = "auth.scalingo.com"
+
+DEFAULT_REGIONS = ["osc-fr1", "osc-secnum-fr1"]
+
+# Duration of the rate-limit windows of the Scalingo API, in seconds
+RATE_LIMIT_WINDOW = 60.0
+
+
+def fake_app_name(index: int) -> str:
+    return f"{settings.SCALINGO_APPLICATION_PREFIX}-fake-{index}"
+
+
+class FakePaaS:
+    """
+    State and behaviour of the emulated APIs.
+
+    - fleet_size: number of running apps created in the standard region
+      (named after fake_app_name(), with a database, variables and a deployment)
+    - latency: seconds spent on each call
+    - error_rate: share of the calls answered with a 503
+    - rate_limit: calls allowed per region and per RATE_LIMIT_WINDOW on the
+      Scalingo API, announced in X-RateLimit-* headers (no limit if 0)
+    - deployment_duration / provisioning_duration: seconds before a new
+      deployment succeeds and a new database is running
+    """
+
+    def __init__(
+        self,
+        fleet_size: int = 0,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit: int = 0,
+        deployment_duration: float = 0.0,
+        provisioning_duration: float = 0.0,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.windows = {}
+        self.deployment_duration = deployment_duration
+        self.provisioning_duration = provisioning_duration
+
+        self.apps = {region: {} for region in DEFAULT_REGIONS}
+        self.records = {}
+        self.calls = Counter()
+        self.lock = threading.Lock()
+        self.random = secrets.SystemRandom()
+
+        for i in range(fleet_size):
+            self.add_app(fake_app_name(i), with_database=True, deployed=True)
+
+    ## Fleet management
+    def add_app(
+        self,
+        name: str,
+        region: str = "osc-fr1",
+        with_database: bool = False,
+        deployed: bool = False,
+    ) -> dict:
+        app = {
+            "app": {
+                "id": uuid.uuid4().hex,
+                "name": name,
+                "status": "running" if deployed else "new",
+                "created_at": self.now(),
+            },
+            "addons": {},
+            "collaborators": [],
+            "deployments": [],
+            "domains": [],
+            "variables": {},
+            # Whether the site answers once its latest deployment succeeded
+            "healthy": True,
+        }
+        self.apps.setdefault(region, {})[name] = app
+
+        if with_database:
+            addon = self.new_addon(ready=True)
+            app["addons"][addon["id"]] = addon
+        if deployed:
+            deployment = self.new_deployment("production", ready=True)
+            app["deployments"].insert(0, deployment)
+            app["app"]["last_deployment_id"] = deployment["id"]
+            app["variables"]["SECRET_KEY"] = "fake"
+
+        return app
+
+    def new_addon(self, ready: bool = False) -> dict:
+        return {
+            "id": uuid.uuid4().hex,
+            "addon_provider": {"id": "postgresql"},
+            "status": "running" if ready else "provisioning",
+            "_ready_at": 0 if ready else time.monotonic() + self.provisioning_duration,
+        }
+
+    def new_deployment(self, git_ref: str, ready: bool = False) -> dict:
+        return {
+            "id": uuid.uuid4().hex,
+            "git_ref": git_ref,
+            "created_at": self.now(),
+            "status": "success" if ready else "pushing",
+            "_ready_at": 0 if ready else time.monotonic() + self.deployment_duration,
+        }
+
+    def set_deployment_status(self, app_name: str, status: str, region="osc-fr1"):
+        # Changes the latest deployment of the app
+        deployment = self.apps[region][app_name]["deployments"][0]
+        deployment["status"] = status
+        deployment["_ready_at"] = None
+
+    @staticmethod
+    def now() -> str:
+        return timezone.now().strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+
+    @staticmethod
+    def public(item: dict) -> dict:
+        return {k: v for k, v in item.items() if not k.startswith("_")}
+
+    def tick(self, item: dict, ready_status: str) -> dict:
+        # Pending deployments and addons complete after their configured duration
+        if item.get("_ready_at") and time.monotonic() >= item["_ready_at"]:
+            item["status"] = ready_status
+            item["_ready_at"] = None
+        return item
+
+    ## Transport
+    def handle(self, request: requests.PreparedRequest):
+        """
+        Returns the status code, payload and headers of the response to a request
+        """
+        url = urlsplit(request.url)
+        host = url.hostname
+        path = url.path.strip("/").split("/")[1:]  # Strips the "v1" prefix
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        body = json.loads(request.body) if request.body else {}
+
+        with self.lock:
+            self.calls[(host, request.method)] += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self.error_rate and self.random.random() < self.error_rate:
+            return 503, {"error": "Service Unavailable (emulated)"}, {}
+
+        with self.lock:
+            if host == AUTH_HOST:
+                return 200, {"token": f"fake-bearer-{uuid.uuid4().hex}"}, {}
+            elif host == ALWAYSDATA_HOST:
+                return self.handle_alwaysdata(request.method, path, query, body)
+
+            match = SCALINGO_HOST_PATTERN.match(host or "")
+            if match:
+                region = match.group("region")
+                if not self.rate_limit:
+                    return self.handle_scalingo(
+                        region, request.method, path, query, body
+                    )
+
+                allowed, headers = self.count_against_limit(region)
+                if not allowed:
+                    return 429, {"error": "Too Many Requests (emulated)"}, headers
+                status, payload, extra = self.handle_scalingo(
+                    region, request.method, path, query, body
+                )
+                return status, payload, {**extra, **headers}
+
+            match = APP_HOST_PATTERN.match(host or "")
+            if match:
+                return self.handle_site(match.group("region"), match.group("app"))
+
+        return 404, {"error": f"Unknown host {host}"}, {}
+
+    def count_against_limit(self, region: str) -> tuple[bool, dict]:
+        """
+        Counts a call in the current window of the region, and returns whether
+        it is allowed with the rate-limit headers
+        """
+        now = time.monotonic()
+        started_at, used = self.windows.get(region, (now, 0))
+        if now - started_at >= RATE_LIMIT_WINDOW:
+            started_at, used = now, 0
+
+        reset_in = started_at + RATE_LIMIT_WINDOW - now
+        if used >= self.rate_limit:
+            return False, {
+                "X-RateLimit-Remaining": "0",
+                "X-RateLimit-Reset": f"{reset_in:.3f}",
+                "Retry-After": f"{reset_in:.3f}",
+            }
+
+        self.windows[region] = (started_at, used + 1)
+        return True, {
+            "X-RateLimit-Remaining": str(self.rate_limit - used - 1),
+            "X-RateLimit-Reset": f"{reset_in:.3f}",
+        }
+
+    @staticmethod
+    def paginate(items: list, key: str, query: dict):
+        if "page" not in query:
+            return {key: items}
+
+        page = int(query["page"])
+        per_page = int(query.get("per_page", 30))
+        start = (page - 1) * per_page
+        total_pages = max((len(items) + per_page - 1) // per_page, 1)
+
+        return {
+            key: items[start : start + per_page],
+            "meta": {
+                "pagination": {
+                    "current_page": page,
+                    "prev_page": page - 1 if page > 1 else None,
+                    "next_page": page + 1 if page < total_pages else None,
+                    "total_pages": total_pages,
+                    "total_count": len(items),
+                }
+            },
+        }
+
+    def handle_scalingo(self, region, method, path, query, body):  # NOSONAR
+        apps = self.apps.setdefault(region, {})
+        not_found = (404, {"error": "not found"}, {})
+
+        if path == ["apps"]:
+            if method == "GET":
+                items = [self.public(a["app"]) for a in apps.values()]
+                return 200, self.paginate(items, "apps", query), {}
+            name = body["app"]["name"]
+            if name in apps:
+                return 422, {"errors": {"name": ["has already been taken"]}}, {}
+            return 201, {"app": self.public(self.add_app(name, region)["app"])}, {}
+
+        if path == ["projects"]:
+            return 200, self.paginate([], "projects", query), {}
+        if path == ["users", "self"]:
+            return 200, {"user": {"email": "emulator@example.com"}}, {}
+
+        if len(path) < 2 or path[0] != "apps" or path[1] not in apps:
+            return not_found
+
+        app = apps[path[1]]
+        resource = path[2] if len(path) > 2 else None
+
+        if resource is None:
+            if method == "DELETE":
+                del apps[path[1]]
+                return 204, None, {}
+            elif method == "PATCH":
+                app["app"].update(body.get("app", {}))
+            return 200, {"app": self.public(app["app"])}, {}
+
+        if resource == "addons":
+            if len(path) == 4:
+                addon = app["addons"].get(path[3])
+                if addon is None:
+                    return not_found
+                if method == "DELETE":
+                    del app["addons"][path[3]]
+                    return 204, None, {}
+                return 200, {"addon": self.public(self.tick(addon, "running"))}, {}
+            if method == "POST":
+                addon = self.new_addon()
+                app["addons"][addon["id"]] = addon
+                return 201, {"addon": self.public(addon)}, {}
+            addons = [
+                self.public(self.tick(a, "running")) for a in app["addons"].values()
+            ]
+            return 200, {"addons": addons}, {}
+
+        if resource == "collaborators":
+            if method == "POST":
+                collaborator = {"email": body["collaborator"]["email"]}
+                app["collaborators"].append(collaborator)
+                return 201, {"collaborator": collaborator}, {}
+            return 200, {"collaborators": app["collaborators"]}, {}
+
+        if resource == "deployments":
+            if len(path) == 4:
+                deployment = next(
+                    (d for d in app["deployments"] if d["id"] == path[3]), None
+                )
+                if deployment is None:
+                    return not_found
+                return (
+                    200,
+                    {"deployment": self.public(self.tick(deployment, "success"))},
+                    {},
+                )
+            if method == "POST":
+                deployment = self.new_deployment(body["deployment"]["git_ref"])
+                app["deployments"].insert(0, deployment)
+                app["app"]["status"] = "running"
+                app["app"]["last_deployment_id"] = deployment["id"]
+                return 201, {"deployment": self.public(deployment)}, {}
+            items = [self.public(self.tick(d, "success")) for d in app["deployments"]]
+            return 200, self.paginate(items, "deployments", query), {}
+
+        if resource == "variables":
+            if method == "DELETE":
+                if app["variables"].pop(path[3], None) is None:
+                    return not_found
+                return 204, None, {}
+            if method == "PUT":
+                for variable in body.get("variables", []):
+                    app["variables"][variable["name"]] = variable["value"]
+            variables = [
+                {"id": name, "name": name, "value": value}
+                for name, value in app["variables"].items()
+            ]
+            return 200, {"variables": variables}, {}
+
+        if resource == "restart":
+            return 202, None, {}
+        if resource == "run":
+            return 200, {"container": {"command": body.get("command")}}, {}
+        if resource == "domains":
+            domain = {"id": uuid.uuid4().hex, **body.get("domain", {})}
+            app["domains"].append(domain)
+            return 201, {"domain": domain}, {}
+
+        return not_found
+
+    def handle_site(self, region, app_name):
+        """
+        Answers the requests made to the public URL of an app
+        """
+        app = self.apps.get(region, {}).get(app_name)
+        if app is None:
+            return 404, {"error": "no such app"}, {}
+
+        latest = app["deployments"][0] if app["deployments"] else None
+        if latest is None or self.tick(latest, "success")["status"] != "success":
+            return 503, {"error": "app not deployed"}, {}
+        if not app["healthy"]:
+            return 500, {"error": "Server Error (emulated)"}, {}
+
+        return 200, {}, {}
+
+    def handle_alwaysdata(self, method, path, query, body):
+        if path == ["record"]:
+            if method == "POST":
+                record_id = len(self.records) + 1
+                self.records[record_id] = {
+                    "id": record_id,
+                    "href": f"/v1/record/{record_id}/",
+                    "domain": {"href": f"/v1/domain/{body['domain']}/"},
+                    "type": body["type"],
+                    "name": body["name"],
+                    "value": body["value"],
+                }
+                return 201, None, {"Location": f"/v1/record/{record_id}/"}
+
+            records = list(self.records.values())
+            if "domain" in query:
+                domain = {"href": f"/v1/domain/{query['domain']}/"}
+                records = [r for r in records if r["domain"] == domain]
+            for field in ["name", "type"]:
+                if field in query:
+                    records = [r for r in records if r[field] == query[field]]
+            return 200, records, {}
+
+        if len(path) == 2 and path[0] == "record" and method == "DELETE":
+            if self.records.pop(int(path[1]), None) is None:
+                return 404, {"error": "not found"}, {}
+            return 204, None, {}
+
+        return 404, {"error": "not found"}, {}
+
+
+class EmulatorAdapter(BaseAdapter):
+    """
+    requests transport answering from a FakePaaS instead of the network
+    """
+
+    def __init__(self, paas: FakePaaS):
+        super().__init__()
+        self.paas = paas
+
+    def send(
+        self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None
+    ):
+        status_code, payload, headers = self.paas.handle(request)
+
+        response = requests.Response()
+        response.status_code = status_code
+        response.reason = "Emulated"
+        response.headers = CaseInsensitiveDict(
+            {"Content-Type": "application/json", **headers}
+        )
+        response._content = b"" if payload is None else json.dumps(payload).encode()
+        response._content_consumed = True
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+
+        return response
+
+    def close(self):
+        pass
+
+
+_active_emulator = None
+
+
+def get_active_emulator() -> FakePaaS | None:
+    """
+    Returns the emulator that new sessions should be mounted on, if any
+    """
+    global _active_emulator
+
+    if _active_emulator is None and settings.PAAS_EMULATOR:
+        _active_emulator = FakePaaS(
+            fleet_size=settings.PAAS_EMULATOR_FLEET_SIZE,
+            latency=settings.PAAS_EMULATOR_LATENCY,
+            error_rate=settings.PAAS_EMULATOR_ERROR_RATE,
+        )
+
+    return _active_emulator
+
+
+@contextmanager
+def emulated_paas(**options):
+    """
+    Routes all the Scalingo and Alwaysdata calls to a new FakePaaS while active
+    """
+    global _active_emulator
+
+    # Imported here as http.py uses this module to mount the emulator
+    from instances.services.http import close_sessions
+
+    previous = _active_emulator
+    paas = FakePaaS(**options)
+
+    close_sessions()
+    _active_emulator = paas
+    try:
+        yield paas
+    finally:
+        close_sessions()
+        _active_emulator = previous
@@ -0,0 +1,160 @@
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from core.metrics import OUTBOUND_REQUEST_DURATION, OUTBOUND_REQUESTS
+from instances.constants import USER_AGENT
+from instances.services.emulator import EmulatorAdapter, get_active_emulator
+
+DEFAULT_HEADERS = {
+    "Accept": "application/json",
+    "Content-Type": "application/json",
+    "user-agent": USER_AGENT,
+}
+
+# Connect and read timeouts of the health checks of the sites, in seconds
+HEALTH_CHECK_TIMEOUT = (3.05, 10)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def transport_retry() -> Retry:
+    """
+    Only retries the errors raised before the request reaches the server
+    (DNS, refused or reset connections), which are safe for every HTTP method.
+    """
+    return Retry(
+        total=None,
+        connect=settings.OUTBOUND_HTTP_CONNECT_RETRIES,
+        read=0,
+        redirect=0,
+        status=0,
+        other=0,
+        backoff_factor=0.2,
+        raise_on_status=False,
+    )
+
+
+def get_session(host: str, headers: dict | None = None, auth=None) -> requests.Session:
+    """
+    Returns the long-lived session for a host, creating it on first use.
+
+    Sessions keep a pool of keep-alive connections so that the TLS handshake
+    is only paid once per pooled connection instead of once per call.
+    """
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(headers or DEFAULT_HEADERS)
+            session.auth = auth
+
+            paas = get_active_emulator()
+            if paas is not None:
+                adapter = EmulatorAdapter(paas)
+            else:
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=settings.OUTBOUND_HTTP_POOL_SIZE,
+                    max_retries=transport_retry(),
+                )
+            session.mount(f"https://{host}/", adapter)
+            session.mount(f"http://{host}/", adapter)
+
+            _sessions[host] = session
+
+        return session
+
+
+def close_sessions() -> None:
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def response_json(response: requests.Response):
+    """
+    Returns the decoded body of a response, or an {"error": ...} dict when it
+    is not JSON (throttled calls, error pages from a proxy...)
+    """
+    try:
+        return response.json()
+    except ValueError:
+        return {"error": f"HTTP {response.status_code}: {response.text[:200]}"}
+
+
+def endpoint_template(path: str) -> str:
+    """
+    Returns the path of a call with its identifiers replaced by placeholders,
+    e.g. "apps/sf-site/deployments?page=2" -> "apps/{app}/deployments",
+    so that the metrics have one series per endpoint and not per object.
+    """
+    parts = path.split("?")[0].strip("/").split("/")
+
+    if parts[0] == "apps" and len(parts) > 1:
+        parts[1] = "{app}"
+        if len(parts) > 3:
+            parts[3] = "{id}"
+
+    return "/".join(re.sub(r"^\d+$", "{id}", part) for part in parts)
+
+
+def timed_send(
+    send, service: str, method: str, path: str, region: str = ""
+) -> requests.Response:
+    """
+    Calls `send()` and records the number and duration of the call,
+    labelled with its endpoint and its status code (or "error" if it raised)
+    """
+    status = "error"
+    start = time.perf_counter()
+
+    try:
+        response = send()
+        status = response.status_code
+        return response
+    finally:
+        labels = {
+            "service": service,
+            "region": region,
+            "method": method,
+            "endpoint": endpoint_template(path),
+            "status": status,
+        }
+        OUTBOUND_REQUESTS.inc(**labels)
+        OUTBOUND_REQUEST_DURATION.observe(time.perf_counter() - start, **labels)
+
+
+def check_health(url: str) -> dict:
+    """
+    Checks that a site answers with a successful status code (after redirects),
+    and returns {"status": "success"} or {"status": "error", "message": ...}
+    """
+    host = urlsplit(url).hostname
+
+    def send():
+        # A short-lived session: the sites are checked too rarely to keep a pool
+        with requests.Session() as session:
+            paas = get_active_emulator()
+            if paas is not None:
+                session.mount(f"https://{host}/", EmulatorAdapter(paas))
+            return session.get(
+                url, headers={"user-agent": USER_AGENT}, timeout=HEALTH_CHECK_TIMEOUT
+            )
+
+    try:
+        response = timed_send(send, "health_check", "GET", "/")
+    except requests.RequestException as e:
+        return {"status": "error", "message": str(e)}
+
+    if not response.ok:
+        return {"status": "error", "message": f"HTTP {response.status_code}"}
+    return {"status": "success"}
@@ -0,0 +1,138 @@
+from email.utils import parsedate_to_datetime
+import threading
+import time
+
+from django.utils import timezone
+
+
+class TokenBucket:
+    """
+    Token bucket pacing the outbound calls made with one API token.
+
+    The bucket is thread-safe, so it is shared by the synchronous clients and by
+    the worker threads of the asynchronous client. Its rate adapts to the API:
+    it is halved and paused when a call is throttled, and grows slowly after
+    successful calls. When the API sends rate-limit headers, the rate grows up to
+    the pace they allow, above the configured rate if they allow more. Without
+    them, the configured rate is the ceiling: nothing tells how far it is safe
+    to go, and finding out through throttled calls would slow down every caller
+    sharing the token.
+    """
+
+    def __init__(self, rate: float, burst: int, min_rate: float = 0.5):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self) -> float:
+        """
+        Blocks until a call can be made and returns the time waited, in seconds
+        """
+        waited = 0.0
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+
+            time.sleep(wait)
+            waited += wait
+
+    def throttled(self, retry_after: float | None = None) -> None:
+        """
+        The API refused a call: slow down, and wait as long as it asked to
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.rate = max(self.rate / 2, self.min_rate)
+            self.tokens = 0.0
+            self.updated_at = now
+            self.blocked_until = max(
+                self.blocked_until, now + (retry_after or 1 / self.rate)
+            )
+
+    def succeeded(
+        self, remaining: int | None = None, reset_in: float | None = None
+    ) -> None:
+        """
+        A call went through: grow the rate, within what the API still allows
+        """
+        with self.lock:
+            ceiling = self.max_rate
+
+            if remaining is not None and reset_in:
+                if remaining <= 0:
+                    self.blocked_until = time.monotonic() + reset_in
+                else:
+                    # Spread the remaining calls over the rest of the window
+                    ceiling = max(remaining / reset_in, self.min_rate)
+
+            self.rate = min(ceiling, self.rate + self.max_rate / 20)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(key, rate: float, burst: int) -> TokenBucket:
+    """
+    Returns the bucket shared by every caller using the same key
+    """
+    with _buckets_lock:
+        if key not in _buckets:
+            _buckets[key] = TokenBucket(rate=rate, burst=burst)
+        return _buckets[key]
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Retry-After is either a number of seconds or an HTTP date
+    """
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        return max((parsedate_to_datetime(value) - timezone.now()).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_rate_limit_headers(headers) -> tuple[int | None, float | None]:
+    """
+    Returns the remaining calls and the seconds until the limit resets,
+    from the X-RateLimit-* (or RateLimit-*) headers if present
+    """
+    remaining = headers.get("X-RateLimit-Remaining", headers.get("RateLimit-Remaining"))
+    reset = headers.get("X-RateLimit-Reset", headers.get("RateLimit-Reset"))
+
+    try:
+        remaining = int(remaining) if remaining is not None else None
+        reset_in = float(reset) if reset is not None else None
+    except ValueError:
+        return None, None
+
+    if reset_in is not None and reset_in > 1_000_000_000:
+        # The reset is given as a timestamp rather than a delay
+        reset_in = max(reset_in - time.time(), 0.0)
+
+    return remaining, reset_in
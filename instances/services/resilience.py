@@ -0,0 +1,136 @@
+import secrets
+import threading
+import time
+
+from django.conf import settings
+import requests
+
+# Statuses returned by a gateway in front of an API that is unavailable or overloaded
+RETRYABLE_STATUSES = {502, 503, 504}
+
+
+class CircuitOpenError(requests.RequestException):
+    """
+    Raised instead of making a call to an endpoint that is known to be failing
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops calling an endpoint after several consecutive failures.
+
+    Once open, calls fail immediately for `reset_timeout` seconds. A single
+    trial call is then let through: the circuit closes again if it succeeds,
+    and stays open for another period if it fails.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started_at = None
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+
+            now = time.monotonic()
+            if now - self.opened_at < self.reset_timeout:
+                return False
+
+            # Half-open: one trial call at a time
+            if (
+                self.trial_started_at
+                and now - self.trial_started_at < self.reset_timeout
+            ):
+                return False
+
+            self.trial_started_at = now
+            return True
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_started_at = None
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            self.trial_started_at = None
+
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """
+    Returns the circuit breaker of an endpoint, shared by the whole process
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                reset_timeout=settings.CIRCUIT_BREAKER_RESET_TIMEOUT,
+            )
+        return _breakers[name]
+
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Exponential backoff with full jitter, so that retries from concurrent
+    callers do not hit the endpoint at the same time
+    """
+    ceiling = min(
+        settings.OUTBOUND_RETRY_MAX_DELAY,
+        settings.OUTBOUND_RETRY_BASE_DELAY * 2**attempt,
+    )
+    return secrets.SystemRandom().uniform(0, ceiling)
+
+
+def send_with_resilience(
+    send, breaker: CircuitBreaker, retry: bool = False
+) -> requests.Response:
+    """
+    Makes a call through the circuit breaker of its endpoint.
+
+    Only idempotent calls should be retried (`retry=True`): they are sent again
+    after connection errors, timeouts and gateway errors, with a jittered backoff.
+    """
+    attempts = settings.OUTBOUND_RETRIES + 1 if retry else 1
+
+    for attempt in range(attempts):
+        if not breaker.allow():
+            raise CircuitOpenError(f"{breaker.name} is unavailable, try again later")
+
+        is_last_attempt = attempt + 1 == attempts
+
+        try:
+            response = send()
+        except (requests.ConnectionError, requests.Timeout):
+            breaker.record_failure()
+            if is_last_attempt:
+                raise
+        else:
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+            if response.status_code not in RETRYABLE_STATUSES or is_last_attempt:
+                return response
+
+        time.sleep(backoff_delay(attempt))
@@ -1,115 +1,363 @@
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
-from django.utils import timezone
+from django.core.cache import cache
+from django.db import connections
+import asyncio
+import functools
+import hashlib
 import requests
 import re
+import threading
+import time
+import uuid
+
+from instances.constants import (
+    BEARER_TOKEN_LIFETIME,
+    BEARER_TOKEN_RENEWAL_MARGIN,
+    USER_AGENT,
+    POSTGRESQL_PLAN,
+    REQUEST_TIMEOUT,
+    SCALINGO_PAGE_SIZE,
+)
+from core.metrics import record_cache_lookup
+from instances.services.http import get_session, response_json, timed_send
+from instances.services.resilience import get_breaker, send_with_resilience
+from instances.services.ratelimit import (
+    get_bucket,
+    parse_rate_limit_headers,
+    parse_retry_after,
+)
+
+STANDARD_REGION = "osc-fr1"
+SECNUMCLOUD_REGION = "osc-secnum-fr1"
+
+STANDARD_ENDPOINT = f"api.{STANDARD_REGION}.scalingo.com"
+SECNUMCLOUD_ENDPOINT = f"api.{SECNUMCLOUD_REGION}.scalingo.com"
+AUTH_ENDPOINT = "auth.scalingo.com"
+
+
+def api_token_id() -> str:
+    """
+    A short, non-secret identifier of the Scalingo API token in use
+    """
+    return hashlib.sha256(settings.SCALINGO_API_TOKEN.encode()).hexdigest()[:12]
+
+
+class BearerTokenStore:
+    """
+    Keeps the bearer tokens obtained from the token exchange, one per region.
+
+    Tokens are kept in memory for the current process and in the Django cache
+    so that they are shared between all the gunicorn workers. Renewal is
+    single-flight: concurrent callers in a process wait on a lock, and other
+    processes wait on a short-lived lock key in the cache.
+    """
+
+    LOCK_TIMEOUT = 30
+    LOCK_POLL_INTERVAL = 0.1
+
+    def __init__(self):
+        self._tokens = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def cache_key(self, region: str) -> str:
+        # The API token is part of the key so that rotating it invalidates the cache
+        return f"scalingo:bearer:{region}:{api_token_id()}"
+
+    def get(self, region: str, exchange) -> str:
+        """
+        Returns a valid bearer token for the region, calling `exchange()` at most
+        once across the process and the other workers if it has to be renewed.
+        """
+        token = self._get_local(region)
+        record_cache_lookup("scalingo_bearer_tokens", token is not None)
+        if token:
+            return token
+
+        with self._lock_for(region):
+            # Another thread may have renewed it while we were waiting
+            token = self._get_local(region)
+            if token:
+                return token
+
+            key = self.cache_key(region)
+            entry = cache.get(key) or self._wait_or_exchange(key, exchange)
+            self._tokens[region] = entry
+
+            return entry["token"]
+
+    def invalidate(self, region: str) -> None:
+        with self._lock_for(region):
+            self._tokens.pop(region, None)
+            cache.delete(self.cache_key(region))
+
+    def _get_local(self, region: str) -> str | None:
+        entry = self._tokens.get(region)
+        if entry and entry["expires_at"] > time.time():
+            return entry["token"]
+        return None
+
+    def _lock_for(self, region: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(region, threading.Lock())
+
+    def _wait_or_exchange(self, key: str, exchange) -> dict:
+        lock_key = f"{key}:lock"
+        deadline = time.monotonic() + self.LOCK_TIMEOUT
+
+        while not cache.add(lock_key, 1, timeout=self.LOCK_TIMEOUT):
+            # Another worker is renewing the token
+            time.sleep(self.LOCK_POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry:
+                return entry
+            if time.monotonic() > deadline:
+                break
+
+        try:
+            ttl = (BEARER_TOKEN_LIFETIME - BEARER_TOKEN_RENEWAL_MARGIN).total_seconds()
+            entry = {"token": exchange(), "expires_at": time.time() + ttl}
+            cache.set(key, entry, timeout=int(ttl))
+        finally:
+            cache.delete(lock_key)
+
+        return entry
+
+
+bearer_tokens = BearerTokenStore()
+
+
+def cache_resource(query_path: str) -> tuple[str, str | None]:
+    """
+    Returns the scope of a query path (the app name, or "" for the collections
+    of the region) and its resource type, which defines its time to live.
+    """
+    parts = query_path.split("?")[0].strip("/").split("/")
+
+    if parts[0] == "apps" and len(parts) > 1:
+        app_name = parts[1]
+        if len(parts) == 2:
+            return app_name, "app"
+        elif len(parts) == 3:
+            return app_name, parts[2]
+        elif len(parts) == 4 and parts[2] == "addons":
+            return app_name, "addon"
+        return app_name, None
+
+    if len(parts) == 1:
+        return "", parts[0]
+
+    return "", None
+
 
-from instances.constants import USER_AGENT, POSTGRESQL_PLAN, REQUEST_TIMEOUT
+class ResponseCache:
+    """
+    Read-through cache of the GET responses of a region, keyed by path.
 
-STANDARD_ENDPOINT = "api.osc-fr1.scalingo.com"
-SECNUMCLOUD_ENDPOINT = "api.osc-secnum-fr1.scalingo.com"
+    The entries of an app are stored under a version of the app, which is
+    replaced after every write on it. Older entries can then no longer be read,
+    including those stored by a read that was in flight during the write.
+    """
+
+    def __init__(self, region: str):
+        self.region = region
+
+    def version_key(self, scope: str) -> str:
+        return f"scalingo:{self.region}:{scope or '*'}:version"
+
+    def version(self, scope: str) -> str:
+        key = self.version_key(scope)
+        version = cache.get(key)
+
+        if version is None:
+            cache.add(key, uuid.uuid4().hex[:12], timeout=None)
+            version = cache.get(key)
+
+        return version
+
+    def key(self, query_path: str) -> tuple[str | None, int]:
+        """
+        Returns the cache key of a path and its time to live,
+        or (None, 0) if the path is not cached.
+        """
+        scope, resource = cache_resource(query_path)
+        ttl = settings.SCALINGO_CACHE_TTL.get(resource, 0)
+
+        if not ttl:
+            return None, 0
+
+        version = self.version(scope)
+        return f"scalingo:{self.region}:{scope or '*'}:{version}:{query_path}", ttl
+
+    def invalidate(self, query_path: str) -> None:
+        scope, resource = cache_resource(query_path)
+        keys = [self.version_key(scope)]
+
+        if scope and resource == "app":
+            # Creating, renaming or deleting an app changes the apps list
+            keys.append(self.version_key(""))
+
+        cache.delete_many(keys)
 
 
 class Scalingo:
     def __init__(self, use_secnumcloud: bool = False):
         if use_secnumcloud:
-            self.endpoint_url = f"https://{SECNUMCLOUD_ENDPOINT}/v1/"
+            self.region = SECNUMCLOUD_REGION
+            self.endpoint_host = SECNUMCLOUD_ENDPOINT
         else:
-            self.endpoint_url = f"https://{STANDARD_ENDPOINT}/v1/"
+            self.region = STANDARD_REGION
+            self.endpoint_host = STANDARD_ENDPOINT
+        self.endpoint_url = f"https://{self.endpoint_host}/v1/"
         self.agent = USER_AGENT
 
-        self.bearer_token = self.connect_session()
-        self.bearer_token_time = timezone.now()
+        # Keep-alive connections are shared by all the clients of the region
+        self.session = get_session(self.endpoint_host)
+        self.response_cache = ResponseCache(self.region)
+        self.circuit_breaker = get_breaker(self.region)
+        self.rate_limiter = get_bucket(
+            ("scalingo", api_token_id(), self.region),
+            rate=settings.SCALINGO_RATE_LIMIT,
+            burst=settings.SCALINGO_RATE_BURST,
+        )
 
     ## Session-related methods
+    @property
+    def bearer_token(self) -> str:
+        """
+        The bearer token is shared by all the clients of a region, see BearerTokenStore
+        """
+        return bearer_tokens.get(self.region, self.connect_session)
+
     def connect_session(self):
         """Exchanges the token for a bearer token that lasts one hour"""
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "user-agent": self.agent,
-        }
 
-        response = requests.post(
-            "https://auth.scalingo.com/v1/tokens/exchange",
-            headers=headers,
-            auth=("", settings.SCALINGO_API_TOKEN),
-            timeout=REQUEST_TIMEOUT,
-        )
+        def send():
+            return get_session(AUTH_ENDPOINT).post(
+                f"https://{AUTH_ENDPOINT}/v1/tokens/exchange",
+                auth=("", settings.SCALINGO_API_TOKEN),
+                timeout=REQUEST_TIMEOUT,
+            )
+
+        response = timed_send(send, "scalingo_auth", "POST", "tokens/exchange")
 
         if "token" not in response.json():
             raise ValueError("Token not found. Response contains: ", response.json())
         return response.json()["token"]
 
-    def check_session(self):
+    ## HTTP methods
+    def request(
+        self, method: str, query_path: str, idempotent: bool | None = None, **kwargs
+    ) -> requests.Response:
         """
-        Renew the bearer token if it approaches the time limit
+        Makes a query to the endpoint through the pooled session of the region
+
+        Idempotent queries (GET and PUT by default) are retried on transient
+        errors. Raises requests.RequestException if the endpoint can't be reached,
+        immediately if its circuit breaker is open.
         """
-        if timezone.now() - self.bearer_token_time >= timezone.timedelta(minutes=55):
-            self.bearer_token = self.connect_session()
-            self.bearer_token_time = timezone.now()
+        if idempotent is None:
+            idempotent = method in ["GET", "PUT"]
 
-    ## HTTP methods
-    def delete(self, query_path: str, params: dict = {}) -> int:
+        def send():
+            return self._send_paced(method, query_path, **kwargs)
+
+        try:
+            response = send_with_resilience(send, self.circuit_breaker, idempotent)
+
+            if response.status_code == 401:
+                # The shared bearer token may have been revoked, get a new one once
+                bearer_tokens.invalidate(self.region)
+                response = send_with_resilience(send, self.circuit_breaker, idempotent)
+        finally:
+            if method != "GET":
+                # Even a failed write may have changed the state of the app
+                self.response_cache.invalidate(query_path)
+
+        return response
+
+    def _send_paced(self, method: str, query_path: str, **kwargs) -> requests.Response:
         """
-        Makes a DELETE query to the endpoint and returns the result
+        Sends the query when the rate limiter allows it. Throttled queries (429)
+        were not processed by the API, so they are sent again after the delay
+        it asked for.
         """
-        self.check_session()
+        for _attempt in range(settings.SCALINGO_RATE_LIMIT_RETRIES + 1):
+            self.rate_limiter.acquire()
+            response = self._send(method, query_path, **kwargs)
 
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "user-agent": self.agent,
-            "Authorization": f"Bearer {self.bearer_token}",
-        }
+            if response.status_code != 429:
+                self.rate_limiter.succeeded(*parse_rate_limit_headers(response.headers))
+                break
 
-        response = requests.delete(
-            self.endpoint_url + query_path,
-            headers=headers,
-            params=params,
-            timeout=REQUEST_TIMEOUT,
-        )
+            self.rate_limiter.throttled(
+                parse_retry_after(response.headers.get("Retry-After"))
+            )
+
+        return response
+
+    def _send(self, method: str, query_path: str, **kwargs) -> requests.Response:
+        headers = {"Authorization": f"Bearer {self.bearer_token}"}
+
+        def send():
+            return self.session.request(
+                method,
+                self.endpoint_url + query_path,
+                headers=headers,
+                timeout=REQUEST_TIMEOUT,
+                **kwargs,
+            )
+
+        return timed_send(send, "scalingo", method, query_path, region=self.region)
+
+    def delete(self, query_path: str, params: dict = {}) -> int:
+        """
+        Makes a DELETE query to the endpoint and returns the result
+        """
+        try:
+            response = self.request("DELETE", query_path, params=params)
+        except requests.RequestException:
+            return 503
 
         # Returns 204 No Content
         return response.status_code
 
-    def get(self, query_path: str) -> dict:
+    def get(self, query_path: str, use_cache: bool = True) -> dict:
         """
         Makes a GET query to the endpoint and returns the result
+
+        Results are cached for a duration depending on the resource
+        (see settings.SCALINGO_CACHE_TTL), unless use_cache is False.
         """
-        self.check_session()
+        key, ttl = self.response_cache.key(query_path)
 
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "user-agent": self.agent,
-            "Authorization": f"Bearer {self.bearer_token}",
-        }
+        if key and use_cache:
+            result = cache.get(key)
+            record_cache_lookup("scalingo_responses", result is not None)
+            if result is not None:
+                return result
 
-        response = requests.get(
-            self.endpoint_url + query_path, headers=headers, timeout=REQUEST_TIMEOUT
-        )
+        try:
+            response = self.request("GET", query_path)
+        except requests.RequestException as e:
+            return {"error": str(e)}
+
+        result = response_json(response)
 
-        return response.json()
+        if key and response.status_code == 200:
+            cache.set(key, result, timeout=ttl)
+
+        return result
 
     def patch(self, query_path: str, json_data: dict) -> dict:
         """
         Makes a PATCH query to the endpoint and returns the result
         """
-        self.check_session()
-
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "user-agent": self.agent,
-            "Authorization": f"Bearer {self.bearer_token}",
-        }
-
-        response = requests.patch(
-            self.endpoint_url + query_path,
-            headers=headers,
-            json=json_data,
-            timeout=REQUEST_TIMEOUT,
-        )
+        try:
+            response = self.request("PATCH", query_path, json=json_data)
+        except requests.RequestException as e:
+            return {"status_code": 503, "error": str(e)}
 
         return {"status_code": response.status_code}
 
@@ -118,68 +366,81 @@ class Scalingo:
         query_path: str,
         json_data: dict | None = None,
         empty_response: bool = False,
+        idempotent: bool = False,
     ) -> dict:
         """
         Makes a POST query to the endpoint and returns the result
         """
-        self.check_session()
-
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "user-agent": self.agent,
-            "Authorization": f"Bearer {self.bearer_token}",
-        }
-
-        if json_data:
-            response = requests.post(
-                self.endpoint_url + query_path,
-                headers=headers,
-                json=json_data,
-                timeout=REQUEST_TIMEOUT,
-            )
-        else:
-            response = requests.post(
-                self.endpoint_url + query_path, headers=headers, timeout=REQUEST_TIMEOUT
-            )
+        try:
+            if json_data:
+                response = self.request(
+                    "POST", query_path, idempotent=idempotent, json=json_data
+                )
+            else:
+                response = self.request("POST", query_path, idempotent=idempotent)
+        except requests.RequestException as e:
+            if empty_response:
+                return {"status_code": 503, "error": str(e)}
+            return {"error": str(e)}
 
         if empty_response:
             return {"status_code": response.status_code}
         else:
-            return response.json()
+            return response_json(response)
 
     def put(self, query_path: str, json_data: dict | None = None) -> dict:
         """
         Makes a PUT query to the endpoint and returns the result
         """
-        self.check_session()
+        try:
+            if json_data:
+                response = self.request("PUT", query_path, json=json_data)
+            else:
+                response = self.request("PUT", query_path)
+        except requests.RequestException as e:
+            return {"error": str(e)}
+
+        return response_json(response)
+
+    def iter_collection(
+        self, query_path: str, key: str, per_page: int = SCALINGO_PAGE_SIZE
+    ):
+        """
+        Lazily yields the items of a collection, fetching one page at a time.
 
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "user-agent": self.agent,
-            "Authorization": f"Bearer {self.bearer_token}",
-        }
+        No more pages are requested once the caller stops iterating. Collections
+        that are not paginated by the API are returned by the first request.
+        """
+        page = 1
 
-        if json_data:
-            response = requests.put(
-                self.endpoint_url + query_path,
-                headers=headers,
-                json=json_data,
-                timeout=REQUEST_TIMEOUT,
-            )
-        else:
-            response = requests.put(
-                self.endpoint_url + query_path, headers=headers, timeout=REQUEST_TIMEOUT
-            )
+        while page:
+            result = self.get(f"{query_path}?page={page}&per_page={per_page}")
 
-        return response.json()
+            if key not in result:
+                raise ValueError(
+                    f"Scalingo returned the following error on {query_path}: {result}"
+                )
+
+            yield from result[key]
+
+            page = result.get("meta", {}).get("pagination", {}).get("next_page")
 
     ## App related methods
+    def iter_apps(self, per_page: int = SCALINGO_PAGE_SIZE):
+        return self.iter_collection("apps/", "apps", per_page=per_page)
+
     def apps_list(self):
-        apps = self.get("apps/")
+        return sorted([x["name"] for x in self.iter_apps()])
 
-        return sorted([x["name"] for x in apps["apps"]])
+    def apps_index(self) -> dict:
+        """
+        Returns all the apps of the region, keyed by name, from the apps listing.
+        Returns {"error": ...} if the listing failed.
+        """
+        try:
+            return {"apps": {x["name"]: x for x in self.iter_apps()}}
+        except ValueError as e:
+            return {"error": str(e)}
 
     def app_create(self, app_name: str) -> dict:
         pattern = re.compile("^([a-z0-9-]+)+$")
@@ -258,6 +519,34 @@ class Scalingo:
     def app_deployment_list(self, app_name: str):
         return self.get(f"apps/{app_name}/deployments")
 
+    def iter_deployments(self, app_name: str, per_page: int = SCALINGO_PAGE_SIZE):
+        """
+        Yields the deployments of the app, most recent first
+        """
+        return self.iter_collection(
+            f"apps/{app_name}/deployments", "deployments", per_page=per_page
+        )
+
+    def app_deployment_latest(self, app_name: str) -> dict:
+        """
+        Returns only the most recent deployment of the app, from a one-item page
+        """
+        result = self.get(f"apps/{app_name}/deployments?page=1&per_page=1")
+
+        if "deployments" not in result:
+            return result
+        elif not result["deployments"]:
+            return {"error": "No deployment found"}
+
+        return {"deployment": result["deployments"][0]}
+
+    def app_deployment_detail(self, app_name: str, deployment_id: str) -> dict:
+        """
+        Returns a deployment of the app, never from the cache: it is used to
+        follow a deployment in progress
+        """
+        return self.get(f"apps/{app_name}/deployments/{deployment_id}", use_cache=False)
+
     def app_deployment_trigger(self, app_name: str, git_ref: str, source_url: str):
         # Deploy from a git repository
         json_data = {
@@ -280,8 +569,12 @@ class Scalingo:
         """
         json_data = {"scope": scope}
 
+        # Restarting twice is harmless, so the query can be retried
         result = self.post(
-            f"apps/{app_name}/restart", json_data=json_data, empty_response=True
+            f"apps/{app_name}/restart",
+            json_data=json_data,
+            empty_response=True,
+            idempotent=True,
         )
 
         if result["status_code"] == 202:
@@ -368,14 +661,156 @@ class Scalingo:
         result = self.put(f"apps/{app_name}/variables", json_data=json_data)
         return result
 
+    def app_variable_delete(self, app_name: str, variable_id: str) -> dict:
+        result = self.delete(f"apps/{app_name}/variables/{variable_id}")
+
+        if result == 204:
+            return {"success": "variable successfully deleted"}
+        else:
+            return {"error": "error when deleting variable"}
+
     ## Project-related methods
-    def projects_list(self):
-        res = self.get("projects/")
+    def iter_projects(self, per_page: int = SCALINGO_PAGE_SIZE):
+        return self.iter_collection("projects/", "projects", per_page=per_page)
 
-        return [(x["name"], x["id"]) for x in res["projects"]]
+    def projects_list(self):
+        return [(x["name"], x["id"]) for x in self.iter_projects()]
 
     ## User related methods
     def user_info(self):
         user_data = self.get("users/self")
 
         return user_data
+
+
+def _async_method(name: str):
+    sync_method = getattr(Scalingo, name)
+
+    async def method(self, *args, **kwargs):
+        return await self.run(getattr(self.client, name), *args, **kwargs)
+
+    method.__name__ = name
+    method.__doc__ = sync_method.__doc__
+    return method
+
+
+class AsyncScalingo:
+    """
+    asyncio version of the Scalingo client, meant to query or act on many apps
+    from a single event loop.
+
+    The calls are made by a synchronous client in a thread pool sized to the
+    concurrency, so they share its pooled session and the bearer token of the
+    region. `gather()` bounds how many calls are in flight at the same time.
+
+    The calls read the database cache, so each thread of the pool keeps a
+    database connection open until the client is closed.
+    """
+
+    # Seconds that the threads wait for each other to close their connections
+    CLOSE_TIMEOUT = 5
+
+    def __init__(self, use_secnumcloud: bool = False, concurrency: int | None = None):
+        self.client = Scalingo(use_secnumcloud=use_secnumcloud)
+        self.region = self.client.region
+        self.concurrency = concurrency or settings.SCALINGO_CONCURRENCY
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix=f"scalingo-{self.region}"
+        )
+        self.calls = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        # One task per thread of the pool: each one waits for the others, so
+        # that they all run on different threads, and closes the connections
+        # of its thread
+        threads = min(self.calls, self.concurrency)
+        if threads:
+            barrier = threading.Barrier(threads, timeout=self.CLOSE_TIMEOUT)
+            for _ in range(threads):
+                self.executor.submit(self._close_connections, barrier)
+
+        self.executor.shutdown(wait=False)
+
+    @staticmethod
+    def _close_connections(barrier: threading.Barrier) -> None:
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+        finally:
+            connections.close_all()
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Runs a blocking callable in the thread pool of the client
+        """
+        loop = asyncio.get_running_loop()
+        self.calls += 1
+        return await loop.run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs)
+        )
+
+    async def gather(self, aws, return_exceptions: bool = False) -> list:
+        """
+        Awaits the coroutines with at most `concurrency` of them running at once,
+        and returns their results in order.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(aw):
+            async with semaphore:
+                return await aw
+
+        return await asyncio.gather(
+            *(bounded(aw) for aw in aws), return_exceptions=return_exceptions
+        )
+
+    ## HTTP methods
+    delete = _async_method("delete")
+    get = _async_method("get")
+    patch = _async_method("patch")
+    post = _async_method("post")
+    put = _async_method("put")
+
+    ## App related methods
+    apps_list = _async_method("apps_list")
+    apps_index = _async_method("apps_index")
+    app_create = _async_method("app_create")
+    app_delete = _async_method("app_delete")
+    app_detail = _async_method("app_detail")
+    app_settings_update = _async_method("app_settings_update")
+
+    ## App / addon related methods
+    app_addon_detail = _async_method("app_addon_detail")
+    app_addon_list = _async_method("app_addon_list")
+    app_addon_provision = _async_method("app_addon_provision")
+    app_addon_remove = _async_method("app_addon_remove")
+    app_collaborators_list = _async_method("app_collaborators_list")
+    app_collaborators_invite = _async_method("app_collaborators_invite")
+    app_deployment_list = _async_method("app_deployment_list")
+    app_deployment_detail = _async_method("app_deployment_detail")
+    app_deployment_latest = _async_method("app_deployment_latest")
+    app_deployment_trigger = _async_method("app_deployment_trigger")
+    app_restart = _async_method("app_restart")
+    app_run = _async_method("app_run")
+
+    ## Domain related methods
+    app_domain_add = _async_method("app_domain_add")
+
+    ## App / environment related methods
+    app_variables = _async_method("app_variables")
+    app_variables_dict = _async_method("app_variables_dict")
+    app_variables_bulk_update = _async_method("app_variables_bulk_update")
+    app_variable_delete = _async_method("app_variable_delete")
+
+    ## Project-related methods
+    projects_list = _async_method("projects_list")
+
+    ## User related methods
+    user_info = _async_method("user_info")
@@ -0,0 +1,159 @@
+import io
+import json
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+import requests
+
+from instances.services.alwaysdata import (
+    ENDPOINT_HOST,
+    domain_record_add,
+    domain_record_check,
+    domain_record_create,
+    domain_record_delete,
+    domain_record_query,
+    records_store,
+)
+from instances.models import Instance
+from instances.services.emulator import emulated_paas
+from instances.tests.test_models import InstanceTestCase
+from instances.tests.test_scalingo import LOCMEM_CACHES
+
+
+@override_settings(ALWAYSDATA_DOMAIN_ID="42", ALWAYSDATA_RECORDS_TTL=300)
+class RecordStoreTestCase(TestCase):
+    def setUp(self):
+        records_store.invalidate()
+
+    def test_lookups_are_filtered_and_cached(self):
+        with emulated_paas() as paas:
+            domain_record_add("CNAME", "alpha", "alpha.osc-fr1.scalingo.io")
+            domain_record_add("CNAME", "beta", "beta.osc-fr1.scalingo.io")
+
+            alpha = domain_record_check("alpha")
+            self.assertEqual(domain_record_check("alpha", "CNAME"), alpha)
+            self.assertEqual(domain_record_check("alpha", "A"), [])
+            self.assertEqual(domain_record_check("gamma"), [])
+
+        self.assertEqual(len(alpha), 1)
+        self.assertEqual(alpha[0]["value"], "alpha.osc-fr1.scalingo.io")
+        # One filtered query per name
+        self.assertEqual(paas.calls[(ENDPOINT_HOST, "GET")], 3)
+
+    def test_loaded_domain_answers_all_lookups(self):
+        with emulated_paas() as paas:
+            domain_record_add("CNAME", "alpha", "alpha.osc-fr1.scalingo.io")
+            records_store.invalidate()
+
+            self.assertTrue(records_store.load("42"))
+            self.assertEqual(len(domain_record_check("alpha")), 1)
+            self.assertEqual(domain_record_check("gamma"), [])
+
+        self.assertEqual(paas.calls[(ENDPOINT_HOST, "GET")], 2)
+
+    def test_unfiltered_listing_is_filtered_locally(self):
+        records = [
+            {
+                "href": f"/v1/record/{i}/",
+                "domain": {"href": "/v1/domain/42/"},
+                "type": "CNAME",
+                "name": f"site-{i}",
+                "value": "example.com",
+            }
+            for i in range(2000)
+        ]
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = io.BytesIO(json.dumps(records).encode())
+
+        # The API ignores the filters and returns every record
+        with mock.patch("instances.services.alwaysdata.request", return_value=response):
+            result = domain_record_query("42", name="site-3")
+
+        self.assertEqual(result, [records[3]])
+
+    def test_records_are_not_added_while_they_cant_be_listed(self):
+        with emulated_paas() as paas:
+            domain_record_add("CNAME", "alpha", "alpha.osc-fr1.scalingo.io")
+            records_store.invalidate()
+
+            with mock.patch(
+                "instances.services.alwaysdata.domain_record_query", return_value=None
+            ):
+                self.assertIsNone(domain_record_check("alpha"))
+                result = domain_record_add(
+                    "CNAME", "alpha", "alpha.osc-fr1.scalingo.io"
+                )
+
+        self.assertIn("errors", result)
+        self.assertEqual(len(paas.records), 1)
+
+    def test_writes_update_the_store_in_place(self):
+        with emulated_paas() as paas:
+            self.assertEqual(domain_record_check("alpha"), [])
+
+            domain_record_add("CNAME", "alpha", "alpha.osc-fr1.scalingo.io")
+            self.assertEqual(len(domain_record_check("alpha")), 1)
+
+            domain_record_delete("alpha")
+            self.assertEqual(domain_record_check("alpha"), [])
+
+        self.assertEqual(paas.calls[(ENDPOINT_HOST, "GET")], 1)
+        self.assertEqual(paas.records, {})
+
+
+@override_settings(
+    ALWAYSDATA_DOMAIN_ID="42",
+    ALWAYSDATA_ROOT_DOMAIN="example.com",
+    CACHES=LOCMEM_CACHES,
+)
+class ReconcileDnsTestCase(InstanceTestCase):
+    def setUp(self):
+        records_store.invalidate()
+
+    def test_zone_is_reconciled_from_one_listing(self):
+        alpha, beta, gamma = Instance.objects.order_by("name")
+
+        with emulated_paas() as paas:
+            paas.add_app("sf-alpha", deployed=True)
+            paas.add_app("sf-beta", deployed=True)
+            paas.add_app("sf-gamma", region="osc-secnum-fr1", deployed=True)
+
+            # Alpha is correct, Beta is duplicated with a wrong value, Gamma missing
+            domain_record_create("CNAME", "alpha", alpha.scalingo_instance_host)
+            domain_record_create("CNAME", "beta", "old.example.com")
+            domain_record_create("CNAME", "beta", beta.scalingo_instance_host)
+            domain_record_create("CNAME", "beta", beta.scalingo_instance_host)
+            domain_record_create("A", "www", "192.0.2.1")
+            paas.calls.clear()
+
+            call_command("reconcile_dns", attach=True, stdout=io.StringIO())
+
+        records = sorted((r["name"], r["value"]) for r in paas.records.values())
+        self.assertEqual(
+            records,
+            [
+                ("alpha", alpha.scalingo_instance_host),
+                ("beta", beta.scalingo_instance_host),
+                ("gamma", gamma.scalingo_instance_host),
+                ("www", "192.0.2.1"),
+            ],
+        )
+        self.assertEqual(paas.calls[(ENDPOINT_HOST, "GET")], 1)
+        self.assertEqual(paas.calls[(ENDPOINT_HOST, "DELETE")], 2)
+        self.assertEqual(paas.calls[(ENDPOINT_HOST, "POST")], 1)
+
+        gamma.refresh_from_db()
+        self.assertEqual(gamma.alwaysdata_subdomain, "gamma.example.com")
+
+    def test_instances_are_only_attached_on_request(self):
+        gamma = Instance.objects.get(name="Gamma")
+
+        with emulated_paas() as paas:
+            call_command("reconcile_dns", stdout=io.StringIO())
+
+        self.assertEqual(len(paas.records), 3)
+        gamma.refresh_from_db()
+        self.assertEqual(gamma.alwaysdata_subdomain, "")
+        self.assertEqual(paas.calls[("api.osc-secnum-fr1.scalingo.com", "POST")], 0)
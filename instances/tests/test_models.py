@@ -0,0 +1,788 @@
+from datetime import timedelta
+import io
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from contacts.models import Contact
+from instances.admin import GlobalVariableAdmin
+from instances.constants import REMOTE_STATE_CHECK_INTERVALS
+from instances.management.commands.refresh_instances import LOCK_KEY, Command
+from instances.models import (
+    DeployBatch,
+    EmailConfig,
+    EnvRollout,
+    GlobalVariable,
+    Instance,
+    InstanceRemoteState,
+)
+from instances.services import ratelimit
+from instances.services.alwaysdata import records_store
+from instances.services.emulator import emulated_paas, fake_app_name
+from instances.services.scalingo import Scalingo
+from instances.tests.test_scalingo import LOCMEM_CACHES
+from instances.utils import decode_secrets, encode_secrets, parse_email_secrets
+from jobs.models import Job
+
+
+class InstanceTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.contact = Contact.objects.create(
+            first_name="Camille", last_name="Dupont", email="camille@example.com"
+        )
+
+        for name, use_secnumcloud in [
+            ("Alpha", False),
+            ("Beta", False),
+            ("Gamma", True),
+        ]:
+            Instance.objects.create(
+                name=name, main_contact=cls.contact, use_secnumcloud=use_secnumcloud
+            )
+
+        # Bypasses save() which would request an update of the env variables
+        Instance.objects.update(status="FINISHED")
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ALWAYSDATA_DOMAIN_ID="42")
+class RemoteStateTestCase(InstanceTestCase):
+    def setUp(self):
+        cache.clear()
+        records_store.invalidate()
+
+    def test_refresh_stores_the_remote_state(self):
+        alpha = Instance.objects.get(name="Alpha")
+
+        with emulated_paas() as paas:
+            app = paas.add_app("sf-alpha", with_database=True, deployed=True)
+            alpha.scalingo_db_id = next(iter(app["addons"]))
+            paas.set_deployment_status("sf-alpha", "build-error")
+
+            alpha.refresh_remote_state()
+
+        state = Instance.objects.get(name="Alpha").remote_state
+        self.assertEqual(state.app_status, "running")
+        self.assertEqual(state.db_status, "running")
+        self.assertEqual(state.deployment_status, "build-error")
+        self.assertTrue(state.env_present)
+        self.assertFalse(state.dns_present)
+        self.assertIsNotNone(state.last_checked_at)
+        self.assertIn("build-error", state.deployment_badge)
+
+    def test_errors_are_stored_per_part(self):
+        beta = Instance.objects.get(name="Beta")
+
+        with emulated_paas():
+            state = beta.refresh_remote_state()
+
+        self.assertEqual(state.app_status, "error")
+        self.assertEqual(state.deployment_status, "error")
+        self.assertIn("not found", state.app_status_badge)
+        self.assertEqual(set(state.errors), {"app", "deployment", "env"})
+
+    def test_unlisted_records_leave_the_dns_state_unknown(self):
+        alpha = Instance.objects.get(name="Alpha")
+
+        with (
+            emulated_paas() as paas,
+            mock.patch(
+                "instances.services.alwaysdata.domain_record_query", return_value=None
+            ),
+        ):
+            paas.add_app("sf-alpha", deployed=True)
+            state = alpha.refresh_remote_state()
+
+        self.assertIsNone(state.dns_present)
+        self.assertIn("dns", state.errors)
+        self.assertIn("fr-badge--error", state.dns_badge)
+
+    def test_state_is_unknown_until_checked(self):
+        state = Instance.objects.get(name="Gamma").get_remote_state()
+
+        self.assertIsNone(state.pk)
+        self.assertIn("État inconnu", state.app_status_badge)
+
+    def test_checks_are_scheduled_by_state(self):
+        with emulated_paas() as paas:
+            paas.add_app("sf-alpha", deployed=True)
+            paas.add_app("sf-beta", deployed=True)
+            paas.set_deployment_status("sf-beta", "pushing")
+
+            alpha = Instance.objects.get(name="Alpha").refresh_remote_state()
+            beta = Instance.objects.get(name="Beta").refresh_remote_state()
+
+        for state, interval in [
+            (alpha, REMOTE_STATE_CHECK_INTERVALS["stable"]),
+            (beta, REMOTE_STATE_CHECK_INTERVALS["in_progress"]),
+        ]:
+            delay = state.next_check_at - state.last_checked_at
+            self.assertGreaterEqual(delay, interval * 0.8)
+            self.assertLessEqual(delay, interval * 1.2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ALWAYSDATA_DOMAIN_ID="42")
+class RefreshInstancesTestCase(InstanceTestCase):
+    def setUp(self):
+        cache.clear()
+        records_store.invalidate()
+
+    @mock.patch.object(Command, "MIN_INSTANCES_FOR_LISTING", 1)
+    def test_fleet_is_refreshed_in_one_pass(self):
+        with emulated_paas() as paas:
+            paas.add_app("sf-alpha", deployed=True)
+            paas.add_app("sf-gamma", region="osc-secnum-fr1", deployed=True)
+            paas.set_deployment_status("sf-gamma", "pushing", region="osc-secnum-fr1")
+
+            call_command("refresh_instances", stdout=io.StringIO())
+
+        states = {
+            state.instance.name: state
+            for state in InstanceRemoteState.objects.select_related("instance")
+        }
+        self.assertEqual(states["Alpha"].app_status, "running")
+        self.assertEqual(states["Alpha"].deployment_status, "success")
+        self.assertTrue(states["Alpha"].env_present)
+        self.assertEqual(states["Beta"].app_status, "error")
+        self.assertEqual(states["Gamma"].deployment_status, "pushing")
+        self.assertFalse(states["Gamma"].dns_present)
+
+        # One listing per region, then the deployment and variables of each app
+        self.assertEqual(paas.calls[("api.osc-fr1.scalingo.com", "GET")], 3)
+        self.assertEqual(paas.calls[("api.osc-secnum-fr1.scalingo.com", "GET")], 3)
+        self.assertEqual(paas.calls[("api.alwaysdata.com", "GET")], 1)
+
+    @mock.patch.object(Command, "MIN_INSTANCES_FOR_LISTING", 1)
+    def test_unchanged_parts_are_not_checked_again(self):
+        with emulated_paas() as paas:
+            paas.add_app("sf-alpha", deployed=True)
+            paas.add_app("sf-gamma", region="osc-secnum-fr1", deployed=True)
+            paas.set_deployment_status("sf-gamma", "pushing", region="osc-secnum-fr1")
+
+            call_command("refresh_instances", stdout=io.StringIO())
+            cache.clear()
+            paas.calls.clear()
+            call_command("refresh_instances", "--all", stdout=io.StringIO())
+
+        # Only the deployment in progress is checked again
+        self.assertEqual(paas.calls[("api.osc-fr1.scalingo.com", "GET")], 1)
+        self.assertEqual(paas.calls[("api.osc-secnum-fr1.scalingo.com", "GET")], 2)
+
+    def test_only_due_checks_are_made(self):
+        with emulated_paas() as paas:
+            paas.add_app("sf-alpha", deployed=True)
+
+            call_command("refresh_instances", stdout=io.StringIO())
+            InstanceRemoteState.objects.filter(instance__name="Beta").update(
+                next_check_at=timezone.now() - timedelta(seconds=1)
+            )
+            paas.calls.clear()
+            call_command("refresh_instances", stdout=io.StringIO())
+
+        # Only Beta is due: its app is fetched alone instead of listing the region
+        self.assertEqual(paas.calls[("api.osc-fr1.scalingo.com", "GET")], 1)
+        self.assertEqual(paas.calls[("api.osc-secnum-fr1.scalingo.com", "GET")], 0)
+
+    def test_runs_do_not_overlap(self):
+        cache.add(LOCK_KEY, 1)
+        stderr = io.StringIO()
+
+        with emulated_paas() as paas:
+            call_command("refresh_instances", stdout=io.StringIO(), stderr=stderr)
+
+        self.assertIn("Another refresh is in progress", stderr.getvalue())
+        self.assertEqual(sum(paas.calls.values()), 0)
+        self.assertFalse(InstanceRemoteState.objects.exists())
+
+        cache.delete(LOCK_KEY)
+        with emulated_paas():
+            call_command("refresh_instances", stdout=io.StringIO())
+
+        self.assertEqual(InstanceRemoteState.objects.count(), 3)
+        self.assertIsNone(cache.get(LOCK_KEY))
+
+    def test_states_created_meanwhile_are_updated(self):
+        with emulated_paas() as paas:
+            paas.add_app("sf-alpha", deployed=True)
+            # The refresh job of Alpha creates its state during the pass
+            with mock.patch.object(
+                Command,
+                "refresh_dns",
+                side_effect=lambda instances, states: Instance.objects.get(
+                    name="Alpha"
+                ).refresh_remote_state(),
+            ):
+                call_command("refresh_instances", stdout=io.StringIO())
+
+        self.assertEqual(InstanceRemoteState.objects.count(), 3)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, MASS_DEPLOY_CONCURRENCY=10)
+class MassDeployTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Starts from a full rate limiter, whatever the previous tests consumed
+        patcher = mock.patch.dict(ratelimit._buckets, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        contact = Contact.objects.create(
+            first_name="Camille", last_name="Dupont", email="camille@example.com"
+        )
+        Instance.objects.bulk_create(
+            Instance(
+                name=f"Fake {i}",
+                slug=f"fake-{i}",
+                scalingo_application_name=fake_app_name(i),
+                main_contact=contact,
+                status="FINISHED",
+            )
+            for i in range(20)
+        )
+
+    def test_deployments_are_triggered_concurrently(self):
+        latency = 0.05
+        with emulated_paas(fleet_size=20, latency=latency) as paas:
+            start = time.monotonic()
+            results = async_to_sync(Instance.trigger_deployments)(
+                list(Instance.objects.all())
+            )
+            duration = time.monotonic() - start
+
+        self.assertTrue(all("deployment" in result for result in results))
+        self.assertEqual(paas.calls[("api.osc-fr1.scalingo.com", "POST")], 20)
+        # Two rounds of 10 calls (and a token exchange) instead of 20 in a row
+        self.assertLess(duration, 20 * latency / 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DeployBatchTestCase(TransactionTestCase):
+    # The jobs are run from worker threads, outside of the test transaction
+    def setUp(self):
+        cache.clear()
+        contact = Contact.objects.create(
+            first_name="Camille", last_name="Dupont", email="camille@example.com"
+        )
+        for name in ["Alpha", "Beta", "Gamma"]:
+            Instance.objects.create(name=name, main_contact=contact)
+        Instance.objects.update(status="FINISHED")
+
+    def run_worker(self):
+        call_command(
+            "run_worker", "--burst", stdout=io.StringIO(), stderr=io.StringIO()
+        )
+
+    def test_deployments_are_triggered_then_followed(self):
+        batch = DeployBatch.start(Instance.objects.all())
+
+        with emulated_paas() as paas:
+            paas.add_app("sf-alpha", deployed=True)
+            paas.add_app("sf-beta", deployed=True)
+            # Gamma has no app: its deployment can't be triggered
+            self.run_worker()
+
+            self.assertEqual(
+                batch.count_by_status(),
+                {
+                    "PENDING": 0,
+                    "DEPLOYING": 2,
+                    "SUCCESS": 0,
+                    "ERROR": 1,
+                    "CANCELLED": 0,
+                },
+            )
+
+            paas.set_deployment_status("sf-beta", "build-error")
+            # The deployments are checked again after DEPLOY_BATCH_POLL_INTERVAL
+            tracking = Job.objects.get(
+                name="instances.track_deploy_batch", status="PENDING"
+            )
+            self.assertGreater(tracking.run_at, timezone.now())
+            Job.objects.filter(pk=tracking.pk).update(run_at=timezone.now())
+            self.run_worker()
+
+        batch.refresh_from_db()
+        self.assertTrue(batch.is_finished)
+        items = {item.instance.name: item for item in batch.items.all()}
+        self.assertEqual(items["Alpha"].status, "SUCCESS")
+        self.assertEqual(items["Beta"].status, "ERROR")
+        self.assertEqual(items["Beta"].deployment_status, "build-error")
+        self.assertEqual(items["Gamma"].status, "ERROR")
+        self.assertFalse(Job.objects.filter(status="PENDING").exists())
+
+    def test_rejected_deployments_are_errors(self):
+        batch = DeployBatch.start(Instance.objects.filter(name="Alpha"))
+
+        with (
+            emulated_paas(),
+            mock.patch.object(
+                Scalingo,
+                "app_deployment_trigger",
+                return_value={"errors": {"git_ref": ["is invalid"]}},
+            ),
+        ):
+            batch.trigger()
+
+        item = batch.items.get()
+        self.assertEqual(item.status, "ERROR")
+        self.assertIn("is invalid", item.message)
+
+    def test_the_triggered_deployment_is_followed(self):
+        batch = DeployBatch.start(Instance.objects.filter(name="Alpha"))
+
+        with emulated_paas() as paas:
+            app = paas.add_app("sf-alpha", deployed=True)
+            batch.trigger()
+            paas.set_deployment_status("sf-alpha", "hook-error")
+            # A more recent deployment, started by someone else, succeeds
+            app["deployments"].insert(0, paas.new_deployment("main", ready=True))
+            batch.track()
+
+        item = batch.items.get()
+        self.assertEqual(item.status, "ERROR")
+        self.assertEqual(item.deployment_status, "hook-error")
+        self.assertNotEqual(item.deployment_id, app["deployments"][0]["id"])
+
+    @override_settings(DEPLOY_BATCH_TIMEOUT=0)
+    def test_unfinished_deployments_time_out(self):
+        batch = DeployBatch.start(Instance.objects.filter(name="Alpha"))
+
+        with emulated_paas(deployment_duration=60) as paas:
+            app = paas.add_app("sf-alpha", deployed=True)
+            deployment = paas.new_deployment("main")
+            app["deployments"].insert(0, deployment)
+            batch.items.update(
+                status="DEPLOYING",
+                deployment_id=deployment["id"],
+                triggered_at=timezone.now(),
+            )
+            batch.track()
+
+        self.assertTrue(batch.is_finished)
+        item = batch.items.get()
+        self.assertEqual(item.status, "ERROR")
+        self.assertEqual(item.deployment_status, "pushing")
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    DEPLOY_CANARY_SIZE=1,
+    DEPLOY_MAX_WAVE_SIZE=2,
+    DEPLOY_MAX_FAILURE_RATE=0.2,
+)
+class RollingDeployTestCase(TransactionTestCase):
+    # The jobs are run from worker threads, outside of the test transaction
+    def setUp(self):
+        cache.clear()
+        contact = Contact.objects.create(
+            first_name="Camille", last_name="Dupont", email="camille@example.com"
+        )
+        for name in ["Alpha", "Beta", "Gamma", "Delta", "Epsilon", "Zeta"]:
+            Instance.objects.create(name=name, main_contact=contact)
+        Instance.objects.update(status="FINISHED")
+        self.batch = DeployBatch.start(
+            Instance.objects.order_by("pk"), strategy="WAVES"
+        )
+
+    def run_worker(self):
+        # Runs the pending jobs, including the next check of the deployments
+        Job.objects.filter(status="PENDING").update(run_at=timezone.now())
+        call_command(
+            "run_worker", "--burst", stdout=io.StringIO(), stderr=io.StringIO()
+        )
+
+    def statuses(self) -> dict:
+        return {item.instance.name: item.status for item in self.batch.items.all()}
+
+    def test_waves_grow_up_to_the_maximum_size(self):
+        self.assertEqual(
+            [item.wave for item in self.batch.items.order_by("instance__pk")],
+            [0, 1, 1, 2, 2, 3],
+        )
+
+    def test_next_wave_waits_for_healthy_sites(self):
+        with emulated_paas() as paas:
+            for instance in Instance.objects.all():
+                paas.add_app(str(instance.scalingo_application_name), deployed=True)
+            paas.apps["osc-fr1"]["sf-alpha"]["healthy"] = False
+
+            self.run_worker()
+            self.assertEqual(self.statuses()["Alpha"], "DEPLOYING")
+            self.run_worker()
+
+        # The canary is deployed but its site fails: the next wave is not started
+        self.assertEqual(
+            self.statuses(),
+            {
+                "Alpha": "DEPLOYING",
+                "Beta": "PENDING",
+                "Gamma": "PENDING",
+                "Delta": "PENDING",
+                "Epsilon": "PENDING",
+                "Zeta": "PENDING",
+            },
+        )
+        self.assertIn("HTTP 500", self.batch.items.get(instance__name="Alpha").message)
+        self.assertEqual(paas.calls[("api.osc-fr1.scalingo.com", "POST")], 1)
+
+    def test_rollout_halts_above_the_failure_rate(self):
+        with emulated_paas() as paas:
+            for instance in Instance.objects.all():
+                paas.add_app(str(instance.scalingo_application_name), deployed=True)
+
+            # Canary, then the first wave
+            self.run_worker()
+            self.run_worker()
+            self.assertEqual(self.statuses()["Alpha"], "SUCCESS")
+            self.assertEqual(self.statuses()["Beta"], "DEPLOYING")
+
+            paas.set_deployment_status("sf-gamma", "build-error")
+            self.run_worker()
+
+        self.batch.refresh_from_db()
+        self.assertTrue(self.batch.is_halted)
+        self.assertTrue(self.batch.is_finished)
+        self.assertIn("33 %", self.batch.halt_reason)
+        self.assertEqual(
+            self.statuses(),
+            {
+                "Alpha": "SUCCESS",
+                "Beta": "SUCCESS",
+                "Gamma": "ERROR",
+                "Delta": "CANCELLED",
+                "Epsilon": "CANCELLED",
+                "Zeta": "CANCELLED",
+            },
+        )
+        # The cancelled instances were not deployed
+        self.assertEqual(paas.calls[("api.osc-fr1.scalingo.com", "POST")], 3)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class EnvSyncTestCase(InstanceTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_saves_only_request_an_update(self):
+        alpha = Instance.objects.get(name="Alpha")
+
+        with emulated_paas() as paas:
+            alpha.host_url = "alpha.example.com"
+            alpha.save()
+            alpha.allowed_hosts = "alpha.example.com"
+            alpha.save()
+
+        self.assertEqual(sum(paas.calls.values()), 0)
+        # Both saves are merged into a single job
+        job = Job.objects.get(name="instances.sync_env")
+        self.assertEqual(job.payload, {"instance_id": alpha.pk})
+        self.assertEqual(alpha.get_pending_env_sync(), job)
+
+    def test_unchanged_env_is_not_requested(self):
+        alpha = Instance.objects.get(name="Alpha")
+        alpha.git_branch = "main"
+        alpha.save()
+
+        self.assertIsNone(alpha.get_pending_env_sync())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SyncEnvJobTestCase(TransactionTestCase):
+    # The jobs are run from worker threads, outside of the test transaction
+    def setUp(self):
+        cache.clear()
+        contact = Contact.objects.create(
+            first_name="Camille", last_name="Dupont", email="camille@example.com"
+        )
+        for name in ["Alpha", "Beta"]:
+            Instance.objects.create(name=name, main_contact=contact)
+        Instance.objects.update(status="FINISHED")
+
+    def test_env_is_synced_by_the_worker(self):
+        alpha = Instance.objects.get(name="Alpha")
+        alpha.host_url = "alpha.example.com"
+        alpha.save()
+
+        with emulated_paas() as paas:
+            paas.add_app("sf-alpha", deployed=True)
+            call_command("run_worker", "--burst", stdout=io.StringIO())
+
+        variables = paas.apps["osc-fr1"]["sf-alpha"]["variables"]
+        self.assertEqual(variables["HOST_URL"], "alpha.example.com")
+        self.assertEqual(Job.objects.get().status, "SUCCEEDED")
+
+    def test_failed_syncs_are_retried(self):
+        job = Instance.objects.get(name="Beta").request_env_sync()
+
+        with emulated_paas():
+            call_command(
+                "run_worker", "--burst", stdout=io.StringIO(), stderr=io.StringIO()
+            )
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "PENDING")
+        self.assertEqual(job.attempts, 1)
+        self.assertIn("not found", job.last_error)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    EMAIL_SECRETS=encode_secrets("1;alpha@example.com;alpha\n2;beta@example.com;beta"),
+)
+class EmailSecretsTestCase(InstanceTestCase):
+    def setUp(self):
+        cache.clear()
+        parse_email_secrets.cache_clear()
+        self.email_config = EmailConfig.objects.create(
+            default_from_email="noreply@example.com",
+            email_host="smtp.example.com",
+            email_secrets_id=2,
+        )
+
+    def test_secrets_are_parsed_once(self):
+        with mock.patch(
+            "instances.utils.decode_secrets", wraps=decode_secrets
+        ) as decode:
+            for _ in range(3):
+                secrets = self.email_config.get_secrets()
+
+        self.assertEqual(decode.call_count, 1)
+        self.assertEqual(secrets["email"], "beta@example.com")
+        with self.assertRaises(TypeError):
+            secrets["email"] = "other@example.com"
+
+    def test_secrets_are_parsed_again_when_the_setting_changes(self):
+        self.email_config.get_secrets()
+
+        with override_settings(EMAIL_SECRETS=encode_secrets("2;new@example.com;new")):
+            self.assertEqual(
+                self.email_config.get_secrets()["email"], "new@example.com"
+            )
+
+    def test_missing_secrets_are_reported(self):
+        self.email_config.email_secrets_id = 3
+        alpha = Instance.objects.get(name="Alpha")
+        alpha.email_config = self.email_config
+
+        with self.assertRaisesMessage(
+            ImproperlyConfigured, "No email secrets with the ID 3"
+        ):
+            self.email_config.get_secrets()
+
+        with emulated_paas() as paas:
+            paas.add_app("sf-alpha", deployed=True)
+            result = alpha.scalingo_set_env()
+
+        self.assertEqual(result["status"], "error")
+        self.assertIn("No email secrets with the ID 3", result["message"])
+        self.assertEqual(paas.calls[("api.osc-fr1.scalingo.com", "PUT")], 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class EnvDiffTestCase(InstanceTestCase):
+    def setUp(self):
+        cache.clear()
+        self.alpha = Instance.objects.get(name="Alpha")
+
+    def test_only_changed_variables_are_sent(self):
+        with (
+            emulated_paas() as paas,
+            mock.patch.object(
+                Scalingo,
+                "app_variables_bulk_update",
+                autospec=True,
+                side_effect=Scalingo.app_variables_bulk_update,
+            ) as bulk_update,
+        ):
+            app = paas.add_app("sf-alpha", deployed=True)
+            app["variables"]["HOST_URL"] = self.alpha.host_url
+            self.alpha.scalingo_set_env()
+
+            self.alpha.allowed_hosts += ",alpha.example.com"
+            self.alpha.scalingo_set_env()
+
+        self.assertEqual(bulk_update.call_count, 2)
+        self.assertEqual(
+            bulk_update.call_args.kwargs["variables"],
+            [{"name": "ALLOWED_HOSTS", "value": self.alpha.allowed_hosts}],
+        )
+
+    def test_rejected_variables_are_sent_again(self):
+        with emulated_paas() as paas:
+            paas.add_app("sf-alpha", deployed=True)
+            with mock.patch.object(
+                Scalingo,
+                "app_variables_bulk_update",
+                return_value={"errors": {"value": ["is too long"]}},
+            ):
+                result = self.alpha.scalingo_set_env()
+
+            self.assertEqual(result["status"], "error")
+            self.assertIn("is too long", result["message"])
+            self.assertEqual(Instance.objects.get(pk=self.alpha.pk).env_hash, "")
+
+            Instance.objects.get(pk=self.alpha.pk).scalingo_set_env()
+
+        self.assertEqual(paas.calls[("api.osc-fr1.scalingo.com", "PUT")], 1)
+
+    def test_deleted_global_variables_are_removed_from_the_apps(self):
+        variable = GlobalVariable.objects.create(name="SENTRY_ENV", value="prod")
+
+        with emulated_paas() as paas:
+            app = paas.add_app("sf-alpha", deployed=True)
+            app["variables"]["MANUAL"] = "kept"
+            Instance.objects.get(pk=self.alpha.pk).scalingo_set_env()
+            self.assertEqual(app["variables"]["SENTRY_ENV"], "prod")
+
+            variable.delete()
+            result = Instance.objects.get(pk=self.alpha.pk).scalingo_set_env()
+
+        self.assertEqual(result["status"], "success")
+        self.assertNotIn("SENTRY_ENV", app["variables"])
+        self.assertEqual(app["variables"]["MANUAL"], "kept")
+        self.assertEqual(Instance.objects.get(pk=self.alpha.pk).global_env_names, [])
+
+    def test_unchanged_env_is_skipped(self):
+        with emulated_paas() as paas:
+            paas.add_app("sf-alpha", deployed=True)
+            self.alpha.scalingo_set_env()
+            paas.calls.clear()
+
+            result = Instance.objects.get(pk=self.alpha.pk).scalingo_set_env()
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(sum(paas.calls.values()), 0)
+
+    def test_status_update_keeps_concurrent_edits(self):
+        Instance.objects.filter(pk=self.alpha.pk).update(
+            status="SCALINGO_DB_PROVISIONED"
+        )
+        alpha = Instance.objects.get(pk=self.alpha.pk)
+        # Edited in the admin while the job runs
+        Instance.objects.filter(pk=alpha.pk).update(git_branch="edited")
+
+        with emulated_paas() as paas:
+            paas.add_app("sf-alpha", deployed=True)
+            alpha.scalingo_set_env()
+
+        alpha = Instance.objects.get(pk=alpha.pk)
+        self.assertEqual(alpha.status, "SCALINGO_ENV_VARS_SET")
+        self.assertEqual(alpha.git_branch, "edited")
+
+    def test_env_already_set_is_not_sent(self):
+        with emulated_paas() as paas:
+            app = paas.add_app("sf-alpha", deployed=True)
+            app["variables"].update(self.alpha.get_desired_env())
+
+            self.alpha.scalingo_set_env()
+
+        self.assertEqual(paas.calls[("api.osc-fr1.scalingo.com", "PUT")], 0)
+        self.assertEqual(
+            Instance.objects.get(pk=self.alpha.pk).env_hash,
+            Instance.hash_env(self.alpha.get_desired_env()),
+        )
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, EMAIL_SECRETS=encode_secrets("1;alpha@example.com;alpha")
+)
+class EnvRolloutTestCase(InstanceTestCase):
+    def setUp(self):
+        cache.clear()
+        self.email_config = EmailConfig.objects.create(
+            default_from_email="noreply@example.com",
+            email_host="smtp.example.com",
+            email_secrets_id=1,
+        )
+        Instance.objects.exclude(name="Gamma").update(email_config=self.email_config)
+
+    def test_email_config_update_is_rolled_out(self):
+        email_config = EmailConfig.objects.get(pk=self.email_config.pk)
+        email_config.email_host = "smtp2.example.com"
+        email_config.save()
+
+        rollout = email_config.get_last_env_rollout()
+        self.assertEqual(email_config.env_rollout, rollout)
+        self.assertEqual(
+            {item.instance.name for item in rollout.items.all()}, {"Alpha", "Beta"}
+        )
+        self.assertEqual(rollout.count_by_status()["PENDING"], 2)
+        # The updates go through the sync job of each instance
+        self.assertEqual(
+            set(
+                Job.objects.filter(name="instances.sync_env").values_list(
+                    "dedupe_key", flat=True
+                )
+            ),
+            {
+                f"instances.sync_env:{pk}"
+                for pk in Instance.objects.exclude(name="Gamma").values_list(
+                    "pk", flat=True
+                )
+            },
+        )
+
+    def test_unchanged_email_config_is_not_rolled_out(self):
+        email_config = EmailConfig.objects.get(pk=self.email_config.pk)
+        email_config.save()
+
+        self.assertIsNone(email_config.env_rollout)
+        self.assertFalse(EnvRollout.objects.exists())
+
+    def test_global_variables_are_set_on_all_instances(self):
+        variable = GlobalVariable.objects.create(name="SENTRY_ENV", value="prod")
+
+        self.assertEqual(variable.env_rollout.items.count(), 3)
+        for instance in Instance.objects.all():
+            self.assertEqual(instance.get_desired_env()["SENTRY_ENV"], "prod")
+
+    def test_bulk_deletion_in_the_admin_is_rolled_out(self):
+        GlobalVariable.objects.create(name="SENTRY_ENV", value="prod")
+        GlobalVariable.objects.create(name="SENTRY_DSN", value="x")
+
+        GlobalVariableAdmin(GlobalVariable, admin.site).delete_queryset(
+            None, GlobalVariable.objects.all()
+        )
+
+        rollout = EnvRollout.objects.first()
+        self.assertIn("SENTRY_DSN, SENTRY_ENV", rollout.reason)
+        self.assertFalse(GlobalVariable.objects.exists())
+
+    def test_reserved_variables_are_rejected(self):
+        with self.assertRaises(ValidationError):
+            GlobalVariable(name="SECRET_KEY", value="x").full_clean()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RolloutEnvJobTestCase(TransactionTestCase):
+    # The jobs are run from worker threads, outside of the test transaction
+    def setUp(self):
+        cache.clear()
+        contact = Contact.objects.create(
+            first_name="Camille", last_name="Dupont", email="camille@example.com"
+        )
+        for name in ["Alpha", "Beta"]:
+            Instance.objects.create(name=name, main_contact=contact)
+        Instance.objects.update(status="FINISHED")
+
+    def test_results_are_recorded_per_instance(self):
+        rollout = EnvRollout.start(Instance.objects.all(), reason="test")
+
+        with emulated_paas() as paas:
+            # Beta has no app: its update fails
+            paas.add_app("sf-alpha", deployed=True)
+            call_command(
+                "run_worker", "--burst", stdout=io.StringIO(), stderr=io.StringIO()
+            )
+
+        items = {item.instance.name: item for item in rollout.items.all()}
+        self.assertEqual(items["Alpha"].status, "SUCCESS")
+        self.assertEqual(items["Beta"].status, "ERROR")
+        self.assertIn("not found", items["Beta"].message)
+        self.assertIn("HOST_URL", paas.apps["osc-fr1"]["sf-alpha"]["variables"])
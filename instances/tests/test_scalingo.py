@@ -0,0 +1,329 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+import requests
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from instances.services.ratelimit import TokenBucket
+from instances.services.resilience import CircuitBreaker
+from instances.services.scalingo import (
+    AsyncScalingo,
+    SECNUMCLOUD_REGION,
+    STANDARD_REGION,
+    Scalingo,
+    bearer_tokens,
+)
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BearerTokenStoreTestCase(TestCase):
+    def setUp(self):
+        bearer_tokens.invalidate(STANDARD_REGION)
+        bearer_tokens.invalidate(SECNUMCLOUD_REGION)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_token_is_exchanged_once_per_region(self):
+        with mock.patch.object(
+            Scalingo, "connect_session", return_value="token"
+        ) as connect_session:
+            tokens = [Scalingo().bearer_token for _ in range(5)]
+            tokens += [Scalingo(use_secnumcloud=True).bearer_token for _ in range(5)]
+
+        self.assertEqual(tokens, ["token"] * 10)
+        self.assertEqual(connect_session.call_count, 2)
+
+    def test_renewal_is_single_flight(self):
+        with mock.patch.object(
+            Scalingo, "connect_session", return_value="token"
+        ) as connect_session:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                tokens = list(
+                    executor.map(lambda _: Scalingo().bearer_token, range(32))
+                )
+
+        self.assertEqual(set(tokens), {"token"})
+        self.assertEqual(connect_session.call_count, 1)
+
+    def test_token_is_shared_through_the_cache(self):
+        with mock.patch.object(Scalingo, "connect_session", return_value="token"):
+            Scalingo().bearer_token
+
+        # Simulates another worker with an empty in-process store
+        bearer_tokens._tokens.clear()
+
+        with mock.patch.object(Scalingo, "connect_session") as connect_session:
+            self.assertEqual(Scalingo().bearer_token, "token")
+
+        connect_session.assert_not_called()
+
+
+class SessionTestCase(TestCase):
+    def test_clients_of_a_region_share_the_pooled_session(self):
+        self.assertIs(Scalingo().session, Scalingo().session)
+        self.assertIsNot(Scalingo().session, Scalingo(use_secnumcloud=True).session)
+
+
+class AsyncScalingoTestCase(TestCase):
+    def test_gather_bounds_concurrency_and_keeps_order(self):
+        running = 0
+        max_running = 0
+        lock = threading.Lock()
+
+        def app_detail(app_name):
+            nonlocal running, max_running
+            with lock:
+                running += 1
+                max_running = max(max_running, running)
+            time.sleep(0.01)
+            with lock:
+                running -= 1
+            return {"app": {"name": app_name}}
+
+        async def fetch_all(app_names):
+            async with AsyncScalingo(concurrency=3) as sc:
+                with mock.patch.object(sc.client, "app_detail", app_detail):
+                    return await sc.gather(sc.app_detail(name) for name in app_names)
+
+        app_names = [f"app-{i}" for i in range(12)]
+        results = async_to_sync(fetch_all)(app_names)
+
+        self.assertEqual([r["app"]["name"] for r in results], app_names)
+        self.assertLessEqual(max_running, 3)
+
+    def test_connections_are_closed_once_per_thread(self):
+        async def fetch_all(app_names):
+            async with AsyncScalingo(concurrency=3) as sc:
+                with mock.patch.object(
+                    sc.client, "app_detail", lambda name: {"app": {"name": name}}
+                ):
+                    await sc.gather(sc.app_detail(name) for name in app_names)
+            return sc
+
+        with mock.patch("instances.services.scalingo.connections") as connections:
+            sc = async_to_sync(fetch_all)([f"app-{i}" for i in range(12)])
+            sc.executor.shutdown(wait=True)
+
+        self.assertEqual(connections.close_all.call_count, 3)
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200, headers=None):
+        self.payload = payload
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def json(self):
+        return self.payload
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ResponseCacheTestCase(TestCase):
+    def tearDown(self):
+        cache.clear()
+
+    def test_get_is_served_from_cache_until_a_write_on_the_app(self):
+        sc = Scalingo()
+        responses = {
+            ("GET", "apps/sf-test"): FakeResponse({"app": {"status": "stopped"}}),
+            ("GET", "apps/sf-other"): FakeResponse({"app": {"status": "running"}}),
+            ("POST", "apps/sf-test/restart"): FakeResponse({}, status_code=202),
+        }
+
+        with mock.patch.object(
+            sc,
+            "_send",
+            side_effect=lambda method, path, **kwargs: responses[(method, path)],
+        ) as send:
+            sc.app_detail("sf-test")
+            sc.app_detail("sf-other")
+            sc.app_detail("sf-test")
+            self.assertEqual(send.call_count, 2)
+
+            responses[("GET", "apps/sf-test")] = FakeResponse(
+                {"app": {"status": "running"}}
+            )
+            sc.app_restart("sf-test")
+
+            self.assertEqual(sc.app_detail("sf-test")["app"]["status"], "running")
+            sc.app_detail("sf-other")
+            self.assertEqual(send.call_count, 4)
+
+    def test_env_variables_are_not_cached(self):
+        sc = Scalingo()
+        response = FakeResponse({"variables": [{"name": "SECRET_KEY", "value": "x"}]})
+
+        with mock.patch.object(sc, "_send", return_value=response) as send:
+            sc.app_variables("sf-test")
+            sc.app_variables("sf-test")
+
+        self.assertEqual(send.call_count, 2)
+
+    def test_errors_are_not_cached(self):
+        sc = Scalingo()
+
+        with mock.patch.object(
+            sc, "_send", return_value=FakeResponse({"error": "not found"}, 404)
+        ) as send:
+            sc.app_detail("sf-test")
+            sc.app_detail("sf-test")
+
+        self.assertEqual(send.call_count, 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PaginationTestCase(TestCase):
+    def tearDown(self):
+        cache.clear()
+
+    def deployments_page(self, method, path, **kwargs):
+        page = int(path.split("page=")[1].split("&")[0])
+        per_page = int(path.split("per_page=")[1])
+        next_page = page + 1 if page * per_page < 100 else None
+
+        return FakeResponse(
+            {
+                "deployments": [
+                    {"id": f"d{i}", "status": "success"}
+                    for i in range((page - 1) * per_page, page * per_page)
+                ],
+                "meta": {"pagination": {"current_page": page, "next_page": next_page}},
+            }
+        )
+
+    def test_iteration_stops_when_the_caller_stops(self):
+        sc = Scalingo()
+
+        with mock.patch.object(sc, "_send", side_effect=self.deployments_page) as send:
+            deployments = sc.iter_deployments("sf-test", per_page=10)
+            first = [next(deployments) for _ in range(15)]
+
+        self.assertEqual(first[-1]["id"], "d14")
+        self.assertEqual(send.call_count, 2)
+
+    def test_iteration_follows_all_pages(self):
+        sc = Scalingo()
+
+        with mock.patch.object(sc, "_send", side_effect=self.deployments_page):
+            deployments = list(sc.iter_deployments("sf-test", per_page=30))
+
+        self.assertEqual(len(deployments), 120)
+
+    def test_latest_deployment_is_a_single_item_page(self):
+        sc = Scalingo()
+
+        with mock.patch.object(sc, "_send", side_effect=self.deployments_page) as send:
+            result = sc.app_deployment_latest("sf-test")
+
+        self.assertEqual(result["deployment"]["id"], "d0")
+        self.assertIn("per_page=1", send.call_args.args[1])
+
+
+class RateLimitTestCase(TestCase):
+    def test_bucket_paces_calls_beyond_the_burst(self):
+        bucket = TokenBucket(rate=100, burst=5)
+
+        waited = sum(bucket.acquire() for _ in range(10))
+
+        self.assertGreater(waited, 0.03)
+
+    def test_throttling_pauses_and_slows_down_the_bucket(self):
+        bucket = TokenBucket(rate=100, burst=5)
+
+        bucket.throttled(retry_after=0.05)
+
+        self.assertEqual(bucket.rate, 50)
+        self.assertGreaterEqual(bucket.acquire(), 0.04)
+
+    def test_rate_grows_up_to_what_the_headers_allow(self):
+        bucket = TokenBucket(rate=10, burst=5)
+
+        for _ in range(100):
+            bucket.succeeded(remaining=3000, reset_in=60)
+        self.assertEqual(bucket.rate, 50)
+
+        bucket.succeeded(remaining=60, reset_in=60)
+        self.assertEqual(bucket.rate, 1)
+
+    def test_rate_stays_at_the_setting_without_headers(self):
+        bucket = TokenBucket(rate=10, burst=5)
+
+        for _ in range(100):
+            bucket.succeeded()
+
+        self.assertEqual(bucket.rate, 10)
+
+    def test_throttled_queries_are_sent_again(self):
+        sc = Scalingo()
+        responses = [
+            FakeResponse({}, status_code=429, headers={"Retry-After": "0"}),
+            FakeResponse({"app": {"status": "running"}}),
+        ]
+
+        with mock.patch.object(sc, "_send", side_effect=responses) as send:
+            result = sc.get("apps/sf-test", use_cache=False)
+
+        self.assertEqual(result["app"]["status"], "running")
+        self.assertEqual(send.call_count, 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, OUTBOUND_RETRIES=2, OUTBOUND_RETRY_MAX_DELAY=0)
+class ResilienceTestCase(TestCase):
+    def tearDown(self):
+        cache.clear()
+
+    def test_idempotent_queries_are_retried(self):
+        sc = Scalingo()
+        sc.circuit_breaker = CircuitBreaker(
+            "test", failure_threshold=5, reset_timeout=30
+        )
+        responses = [
+            requests.ConnectionError(),
+            FakeResponse({}, status_code=503),
+            FakeResponse({"app": {"status": "running"}}),
+        ]
+
+        with mock.patch.object(sc, "_send", side_effect=responses) as send:
+            result = sc.app_detail("sf-test")
+
+        self.assertEqual(result["app"]["status"], "running")
+        self.assertEqual(send.call_count, 3)
+
+    def test_other_queries_are_not_retried(self):
+        sc = Scalingo()
+        sc.circuit_breaker = CircuitBreaker(
+            "test", failure_threshold=5, reset_timeout=30
+        )
+
+        with mock.patch.object(
+            sc, "_send", side_effect=requests.ConnectionError()
+        ) as send:
+            result = sc.app_deployment_trigger("sf-test", "main", "https://example.com")
+
+        self.assertIn("error", result)
+        self.assertEqual(send.call_count, 1)
+
+    def test_open_circuit_fails_fast(self):
+        sc = Scalingo()
+        sc.circuit_breaker = CircuitBreaker(
+            "test", failure_threshold=3, reset_timeout=30
+        )
+
+        with mock.patch.object(
+            sc, "_send", side_effect=requests.ConnectionError()
+        ) as send:
+            sc.app_detail("sf-test")
+            result = sc.app_detail("sf-test")
+
+        self.assertTrue(sc.circuit_breaker.is_open)
+        self.assertIn("unavailable", result["error"])
+        self.assertEqual(send.call_count, 3)
@@ -0,0 +1,140 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django_otp import DEVICE_ID_SESSION_KEY
+from django_otp.plugins.otp_static.models import StaticDevice
+
+from instances.models import DeployBatch, EmailConfig, Instance, InstanceRemoteState
+from instances.services.alwaysdata import records_store
+from instances.services.emulator import emulated_paas
+from instances.tests.test_models import InstanceTestCase
+from instances.tests.test_scalingo import LOCMEM_CACHES
+from instances.utils import encode_secrets
+from jobs.models import Job
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ALWAYSDATA_DOMAIN_ID="42")
+class InstanceViewsTestCase(InstanceTestCase):
+    def setUp(self):
+        cache.clear()
+        records_store.invalidate()
+
+        user = get_user_model().objects.create_user(
+            username="admin", email="admin@example.com", is_staff=True
+        )
+        device = StaticDevice.objects.create(user=user, name="test")
+
+        self.client.force_login(user)
+        session = self.client.session
+        session[DEVICE_ID_SESSION_KEY] = device.persistent_id
+        session.save()
+
+    def test_list_page_makes_no_api_call(self):
+        alpha = Instance.objects.get(name="Alpha")
+        InstanceRemoteState.objects.create(
+            instance=alpha, app_status="running", last_checked_at=timezone.now()
+        )
+
+        with emulated_paas() as paas:
+            response = self.client.get(reverse("instances:list"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(paas.calls.values()), 0)
+        self.assertContains(response, "running", count=1)
+        self.assertContains(response, "État inconnu", count=2)
+
+    def test_detail_page_shows_the_stored_state(self):
+        InstanceRemoteState.objects.create(
+            instance=Instance.objects.get(name="Alpha"),
+            app_status="running",
+            last_checked_at=timezone.now(),
+            next_check_at=timezone.now() + timedelta(hours=1),
+        )
+
+        with emulated_paas() as paas:
+            response = self.client.get(reverse("instances:detail", args=["alpha"]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(paas.calls.values()), 0)
+        self.assertContains(response, "running")
+
+    def test_detail_page_leaves_due_checks_to_the_refresh(self):
+        with emulated_paas() as paas:
+            paas.add_app("sf-alpha", deployed=True)
+            response = self.client.get(reverse("instances:detail", args=["alpha"]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(paas.calls.values()), 0)
+        self.assertContains(response, "État inconnu")
+
+    def test_actions_request_a_check_of_the_remote_state(self):
+        with emulated_paas() as paas:
+            paas.add_app("sf-alpha", deployed=True)
+            response = self.client.post(
+                reverse("instances:action", args=["alpha"]),
+                {"action": "refresh_remote_state", "name": "Alpha"},
+                follow=True,
+            )
+
+            self.assertContains(response, "Vérification de l’état demandée")
+            self.assertEqual(sum(paas.calls.values()), 0)
+
+            # The worker checks the instance, even if it was never checked before
+            job = Job.objects.get(name="instances.refresh_remote_state")
+            job.run()
+
+        self.assertEqual(job.status, "SUCCEEDED")
+        state = InstanceRemoteState.objects.get(instance__name="Alpha")
+        self.assertEqual(state.app_status, "running")
+        self.assertFalse(state.is_check_due)
+
+    @override_settings(EMAIL_SECRETS=encode_secrets("1;alpha@example.com;alpha"))
+    def test_email_config_update_is_rolled_out(self):
+        email_config = EmailConfig.objects.create(
+            default_from_email="noreply@example.com",
+            email_host="smtp.example.com",
+            email_secrets_id=1,
+        )
+        Instance.objects.update(email_config=email_config)
+
+        with emulated_paas() as paas:
+            response = self.client.post(
+                reverse("instances:emailconfig_update", args=[email_config.pk]),
+                {
+                    "default_from_email": "noreply@example.com",
+                    "email_host": "smtp2.example.com",
+                    "email_port": 587,
+                    "email_secrets_id": 1,
+                    "email_timeout": 25,
+                },
+                follow=True,
+            )
+
+        # The instances are updated by the worker, not by the request
+        self.assertEqual(sum(paas.calls.values()), 0)
+        self.assertContains(response, "de 3 instances vont être mises à jour")
+        self.assertContains(response, "3 en attente")
+
+    def test_mass_deploy_runs_in_the_background(self):
+        with emulated_paas() as paas:
+            response = self.client.post(
+                reverse("instances:mass_deploy_list"),
+                {
+                    "instances": list(Instance.objects.values_list("pk", flat=True)),
+                    "strategy": "WAVES",
+                },
+                follow=True,
+            )
+
+        batch = DeployBatch.objects.get()
+        self.assertEqual(batch.strategy, "WAVES")
+        self.assertRedirects(response, batch.get_absolute_url())
+        self.assertEqual(sum(paas.calls.values()), 0)
+        self.assertEqual(Job.objects.get().name, "instances.deploy_batch")
+        self.assertContains(response, "3 en attente")
+        # The page reloads itself until the deployments are over
+        self.assertContains(response, 'http-equiv="refresh"')
@@ -41,6 +41,11 @@ urlpatterns += [
         views.InstanceMassDeployFormView.as_view(),
         name="mass_deploy_list",
     ),
+    path(
+        "mass_deploy/<int:pk>/",
+        views.DeployBatchDetailView.as_view(),
+        name="deploy_batch_detail",
+    ),
     path("<str:slug>/", views.InstanceDetailView.as_view(), name="detail"),
     path("<str:slug>/update/", views.InstanceUpdateView.as_view(), name="update"),
     path(
@@ -1,4 +1,10 @@
 import base64
+import binascii
+import csv
+from functools import lru_cache
+from types import MappingProxyType
+
+from django.core.exceptions import ImproperlyConfigured
 
 
 def encode_secrets(secrets):
@@ -7,3 +13,30 @@ def encode_secrets(secrets):
 
 def decode_secrets(encoded_secrets: str):
     return base64.b64decode(encoded_secrets).decode()
+
+
+@lru_cache(maxsize=4)
+def parse_email_secrets(encoded_secrets: str) -> MappingProxyType:
+    """
+    Returns the email secrets of the EMAIL_SECRETS setting as a read-only
+    mapping by id. Format: "1;email;password\\n2;email;password"
+
+    The result is cached by encoded value, so the setting is only decoded and
+    parsed again when it changes.
+    """
+    try:
+        secrets_raw = decode_secrets(encoded_secrets)
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ImproperlyConfigured("EMAIL_SECRETS is not valid base64.") from e
+
+    secrets = {}
+    for line, row in enumerate(csv.reader(secrets_raw.splitlines(), delimiter=";")):
+        if not row:
+            continue
+        if len(row) < 3:
+            raise ImproperlyConfigured(
+                f"Line {line + 1} of EMAIL_SECRETS is not formatted as id;email;password."
+            )
+        secrets[row[0]] = MappingProxyType({"email": row[1], "password": row[2]})
+
+    return MappingProxyType(secrets)
@@ -3,7 +3,7 @@ from django.views.generic import DetailView, FormView
 from django.views.generic.list import ListView
 from django.views.generic.edit import CreateView, DeleteView, UpdateView
 from django.urls import reverse_lazy
-from django.utils.translation import gettext_lazy as _
+from django.utils.formats import date_format
 
 from contacts.models import Contact
 from core.mixins import OTPRequiredStaffOrAdminMixin
@@ -14,7 +14,7 @@ from instances.forms import (
     InstanceActionForm,
     InstanceMassDeployForm,
 )
-from instances.models import EmailConfig, Instance
+from instances.models import DeployBatch, EmailConfig, Instance
 
 
 class EmailConfigListView(OTPRequiredStaffOrAdminMixin, ListView):
@@ -81,8 +81,17 @@ class EmailConfigUpdateView(OTPRequiredStaffOrAdminMixin, UpdateView):
         )
 
     def form_valid(self, form):
+        response = super().form_valid(form)
+
         messages.success(self.request, "Configuration email modifiée avec succès.")
-        return super().form_valid(form)
+        if self.object.env_rollout:
+            messages.info(
+                self.request,
+                f"Les variables d’environnement de {self.object.env_rollout.items.count()} "
+                "instances vont être mises à jour.",
+            )
+
+        return response
 
 
 class EmailConfigDeleteView(OTPRequiredStaffOrAdminMixin, DeleteView):
@@ -104,6 +113,8 @@ class EmailConfigDeleteView(OTPRequiredStaffOrAdminMixin, DeleteView):
 
 class InstanceListView(OTPRequiredStaffOrAdminMixin, ListView):
     model = Instance
+    # The app statuses are read from the remote state stored for each instance
+    queryset = Instance.objects.select_related("main_contact", "remote_state")
     paginate_by = 25
 
     def get_context_data(self, *, object_list=None, **kwargs):
@@ -184,6 +195,9 @@ class InstanceActionView(OTPRequiredStaffOrAdminMixin, UpdateView):
         if form.is_valid():
             result = form.take_action()
 
+            # The effects of the action are checked by the worker
+            self.object.request_remote_state_check()
+
             if result["status"] == "success":
                 messages.success(self.request, result["message"])
             elif result["status"] == "warning":
@@ -217,10 +231,17 @@ class InstanceDeleteView(OTPRequiredStaffOrAdminMixin, DeleteView):
 
 class InstanceDetailView(OTPRequiredStaffOrAdminMixin, DetailView):
     model = Instance
+    queryset = Instance.objects.select_related("main_contact", "remote_state")
 
     def get_context_data(self, **kwargs):
         # Call the base implementation first to get a context
         context = super().get_context_data(**kwargs)
+
+        # The stored state is shown as is: refresh_instances checks it again
+        # once it is due (every few seconds while a deployment is in progress,
+        # every few hours otherwise)
+        context["remote_state"] = self.object.get_remote_state()
+
         return init_context(
             context=context,
             title=f"Gérer l’instance {self.object.name}",
@@ -228,14 +249,18 @@ class InstanceDetailView(OTPRequiredStaffOrAdminMixin, DetailView):
         )
 
 
+# Delay (in seconds) between two reloads of the page of a mass deployment
+DEPLOY_BATCH_PAGE_REFRESH_INTERVAL = 5
+
+
 class InstanceMassDeployFormView(OTPRequiredStaffOrAdminMixin, FormView):
     template_name = "instances/instance_mass_deploy_list.html"
     form_class = InstanceMassDeployForm
-    success_url = reverse_lazy("instances:list")
 
     def get_context_data(self, **kwargs):
         # Call the base implementation first to get a context
         context = super().get_context_data(**kwargs)
+        context["recent_batches"] = DeployBatch.objects.all()[:5]
         return init_context(
             context=context,
             title="Redéployer des instances en masse",
@@ -245,23 +270,41 @@ class InstanceMassDeployFormView(OTPRequiredStaffOrAdminMixin, FormView):
     def form_valid(self, form):
         instances = form.cleaned_data["instances"]
 
-        successful_deployments = []
-        for instance in instances:
-            result = instance.scalingo_deploy_code()
-
-            if result["status"] == "success":
-                successful_deployments.append(instance.name)
-            elif result["status"] == "warning":
-                messages.warning(self.request, result["message"])
-            else:
-                messages.error(self.request, result["message"])
-
-        successful_deployments_list = ", ".join(successful_deployments)
+        # The deployments are triggered and followed by the worker
+        self.batch = DeployBatch.start(
+            instances,
+            created_by=self.request.user,
+            strategy=form.cleaned_data["strategy"],
+        )
 
-        success_message = _("Successful deployments for instances:")
         messages.success(
             self.request,
-            f"{success_message} {successful_deployments_list}.",
+            f"Le déploiement de {len(instances)} instances a été lancé.",
         )
 
         return super().form_valid(form)
+
+    def get_success_url(self):
+        return self.batch.get_absolute_url()
+
+
+class DeployBatchDetailView(OTPRequiredStaffOrAdminMixin, DetailView):
+    model = DeployBatch
+
+    def get_queryset(self):
+        return super().get_queryset().prefetch_related("items__instance")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["refresh_interval"] = DEPLOY_BATCH_PAGE_REFRESH_INTERVAL
+        return init_context(
+            context=context,
+            title=f"Déploiement en masse du {date_format(self.object.created_at, 'SHORT_DATETIME_FORMAT')}",
+            links=INSTANCES_LINKS
+            + [
+                {
+                    "title": "Redéployer les instances",
+                    "url": reverse_lazy("instances:mass_deploy_list"),
+                }
+            ],
+        )
@@ -0,0 +1,30 @@
+from django.contrib import admin, messages
+from django.utils.translation import gettext_lazy as _
+
+from jobs.models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "status", "attempts", "run_at", "finished_at"]
+    list_filter = ["status", "name"]
+    search_fields = ["name", "dedupe_key"]
+    readonly_fields = ["created_at", "updated_at", "started_at", "finished_at"]
+    actions = ["retry"]
+
+    @admin.action(description=_("Run the selected failed jobs again"))
+    def retry(self, request, queryset):
+        # Most recent first, so that a key keeps its latest payload
+        jobs = queryset.filter(status="FAILED").order_by("-pk")
+        skipped = sum(not job.retry() for job in jobs)
+
+        if skipped:
+            self.message_user(
+                request,
+                _(
+                    "%d jobs were not run again: a pending job with the same key "
+                    "will do the work."
+                )
+                % skipped,
+                messages.WARNING,
+            )
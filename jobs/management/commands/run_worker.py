@@ -0,0 +1,106 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import os
+import signal
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.models import Job
+
+# Interval between two checks of the jobs abandoned by a stopped worker, in seconds
+STALE_CHECK_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = """Runs the background jobs.
+
+    Due jobs are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several
+    workers can run at the same time without taking the same jobs. Failed jobs
+    are retried with an exponential backoff, up to their maximum number of
+    attempts. On SIGTERM, the worker finishes its running jobs and stops.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.JOBS_WORKER_CONCURRENCY,
+            help="Number of jobs run at the same time. "
+            f"Default: {settings.JOBS_WORKER_CONCURRENCY}.",
+        )
+
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Stop when no job is due instead of waiting for new ones.",
+        )
+
+    def handle(self, *args, **kwargs):
+        concurrency = max(kwargs.get("concurrency", 1), 1)
+        burst = kwargs.get("burst", False)
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+
+        self.stopping = False
+        previous_handlers = {
+            signum: signal.signal(signum, self.stop)
+            for signum in [signal.SIGINT, signal.SIGTERM]
+        }
+
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                self.run(executor, concurrency, worker, burst)
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+
+    def stop(self, signum, frame):
+        self.stdout.write("Stopping after the running jobs...")
+        self.stopping = True
+
+    def run(self, executor, concurrency: int, worker: str, burst: bool) -> None:
+        running = set()
+        stale_checked_at = 0.0
+
+        while True:
+            if time.monotonic() - stale_checked_at > STALE_CHECK_INTERVAL:
+                Job.requeue_stale()
+                stale_checked_at = time.monotonic()
+
+            jobs = []
+            if not self.stopping and len(running) < concurrency:
+                jobs = Job.claim(concurrency - len(running), worker=worker)
+                running |= {executor.submit(self.run_job, job) for job in jobs}
+
+            if not running:
+                if self.stopping or burst:
+                    break
+                time.sleep(settings.JOBS_POLL_INTERVAL)
+                continue
+
+            done, running = wait(
+                running,
+                timeout=settings.JOBS_POLL_INTERVAL,
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                self.report(future.result())
+
+    @staticmethod
+    def run_job(job: Job) -> Job:
+        try:
+            job.run()
+        finally:
+            # Each thread of the pool has its own database connection
+            connections.close_all()
+        return job
+
+    def report(self, job: Job) -> None:
+        if job.status == "SUCCEEDED":
+            self.stdout.write(f"{job}: succeeded")
+        elif job.status == "PENDING":
+            self.stderr.write(f"{job}: failed, retried at {job.run_at:%H:%M:%S}")
+        else:
+            self.stderr.write(f"{job}: failed after {job.attempts} attempts")
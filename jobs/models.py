@@ -0,0 +1,251 @@
+from datetime import timedelta
+import secrets
+import traceback
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from jobs.registry import JobError, get_handler
+
+STATUS_CHOICES = [
+    ("PENDING", _("Pending")),
+    ("RUNNING", _("Running")),
+    ("SUCCEEDED", _("Succeeded")),
+    ("FAILED", _("Failed")),
+]
+
+
+def default_max_attempts() -> int:
+    return settings.JOBS_MAX_ATTEMPTS
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """
+    Exponential and jittered delay before the next attempt of a failed job
+    """
+    ceiling = min(
+        settings.JOBS_RETRY_MAX_DELAY,
+        settings.JOBS_RETRY_BASE_DELAY * 2 ** (attempts - 1),
+    )
+    return timedelta(seconds=secrets.SystemRandom().uniform(ceiling / 2, ceiling))
+
+
+class Job(models.Model):
+    """
+    Task run in the background by the run_worker command
+    """
+
+    name = models.CharField(_("name"), max_length=100)
+    payload = models.JSONField(_("payload"), default=dict, blank=True)
+    status = models.CharField(
+        _("status"),
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default="PENDING",
+        db_index=True,
+    )
+    dedupe_key = models.CharField(
+        _("deduplication key"),
+        max_length=200,
+        blank=True,
+        help_text=_("Only one pending job can have a given key."),
+    )
+    run_at = models.DateTimeField(_("run at"), default=timezone.now, db_index=True)
+    attempts = models.PositiveSmallIntegerField(_("attempts"), default=0)  # type: ignore
+    max_attempts = models.PositiveSmallIntegerField(
+        _("maximum attempts"), default=default_max_attempts
+    )  # type: ignore
+    worker = models.CharField(_("worker"), max_length=100, blank=True)
+    started_at = models.DateTimeField(_("started at"), null=True, blank=True)
+    finished_at = models.DateTimeField(_("finished at"), null=True, blank=True)
+    result = models.JSONField(_("result"), null=True, blank=True)
+    last_error = models.TextField(_("last error"), blank=True)
+
+    created_at = models.DateTimeField(_("created at"), auto_now_add=True)
+    updated_at = models.DateTimeField(_("updated at"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("job")
+        ordering = ["-created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dedupe_key"],
+                condition=Q(status="PENDING") & ~Q(dedupe_key=""),
+                name="unique_pending_dedupe_key",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk}"
+
+    @classmethod
+    def enqueue(
+        cls, name: str, payload: dict | None = None, dedupe_key: str = "", **kwargs
+    ) -> "Job":
+        """
+        Creates a job, unless a pending job has the same dedupe_key: the new
+        request is then merged into it, and the existing job is returned.
+        """
+        run_at = kwargs.pop("run_at", None) or timezone.now()
+
+        while True:
+            if dedupe_key:
+                pending = cls.objects.filter(dedupe_key=dedupe_key, status="PENDING")
+                # A job waiting for a retry runs as soon as the new request
+                pending.filter(run_at__gt=run_at).update(run_at=run_at)
+                job = pending.first()
+                if job:
+                    return job
+
+            try:
+                with transaction.atomic():
+                    return cls.objects.create(
+                        name=name,
+                        payload=payload or {},
+                        dedupe_key=dedupe_key,
+                        run_at=run_at,
+                        **kwargs,
+                    )
+            except IntegrityError:
+                # Another process created the same pending job in the meantime
+                continue
+
+    @classmethod
+    def claim(cls, limit: int, worker: str = "") -> list:
+        """
+        Marks up to `limit` due jobs as running and returns them.
+
+        The rows are locked with SKIP LOCKED, so that concurrent workers claim
+        different jobs without waiting for each other. A job is not claimed
+        while another job with the same dedupe_key is running.
+        """
+        now = timezone.now()
+        running_keys = (
+            cls.objects.filter(status="RUNNING")
+            .exclude(dedupe_key="")
+            .values("dedupe_key")
+        )
+
+        with transaction.atomic():
+            jobs = list(
+                cls.objects.select_for_update(skip_locked=True)
+                .filter(status="PENDING", run_at__lte=now)
+                .exclude(dedupe_key__in=running_keys)
+                .order_by("run_at", "pk")[:limit]
+            )
+            for job in jobs:
+                job.status = "RUNNING"
+                job.attempts += 1
+                job.worker = worker
+                job.started_at = now
+                job.updated_at = now
+            cls.objects.bulk_update(
+                jobs, ["status", "attempts", "worker", "started_at", "updated_at"]
+            )
+
+        return jobs
+
+    @classmethod
+    def requeue_stale(cls) -> int:
+        """
+        Makes the jobs of a worker that stopped while running them (deploy,
+        crash) pending again, or failed if they have no attempts left
+        """
+        now = timezone.now()
+        stale = cls.objects.filter(
+            status="RUNNING",
+            started_at__lt=now - timedelta(seconds=settings.JOBS_TIMEOUT),
+        )
+        error = "The worker stopped before the end of the job."
+
+        # A pending job with the same key will do the work instead
+        superseded = stale.exclude(dedupe_key="").filter(
+            dedupe_key__in=cls.objects.filter(status="PENDING").values("dedupe_key")
+        )
+        for jobs in [stale.filter(attempts__gte=F("max_attempts")), superseded]:
+            jobs.update(
+                status="FAILED", finished_at=now, last_error=error, updated_at=now
+            )
+
+        # Only the most recent stale job of a key can be pending again
+        older, keys = [], set()
+        for pk, key in (
+            stale.exclude(dedupe_key="")
+            .order_by("dedupe_key", "-pk")
+            .values_list("pk", "dedupe_key")
+        ):
+            if key in keys:
+                older.append(pk)
+            keys.add(key)
+        stale.filter(pk__in=older).update(
+            status="FAILED",
+            finished_at=now,
+            last_error=f"{error} A more recent job with the same key is run instead.",
+            updated_at=now,
+        )
+
+        try:
+            with transaction.atomic():
+                return stale.update(
+                    status="PENDING", run_at=now, last_error=error, updated_at=now
+                )
+        except IntegrityError:
+            # A job with the same key was enqueued in the meantime: the stale
+            # jobs are superseded by it on the next call
+            return 0
+
+    def retry(self) -> bool:
+        """
+        Makes a failed job pending again, unless a pending job with the same
+        key will already do the work. Returns whether the job was requeued.
+        """
+        self.status = "PENDING"
+        self.attempts = 0
+        self.run_at = timezone.now()
+        try:
+            with transaction.atomic():
+                self.save(update_fields=["status", "attempts", "run_at", "updated_at"])
+        except IntegrityError:
+            self.refresh_from_db()
+            return False
+        return True
+
+    def run(self) -> None:
+        try:
+            result = get_handler(self.name)(**self.payload)
+        except JobError as e:
+            self.fail(str(e))
+        except Exception:  # Any failure of a job is retried
+            self.fail(traceback.format_exc())
+        else:
+            self.succeed(result)
+
+    def succeed(self, result=None) -> None:
+        self.status = "SUCCEEDED"
+        self.result = result
+        self.finished_at = timezone.now()
+        self.save(update_fields=["status", "result", "finished_at", "updated_at"])
+
+    def fail(self, error: str) -> None:
+        self.last_error = error
+
+        fields = ["status", "run_at", "finished_at", "last_error", "updated_at"]
+
+        if self.attempts < self.max_attempts:
+            self.status = "PENDING"
+            self.run_at = timezone.now() + retry_delay(self.attempts)
+            try:
+                with transaction.atomic():
+                    self.save(update_fields=fields)
+                return
+            except IntegrityError:
+                # A pending job with the same key was enqueued while this one
+                # was running: it will do the work instead
+                pass
+
+        self.status = "FAILED"
+        self.finished_at = timezone.now()
+        self.save(update_fields=fields)
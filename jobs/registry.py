@@ -0,0 +1,35 @@
+"""
+Handlers of the background jobs, by name.
+
+Handlers are registered from the jobs.py module of each app, e.g.:
+
+    @register("instances.sync_env")
+    def sync_env(instance_id: int):
+        ...
+
+They are called with the payload of the job as keyword arguments. A handler
+raises an exception to make the job fail (it is then retried), and can return
+a JSON-serializable result that is stored on the job.
+"""
+
+HANDLERS = {}
+
+
+class JobError(Exception):
+    """
+    Expected failure of a job, stored with its message only (without traceback)
+    """
+
+
+def register(name: str):
+    def decorator(handler):
+        HANDLERS[name] = handler
+        return handler
+
+    return decorator
+
+
+def get_handler(name: str):
+    if name not in HANDLERS:
+        raise LookupError(f"No handler registered for the job {name}")
+    return HANDLERS[name]
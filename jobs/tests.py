@@ -0,0 +1,151 @@
+from datetime import timedelta
+import io
+
+from django.core.management import call_command
+from django.test import (
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+    skipUnlessDBFeature,
+)
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.registry import JobError, register
+
+CALLS = []
+
+
+@register("tests.record")
+def record(value: str) -> dict:
+    CALLS.append(value)
+    return {"value": value}
+
+
+@register("tests.fail")
+def fail() -> None:
+    raise JobError("Expected failure")
+
+
+class JobTestCase(TestCase):
+    def test_pending_jobs_are_deduplicated(self):
+        first = Job.enqueue("tests.record", {"value": "a"}, dedupe_key="key")
+        second = Job.enqueue("tests.record", {"value": "a"}, dedupe_key="key")
+        other = Job.enqueue("tests.record", {"value": "b"}, dedupe_key="other")
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+    def test_running_jobs_are_not_deduplicated(self):
+        first = Job.enqueue("tests.record", {"value": "a"}, dedupe_key="key")
+        Job.claim(1)
+        second = Job.enqueue("tests.record", {"value": "a"}, dedupe_key="key")
+
+        self.assertNotEqual(first, second)
+
+    def test_only_due_jobs_are_claimed(self):
+        due = Job.enqueue("tests.record", {"value": "a"})
+        Job.enqueue(
+            "tests.record",
+            {"value": "b"},
+            run_at=timezone.now() + timedelta(minutes=1),
+        )
+
+        self.assertEqual(Job.claim(10, worker="test"), [due])
+        self.assertEqual(Job.claim(10, worker="test"), [])
+
+    @override_settings(JOBS_RETRY_BASE_DELAY=10, JOBS_RETRY_MAX_DELAY=60)
+    def test_failed_jobs_are_retried_with_backoff(self):
+        job = Job.enqueue("tests.fail", max_attempts=2)
+
+        Job.claim(1)[0].run()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "PENDING")
+        self.assertEqual(job.last_error, "Expected failure")
+        self.assertGreaterEqual(job.run_at, timezone.now() + timedelta(seconds=4))
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        Job.claim(1)[0].run()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "FAILED")
+        self.assertEqual(job.attempts, 2)
+
+    def test_abandoned_jobs_are_requeued(self):
+        job = Job.enqueue("tests.record", {"value": "a"})
+        Job.claim(1)
+        Job.objects.filter(pk=job.pk).update(
+            started_at=timezone.now() - timedelta(hours=1)
+        )
+
+        self.assertEqual(Job.requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "PENDING")
+
+    def test_jobs_of_a_running_key_wait(self):
+        Job.enqueue("tests.record", {"value": "a"}, dedupe_key="key")
+        Job.claim(1)
+        Job.enqueue("tests.record", {"value": "b"}, dedupe_key="key")
+        other = Job.enqueue("tests.record", {"value": "c"})
+
+        self.assertEqual(Job.claim(2), [other])
+
+    def test_one_abandoned_job_per_key_is_requeued(self):
+        # e.g. claimed by workers of an older version, or by hand
+        first, second = [
+            Job.objects.create(
+                name="tests.record",
+                payload={"value": value},
+                dedupe_key="key",
+                status="RUNNING",
+                attempts=1,
+                started_at=timezone.now() - timedelta(hours=1),
+            )
+            for value in ["a", "b"]
+        ]
+
+        self.assertEqual(Job.requeue_stale(), 1)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, "FAILED")
+        self.assertEqual(second.status, "PENDING")
+
+    def test_retry_skips_jobs_whose_key_is_pending(self):
+        failed = [
+            Job.objects.create(name="tests.record", dedupe_key="key", status="FAILED")
+            for _ in range(2)
+        ]
+
+        self.assertTrue(failed[1].retry())
+        self.assertFalse(failed[0].retry())
+        self.assertEqual(Job.objects.filter(status="PENDING").count(), 1)
+
+
+class RunWorkerTestCase(TransactionTestCase):
+    # The jobs are run from worker threads, outside of the test transaction
+    def setUp(self):
+        CALLS.clear()
+        for value in "abcde":
+            Job.enqueue("tests.record", {"value": value})
+
+    def assertAllJobsSucceeded(self):
+        self.assertEqual(sorted(CALLS), list("abcde"))
+        self.assertEqual(
+            set(Job.objects.values_list("status", flat=True)), {"SUCCEEDED"}
+        )
+        self.assertEqual(Job.objects.get(payload__value="a").result, {"value": "a"})
+
+    def test_worker_runs_the_due_jobs(self):
+        call_command(
+            "run_worker", "--burst", "--concurrency", "1", stdout=io.StringIO()
+        )
+
+        self.assertAllJobsSucceeded()
+
+    # SQLite does not allow the worker threads to write at the same time
+    @skipUnlessDBFeature("has_select_for_update_skip_locked")
+    def test_worker_runs_jobs_concurrently(self):
+        call_command(
+            "run_worker", "--burst", "--concurrency", "3", stdout=io.StringIO()
+        )
+
+        self.assertAllJobsSucceeded()